@@ -1,52 +1,255 @@
-from typing import List, Dict
+from typing import List, Optional, Sequence
+import array
 import collections
+import collections.abc
+import enum
+import sys
 
 from cheer import scanner
 
+
+# every type of node the parser makes, numbered so nodes store an int
+NodeKind = enum.IntEnum("NodeKind", [
+    "program",
+    "function",
+    "params",
+    "param",
+    "statement_list",
+    "return",
+    "if_statement",
+    "while_statement",
+    "var_decl",
+    "var_decl_assign",
+    "assignment",
+    # type declarations, named after their token
+    "i32",
+    "bool",
+    "id",
+    "equality_exp",
+    "plus_exp",
+    "minus_exp",
+    "times_exp",
+    "input_exp",
+    "call_exp",
+    "var",
+    "int_literal",
+    "bool_literal",
+], start=0)
+
+# node type name of each NodeKind, indexed by kind
+NODE_TYPES = [sys.intern(kind.name) for kind in NodeKind]
+
+
 class ASTNode:
-    def __init__(self, ntype: str, symbol: scanner.Symbol, children: List['ASTNode']):
-        self.ntype = ntype # node type
+    """
+    nodes hash and compare by identity,
+     use structurally_equal to compare whole trees
+    """
+    __slots__ = ["kind", "symbol", "children", "type"]
+
+    def __init__(self, ntype, symbol: scanner.Symbol, children: List['ASTNode']):
+        # node type, can be given as the name or the NodeKind
+        self.kind = ntype if isinstance(ntype, NodeKind) else NodeKind[ntype]
         self.symbol = symbol
         self.children = children or []
-        self.parent = None
+        self.type = None # set by type checking
 
-        for c in self.children:
-            c.parent = self
+    @property
+    def ntype(self):
+        return NODE_TYPES[self.kind]
 
     def __repr__(self):
         return f"ASTNode<{self.ntype}>"
 
+    def make_leaf(self, ntype, symbol: scanner.Symbol):
+        """
+        turn this node into a leaf in place, ex: an expression folded to a literal
+        """
+        self.kind = NodeKind[ntype]
+        self.symbol = symbol
+        self.children = []
+
+    def become(self, other: 'ASTNode'):
+        """
+        replace this node in place with other, one of its descendants
+        """
+        self.kind = other.kind
+        self.symbol = other.symbol
+        self.children = other.children
+        self.type = other.type
+
+    def structurally_equal(self, other) -> bool:
+        """
+        same node types and symbols, all the way down both trees
+        """
+        pairs = [(self, other)]
+        while pairs:
+            a, b = pairs.pop()
+            if not isinstance(b, ASTNode):
+                return False
+            if a.kind != b.kind or a.symbol != b.symbol or len(a.children) != len(b.children):
+                return False
+            pairs.extend(zip(a.children, b.children))
+        return True
+
+
+class Arena:
+    """
+    flat storage for a whole AST, in parallel arrays
+
+    node i has type kinds[i] and symbol symbols[i], and types[i] is
+     set by type checking. its children are the nodes listed in
+     child_indices[first_child[i]:first_child[i] + child_count[i]]
+
+    the parser builds nodes straight into the arena, children before their
+     parents, and the visitors see them through ArenaNode, which has the same
+     attributes as ASTNode
+    """
+    def __init__(self):
+        self.kinds = array.array("B")
+        self.first_child = array.array("I")
+        self.child_count = array.array("I")
+        self.child_indices = array.array("I")
+        self.types: List[Optional[str]] = []
+        self.symbols: List[scanner.Symbol] = []
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def node(self, index: int) -> 'ArenaNode':
+        return ArenaNode(self, index)
+
+    def add(self, kind: int, symbol: scanner.Symbol, children: Sequence['ArenaNode'] = ()) -> 'ArenaNode':
+        """
+        a new node, children have to already be in the arena
+        """
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.symbols.append(symbol)
+        self.first_child.append(len(self.child_indices))
+        self.child_count.append(len(children))
+        self.child_indices.extend(child.index for child in children)
+        self.types.append(None)
+        return ArenaNode(self, index)
+
+    def clear(self):
+        """
+        free every node in the arena at once
+        """
+        for column in (self.kinds, self.first_child, self.child_count, self.child_indices):
+            del column[:]
+        self.types.clear()
+        self.symbols.clear()
+
+
+class ArenaChildren(collections.abc.Sequence):
+    """
+    the children of an arena node, views are only made as they're looked at
+    """
+    __slots__ = ["arena", "first", "length"]
+
+    def __init__(self, arena: Arena, first: int, length: int):
+        self.arena = arena
+        self.first = first
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.length))]
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        return ArenaNode(self.arena, self.arena.child_indices[self.first + i])
+
+    def __iter__(self):
+        arena = self.arena
+        for i in arena.child_indices[self.first:self.first + self.length]:
+            yield ArenaNode(arena, i)
+
+
+class ArenaNode:
+    """
+    view of node index in an arena
+    """
+    __slots__ = ["arena", "index"]
+
+    def __init__(self, arena: Arena, index: int):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.arena.kinds[self.index]
+
+    @property
+    def ntype(self):
+        return NODE_TYPES[self.arena.kinds[self.index]]
+
+    @property
+    def symbol(self):
+        return self.arena.symbols[self.index]
+
+    @property
+    def children(self) -> ArenaChildren:
+        return ArenaChildren(self.arena, self.arena.first_child[self.index], self.arena.child_count[self.index])
+
+    @property
+    def type(self):
+        return self.arena.types[self.index]
+
+    @type.setter
+    def type(self, t):
+        self.arena.types[self.index] = t
+
+    def make_leaf(self, ntype, symbol: scanner.Symbol):
+        arena = self.arena
+        arena.kinds[self.index] = NodeKind[ntype]
+        arena.symbols[self.index] = symbol
+        arena.child_count[self.index] = 0
+
+    def become(self, other: 'ArenaNode'):
+        arena = self.arena
+        i, j = self.index, other.index
+        arena.kinds[i] = arena.kinds[j]
+        arena.symbols[i] = arena.symbols[j]
+        arena.first_child[i] = arena.first_child[j]
+        arena.child_count[i] = arena.child_count[j]
+        arena.types[i] = arena.types[j]
+
+    def __repr__(self):
+        return f"ArenaNode<{self.ntype}>"
+
     def __eq__(self, other):
-        if not isinstance(other, ASTNode):
-            return False
-        return (self.ntype, self.symbol, tuple(self.children)) == \
-            (other.ntype, other.symbol, tuple(other.children))
+        return isinstance(other, ArenaNode) and self.arena is other.arena and self.index == other.index
 
     def __hash__(self):
-        return hash( (self.ntype, self.symbol, tuple(self.children)) )
+        return self.index
 
 
-def gen_ast_digraph(root: ASTNode):
+def gen_ast_digraph(root):
     """
     generate diagram for ast rooted at this node
     """
     counter = 0
-    node_to_id: Dict[ASTNode, int] = {}
     digraph = "digraph G {\n"
+    # nodes to look at, with the id of their parent
     unexamined: collections.deque = collections.deque()
-    unexamined.append(root)
+    unexamined.append((root, None))
     digraph += "\t\"\" [shape=none];\n"
     while len(unexamined) > 0:
-        look_at = unexamined.popleft()
-        if look_at not in node_to_id:
-            node_to_id[look_at] = counter
-            digraph += "\t{} [ label=\"{}\" ];\n".format(counter, look_at.ntype)
-            counter += 1
+        look_at, parent_id = unexamined.popleft()
+        node_id = counter
+        digraph += "\t{} [ label=\"{}\" ];\n".format(node_id, look_at.ntype)
+        counter += 1
         # for root
-        if look_at.parent is None:
-            digraph += "\t\"\" -> {};\n".format(node_to_id[look_at])
+        if parent_id is None:
+            digraph += "\t\"\" -> {};\n".format(node_id)
         else:
-            digraph += "\t{} -> {};\n".format(node_to_id[look_at.parent], node_to_id[look_at])
-        unexamined.extend(look_at.children)
+            digraph += "\t{} -> {};\n".format(parent_id, node_id)
+        unexamined.extend((child, node_id) for child in look_at.children)
     digraph += "}"
     return digraph
@@ -0,0 +1,152 @@
+"""
+compile many cheer files at once, spread over a pool of processes
+
+a file that fails doesn't stop the others, everything that went wrong is
+ reported together at the end along with how long each file took
+"""
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+import time
+from typing import List, Optional
+
+from cheer import cache
+from cheer import compile
+
+
+class FileResult:
+    def __init__(self, iname: str, oname: str, seconds: float, error: Optional[str] = None):
+        self.iname = iname
+        self.oname = oname
+        self.seconds = seconds
+        self.error = error
+        # what the worker's cache saw, summed up by main
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def find_inputs(patterns: List[str]) -> List[str]:
+    """
+    files, directories (every .ch file under them) and globs,
+     sorted so the same arguments always give the same order
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found.update(glob.glob(os.path.join(pattern, "**", "*.ch"), recursive=True))
+        elif glob.has_magic(pattern):
+            found.update(glob.glob(pattern, recursive=True))
+        else:
+            found.add(pattern)
+    return sorted(os.path.normpath(f) for f in found)
+
+
+def output_name(iname: str, base: str, output_dir: Optional[str], suffix: str = ".ll") -> str:
+    """
+    the .ll goes next to the source, or at the same path relative
+     to base inside output_dir
+    """
+    stem = os.path.splitext(iname)[0]
+    if output_dir is None:
+        return stem + suffix
+    return os.path.join(output_dir, os.path.relpath(stem, base) + suffix)
+
+
+def compile_one(options, iname: str, oname: str) -> FileResult:
+    start = time.perf_counter()
+    compile_cache = None
+    if not options.no_cache:
+        compile_cache = cache.CompileCache(options.cache_dir, options.cache_max_bytes)
+    try:
+        os.makedirs(os.path.dirname(oname) or ".", exist_ok=True)
+        diagnostics = compile.compile_file(options, iname, oname, compile_cache)
+    except Exception as e:
+        result = FileResult(iname, oname, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    else:
+        # parse errors don't stop the compile, but the file still failed
+        result = FileResult(iname, oname, time.perf_counter() - start, "\n".join(diagnostics) or None)
+    if compile_cache is not None:
+        result.cache_hits = compile_cache.hits
+        result.cache_misses = compile_cache.misses
+        result.cache_evictions = compile_cache.evictions
+    return result
+
+
+def compile_all(options, inames: List[str]) -> List[FileResult]:
+    """
+    results are in the same order as inames
+    """
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(i)) for i in inames]) if inames else "."
+    suffix = compile.output_suffix(options)
+    onames = [output_name(i, base, options.output_dir, suffix) for i in inames]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=options.jobs) as pool:
+        futures = [pool.submit(compile_one, options, i, o) for i, o in zip(inames, onames)]
+        results = []
+        for iname, oname, future in zip(inames, onames, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # the worker itself died
+                results.append(FileResult(iname, oname, 0.0, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def report(results: List[FileResult], seconds: float) -> str:
+    lines = []
+    width = max((len(r.iname) for r in results), default=0)
+    for r in results:
+        status = "ok" if r.ok else "FAILED"
+        lines.append(f"{r.iname:<{width}}  {r.seconds * 1000:8.1f} ms  {status}")
+
+    failed = [r for r in results if not r.ok]
+    if failed:
+        lines.append("")
+        lines.append("diagnostics:")
+        for r in failed:
+            lines.append(f"{r.iname}: {r.error}")
+
+    lines.append("")
+    lines.append(f"{len(results) - len(failed)} compiled, {len(failed)} failed in {seconds:.2f} s")
+    return "\n".join(lines)
+
+
+def main(options):
+    compile_cache = cache.CompileCache(options.cache_dir, options.cache_max_bytes)
+    if options.clear_cache:
+        compile_cache.clear()
+
+    start = time.perf_counter()
+    results = compile_all(options, find_inputs(options.inputs))
+    print(report(results, time.perf_counter() - start))
+
+    if options.cache_stats:
+        # the compiles happened in the workers, this process's cache saw none of them
+        compile_cache.hits = sum(r.cache_hits for r in results)
+        compile_cache.misses = sum(r.cache_misses for r in results)
+        compile_cache.evictions = sum(r.cache_evictions for r in results)
+        print(compile_cache.report())
+    if not all(r.ok for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compile many cheer files in parallel")
+    ap.add_argument('inputs', nargs='+',
+                    help='Cheer files, directories or globs to compile')
+
+    ap.add_argument('--output-dir', '-o',
+                    help='Put the ll files here, mirroring the source layout (default: next to each source)')
+
+    ap.add_argument('--jobs', '-j', type=int, default=os.cpu_count(),
+                    help='Number of worker processes (default: number of cores)')
+
+    compile.add_compile_options(ap)
+
+    main(ap.parse_args())
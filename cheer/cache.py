@@ -0,0 +1,173 @@
+"""
+content addressed on disk cache of compiler output
+
+entries are keyed by a hash of the source bytes, the compiler version and
+ the options that change the output, so an unchanged file compiled the same
+ way never has to go through the compiler again
+"""
+import contextlib
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir():
+    return os.environ.get("CHEER_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "cheer"))
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version() -> str:
+    """
+    hash of the compiler's own source, so changing the compiler invalidates
+     everything it compiled before
+    """
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith(".py"):
+            digest.update(name.encode())
+            with open(os.path.join(package_dir, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cache_key(source, options: Dict) -> str:
+    """
+    source is the bytes of the file, options are the ones that change the output
+    """
+    digest = hashlib.sha256()
+    digest.update(compiler_version().encode())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    digest.update(source)
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """
+    files live at <directory>/<first 2 chars of key>/<key><suffix>
+
+    writes go to a temp file that is renamed into place, so concurrent
+     compiles never see a half written entry. reading an entry bumps its
+     mtime, and once the entries add up to more than max_bytes the least
+     recently used ones are deleted
+    """
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, source, options: Dict) -> str:
+        return cache_key(source, options)
+
+    def path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def get(self, key: str, suffix: str = ".ll") -> Optional[bytes]:
+        path = self.path(key, suffix)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            self.record(hit=False)
+            return None
+        self.hits += 1
+        self.record(hit=True)
+        return data
+
+    def put(self, key: str, data: bytes, suffix: str = ".ll"):
+        path = self.path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        (mtime, size, path) of every entry
+        """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for sub in os.listdir(self.directory):
+            sub_dir = os.path.join(self.directory, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                if name.startswith(".tmp"):
+                    continue
+                path = os.path.join(sub_dir, name)
+                # another process could evict it while we look
+                with contextlib.suppress(FileNotFoundError):
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+                self.evictions += 1
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.stats_path())
+
+    def stats_path(self):
+        return os.path.join(self.directory, "stats.json")
+
+    @contextlib.contextmanager
+    def locked_stats(self):
+        """
+        hit/miss totals across every run, locked while they're updated
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.stats_path(), "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            text = f.read()
+            stats = json.loads(text) if text else {"hits": 0, "misses": 0}
+            yield stats
+            f.seek(0)
+            f.truncate()
+            json.dump(stats, f)
+
+    def record(self, hit: bool):
+        with self.locked_stats() as stats:
+            stats["hits" if hit else "misses"] += 1
+
+    def report(self) -> str:
+        entries = self.entries()
+        with self.locked_stats() as stats:
+            totals = dict(stats)
+        return "\n".join([
+            f"cache: {self.directory}",
+            f"entries: {len(entries)} ({sum(size for _, size, _ in entries)} bytes, max {self.max_bytes})",
+            f"this run: {self.hits} hits, {self.misses} misses, {self.evictions} evictions",
+            f"all runs: {totals['hits']} hits, {totals['misses']} misses",
+        ])
@@ -0,0 +1,295 @@
+"""
+control flow graph analysis and cleanup for gen_ir functions
+
+each transformation returns how many changes it made, simplify_cfg runs
+ them all until none of them can do anything else
+
+predecessor sets are recomputed from the terminators after every change,
+ and phis are kept with exactly one value per predecessor
+
+DominatorTree is here too, for the passes that need to know which blocks
+ always run before which
+"""
+from typing import Dict, List, Optional, Set
+
+from cheer import gen_ir
+
+
+def recompute_predecessors(function: 'gen_ir.Function'):
+    for block in function.basic_blocks:
+        block.predecessors = set()
+    for block in function.basic_blocks:
+        for successor in block.successors:
+            successor.predecessors.add(block)
+
+
+def reachable(function: 'gen_ir.Function') -> List['gen_ir.BasicBlock']:
+    """
+    blocks reachable from the entry, in depth first preorder
+    """
+    seen: Set[int] = set()
+    order = []
+    unexamined = [function.basic_blocks[0]]
+    while unexamined:
+        block = unexamined.pop()
+        if id(block) in seen:
+            continue
+        seen.add(id(block))
+        order.append(block)
+        unexamined.extend(reversed(block.successors))
+    return order
+
+
+def value_key(value: 'gen_ir.Value'):
+    """
+    equal constants are different objects, so compare them by value
+    """
+    if isinstance(value, gen_ir.Const):
+        return (value.type, value.value)
+    return value
+
+
+def retarget(block: 'gen_ir.BasicBlock', old: 'gen_ir.BasicBlock', new: 'gen_ir.BasicBlock'):
+    """
+    make the terminator of block jump to new wherever it jumped to old
+    """
+    terminator = block.instructions[-1]
+    terminator.blocks = [new if target is old else target for target in terminator.blocks]
+
+
+def simplify_phis(block: 'gen_ir.BasicBlock') -> int:
+    """
+    a phi that only ever has one value is just that value
+    """
+    changes = 0
+    for phi in block.phis():
+        # a loop can feed a phi back into itself, that doesn't count as another value
+        values = [value for value in phi.operands if value is not phi.result]
+        if values and len(set(value_key(value) for value in values)) == 1:
+            phi.replace_with(values[0])
+            changes += 1
+    return changes
+
+
+def fold_constant_branches(function: 'gen_ir.Function') -> int:
+    """
+    br i1 true, label %a, label %b -> br label %a
+    """
+    changes = 0
+    for block in function.basic_blocks:
+        if not block.terminated:
+            continue
+        terminator = block.instructions[-1]
+        if terminator.opcode != "br" or not terminator.operands:
+            continue
+        condition = terminator.operands[0]
+        if isinstance(condition, gen_ir.Const):
+            taken, not_taken = terminator.blocks if condition.value else reversed(terminator.blocks)
+        elif terminator.blocks[0] is terminator.blocks[1]:
+            taken = not_taken = terminator.blocks[0]
+        else:
+            continue
+        terminator.erase()
+        block.add_instr(gen_ir.Instruction("br", None, blocks=[taken]))
+        if not_taken is not taken:
+            for phi in not_taken.phis():
+                phi.remove_incoming(block)
+        changes += 1
+    return changes
+
+
+def remove_unreachable_blocks(function: 'gen_ir.Function') -> int:
+    keep = reachable(function)
+    kept = set(id(block) for block in keep)
+    dead = [block for block in function.basic_blocks if id(block) not in kept]
+    for block in dead:
+        for successor in block.successors:
+            for phi in successor.phis():
+                phi.remove_incoming(block)
+    for block in dead:
+        for instr in list(block.instructions):
+            instr.erase()
+    function.basic_blocks = [block for block in function.basic_blocks if id(block) in kept]
+    return len(dead)
+
+
+def merge_blocks(function: 'gen_ir.Function') -> int:
+    """
+    a block whose only successor has it as the only predecessor
+     is really one block, ex: entry -> if_else_end when the if always returns
+    """
+    changes = 0
+    recompute_predecessors(function)
+    for block in list(function.basic_blocks):
+        if block not in function.basic_blocks or not block.terminated:
+            continue
+        successors = block.successors
+        if len(successors) != 1 or successors[0] is block:
+            continue
+        successor = successors[0]
+        if successor is function.basic_blocks[0] or len(successor.predecessors) != 1:
+            continue
+
+        simplify_phis(successor)
+        block.instructions[-1].erase()
+        for instr in successor.instructions:
+            instr.block = block
+            block.instructions.append(instr)
+        successor.instructions = []
+        for after in block.successors:
+            for phi in after.phis():
+                phi.blocks = [block if b is successor else b for b in phi.blocks]
+        function.basic_blocks.remove(successor)
+        recompute_predecessors(function)
+        changes += 1
+    return changes
+
+
+def thread_jumps(function: 'gen_ir.Function') -> int:
+    """
+    a block that does nothing but jump somewhere else can be skipped,
+     everything that jumps to it can jump straight to where it goes
+    """
+    changes = 0
+    recompute_predecessors(function)
+    for block in list(function.basic_blocks):
+        if block is function.basic_blocks[0] or len(block.instructions) != 1:
+            continue
+        jump = block.instructions[0]
+        if jump.opcode != "br" or jump.operands:
+            continue
+        target = jump.blocks[0]
+        if target is block:
+            continue
+        # a block that already jumps to target as well would need two phi values for one edge
+        if any(pred in target.predecessors for pred in block.predecessors):
+            continue
+
+        for phi in target.phis():
+            value = next(v for v, b in zip(phi.operands, phi.blocks) if b is block)
+            phi.remove_incoming(block)
+            for pred in block.predecessors:
+                phi.add_incoming(value, pred)
+        for pred in block.predecessors:
+            retarget(pred, block, target)
+        jump.erase()
+        function.basic_blocks.remove(block)
+        recompute_predecessors(function)
+        changes += 1
+    return changes
+
+
+def simplify_cfg(function: 'gen_ir.Function') -> int:
+    changes = 0
+    while True:
+        changed = fold_constant_branches(function)
+        changed += remove_unreachable_blocks(function)
+        recompute_predecessors(function)
+        changed += sum(simplify_phis(block) for block in function.basic_blocks)
+        changed += thread_jumps(function)
+        changed += merge_blocks(function)
+        if changed == 0:
+            return changes
+        changes += changed
+
+
+def reverse_postorder(function: 'gen_ir.Function') -> List['gen_ir.BasicBlock']:
+    """
+    reachable blocks, each one before its successors (ignoring back edges)
+    """
+    seen: Set[int] = set()
+    order = []
+    # (block, whether its successors are done)
+    stack = [(function.basic_blocks[0], False)]
+    while stack:
+        block, done = stack.pop()
+        if done:
+            order.append(block)
+            continue
+        if id(block) in seen:
+            continue
+        seen.add(id(block))
+        stack.append((block, True))
+        stack.extend((successor, False) for successor in reversed(block.successors))
+    order.reverse()
+    return order
+
+
+class DominatorTree:
+    """
+    block a dominates block b if every path from the entry to b goes through a
+    idom[b] is the closest block that dominates b (the entry has none)
+
+    uses the iterative algorithm from Cooper, Harvey and Kennedy,
+     "A Simple, Fast Dominance Algorithm"
+    """
+    def __init__(self, function: 'gen_ir.Function'):
+        recompute_predecessors(function)
+        self.order = reverse_postorder(function)
+        number = {id(block): index for index, block in enumerate(self.order)}
+        entry = self.order[0]
+
+        idom: Dict[int, 'gen_ir.BasicBlock'] = {id(entry): entry}
+        changed = True
+        while changed:
+            changed = False
+            for block in self.order[1:]:
+                new_idom = None
+                for pred in block.predecessors:
+                    if id(pred) not in idom:
+                        continue
+                    if new_idom is None:
+                        new_idom = pred
+                        continue
+                    # walk both up the tree until they meet
+                    a, b = pred, new_idom
+                    while a is not b:
+                        while number[id(a)] > number[id(b)]:
+                            a = idom[id(a)]
+                        while number[id(b)] > number[id(a)]:
+                            b = idom[id(b)]
+                    new_idom = a
+                if idom.get(id(block)) is not new_idom:
+                    idom[id(block)] = new_idom # type: ignore
+                    changed = True
+
+        self.idom: Dict['gen_ir.BasicBlock', Optional['gen_ir.BasicBlock']] = {entry: None}
+        self.children: Dict['gen_ir.BasicBlock', List['gen_ir.BasicBlock']] = {block: [] for block in self.order}
+        for block in self.order[1:]:
+            parent = idom[id(block)]
+            self.idom[block] = parent
+            self.children[parent].append(block)
+
+    def dominates(self, a: 'gen_ir.BasicBlock', b: Optional['gen_ir.BasicBlock']) -> bool:
+        while b is not None:
+            if b is a:
+                return True
+            b = self.idom[b]
+        return False
+
+    def preorder(self) -> List['gen_ir.BasicBlock']:
+        order = []
+        unexamined = [self.order[0]]
+        while unexamined:
+            block = unexamined.pop()
+            order.append(block)
+            unexamined.extend(reversed(self.children[block]))
+        return order
+
+    def frontiers(self) -> Dict['gen_ir.BasicBlock', List['gen_ir.BasicBlock']]:
+        """
+        the dominance frontier of a block is where its dominance stops:
+         blocks it doesn't strictly dominate, but does dominate a predecessor of
+        """
+        frontiers: Dict[gen_ir.BasicBlock, List[gen_ir.BasicBlock]] = {block: [] for block in self.order}
+        for block in self.order:
+            preds = [pred for pred in block.predecessors if pred in self.idom]
+            if len(preds) < 2:
+                continue
+            for pred in preds:
+                runner = pred
+                while runner is not self.idom[block]:
+                    if block not in frontiers[runner]:
+                        frontiers[runner].append(block)
+                    runner = self.idom[runner]
+        return frontiers
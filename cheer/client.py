@@ -0,0 +1,110 @@
+"""
+thin client for the compile server (see server.py)
+
+only uses the standard library, so asking the server for a compile doesn't
+ pay for importing the compiler
+
+every message either way is a 4 byte big endian length, then that many
+ bytes of utf-8 json
+"""
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/tmp"), f"cheer-{os.getuid()}.sock")
+
+
+class CompileError(Exception):
+    pass
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(struct.pack(">I", len(data)) + data)
+
+
+def recv_exactly(sock, n):
+    chunks = []
+    while n > 0:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise ConnectionError("connection closed mid message")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    (length,) = struct.unpack(">I", recv_exactly(sock, 4))
+    return json.loads(recv_exactly(sock, length))
+
+
+def request(socket_path, message):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        send_message(sock, message)
+        return recv_message(sock)
+
+
+def compile_message(path=None, source=None, args=None):
+    """
+    a request to compile a file (path) or the text of one (source),
+     args are compile options as they'd be given to compile.py, ex: ["-O", "1"]
+    """
+    message = {"args": list(args or [])}
+    if path is not None:
+        message["path"] = os.path.abspath(path)
+    else:
+        message["source"] = source
+    return message
+
+
+def send_compile(socket_path, message):
+    """
+    returns the server's response, raises CompileError with its diagnostics
+    """
+    response = request(socket_path, message)
+    if not response["ok"]:
+        raise CompileError(response["error"])
+    return response
+
+
+def compile_remote(socket_path, path=None, source=None, args=None):
+    """
+    compile on the server, returns the llvm ir (or assembly with --backend native)
+    """
+    return send_compile(socket_path, compile_message(path, source, args))["code"]
+
+
+def main(options, compile_args):
+    try:
+        response = send_compile(options.socket, compile_message(path=options.input, args=compile_args))
+    except CompileError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    oname = options.output
+    if oname is None:
+        oname = os.path.splitext(options.input)[0] + response["suffix"]
+
+    with open(oname, "w") as outfile:
+        outfile.write(response["code"])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compile a file on a running compile server",
+                                 epilog="Any other options (ex: -O1, --backend native) are compile.py's, "
+                                        "the server checks them")
+    ap.add_argument('--input', '-i', required=True,
+                    help='Cheer file to compile')
+
+    ap.add_argument('--output', '-o',
+                    help='Filename of output ll (or s) file')
+
+    ap.add_argument('--socket', '-s', default=DEFAULT_SOCKET,
+                    help='Unix socket the server listens on')
+
+    main(*ap.parse_known_args())
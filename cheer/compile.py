@@ -1,52 +1,210 @@
 import argparse
+import mmap
 import os
+import sys
+from typing import List
 
 from cheer.lexing_rules import RULES
+from cheer import cache
 from cheer import scanner
 from cheer import parser
+from cheer import passes
+from cheer import regalloc
 from cheer import gen_ir
 from cheer import ast
 from cheer import type_checker
+from cheer import x86
 
-def compile(options, lines):
-    symbols = scanner.scan(lines, RULES)
+def compile(options, source, diagnostics=None):
+    """
+    source is either a bytes-like buffer of the whole file (ex: an mmap)
+     or an iterable of lines
 
-    p = parser.Parser(symbols)
+    if diagnostics is a list, the parser's errors go in it instead of being printed.
+     a tree with errors in it isn't compiled any further, the output is empty
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        tokens = scanner.scan_buffer(source, RULES)
+    else:
+        tokens = scanner.scan_table(source, RULES)
+
+    # Symbols are only created from the table as the parser reaches them
+    p = parser.Parser(tokens, arena=getattr(options, "arena", False), diagnostics=diagnostics)
     ast_root = p.start()
+    if p.errors:
+        return ""
 
     if options.verbose:
         print(ast.gen_ast_digraph(ast_root))
 
+    pass_manager = passes.PassManager.from_options(options)
+
+    # type checking and the ast passes are one walk over the tree
     tc = type_checker.TCVisitor(ast_root)
-    tc.type_check()
+    pass_manager.run_ast(ast_root, tc)
 
     gen_code = gen_ir.CodeGenVisitor(ast_root, tc.symbol_table)
     gen_code.accept()
+    pass_manager.run_ir(gen_code.module)
+
+    if options.verbose or getattr(options, "time_passes", False):
+        print(pass_manager.report())
+
+    if getattr(options, "backend", "llvm") == "native":
+        allocations = [regalloc.allocate(function) for function in gen_code.module.functions]
+        if options.verbose or getattr(options, "time_passes", False):
+            print(regalloc.report(allocations))
+        return x86.emit_module(gen_code.module, allocations)
     return gen_code.get_code()
 
+def read_source(f):
+    """
+    memory map the file so the scanner can read its bytes in place
+    (can't map an empty file, so those just read as empty bytes)
+    """
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# options that don't change the generated code, left out of cache keys
+NOT_IN_CACHE_KEY = {"input", "output", "verbose", "time_passes", "arena",
+                    "cache_dir", "cache_max_bytes", "no_cache", "clear_cache", "cache_stats",
+                    # batch.py's
+                    "inputs", "jobs", "output_dir"}
+
+
+def cache_options(options):
+    return {k: v for k, v in vars(options).items() if k not in NOT_IN_CACHE_KEY}
+
+
+def output_suffix(options):
+    """
+    llvm ir, or assembly from the native backend
+    """
+    return ".s" if getattr(options, "backend", "llvm") == "native" else ".ll"
+
+
+def cached_compile(options, source, compile_cache, diagnostics):
+    """
+    compile source, unless compile_cache already has it
+    (verbose output and pass timing need the real compile, so those skip the cache)
+
+    the parser's errors are added to diagnostics, and a compile with any isn't cached
+    """
+    if compile_cache is None or options.verbose or options.time_passes:
+        return compile(options, source, diagnostics)
+
+    key = compile_cache.key(source, cache_options(options))
+    cached = compile_cache.get(key, output_suffix(options))
+    if cached is not None:
+        return cached.decode()
+    errors: List[str] = []
+    code = compile(options, source, errors)
+    # a hit would skip the errors, so only clean compiles are kept
+    if not errors:
+        compile_cache.put(key, code.encode(), output_suffix(options))
+    diagnostics.extend(errors)
+    return code
+
+
 def main(options):
-    with open(options.input) as f:
-        code = compile(options, f)
+    compile_cache = cache.CompileCache(options.cache_dir, options.cache_max_bytes)
+    if options.clear_cache:
+        compile_cache.clear()
+    if options.input is None:
+        if options.cache_stats:
+            print(compile_cache.report())
+        return
+    if options.no_cache:
+        compile_cache = None
 
     oname = options.output
     if oname is None:
-        oname = os.path.splitext(options.input)[0] + ".ll"
+        oname = os.path.splitext(options.input)[0] + output_suffix(options)
+
+    diagnostics = compile_file(options, options.input, oname, compile_cache)
+    for d in diagnostics:
+        print(d)
+
+    if options.cache_stats and compile_cache is not None:
+        print(compile_cache.report())
+    if diagnostics:
+        sys.exit(1)
+
+
+def compile_file(options, iname, oname, compile_cache) -> List[str]:
+    """
+    returns the parser's errors, if there were any
+    """
+    diagnostics: List[str] = []
+    with open(iname, "rb") as f:
+        source = read_source(f)
+        try:
+            code = cached_compile(options, source, compile_cache, diagnostics)
+        finally:
+            if isinstance(source, mmap.mmap):
+                source.close()
 
     with open(oname, "w") as outfile:
         outfile.write(code)
+    return diagnostics
 
 
-if __name__ == "__main__":
+def arg_parser():
     ap = argparse.ArgumentParser()
-    ap.add_argument('--input', '-i', required=True,
+    ap.add_argument('--input', '-i',
                     help='Cheer file to compile')
 
     ap.add_argument('--output', '-o',
-                    help='Filename of output ll file')
+                    help='Filename of output ll (or s) file')
+
+    add_compile_options(ap)
+    return ap
+
 
+def add_compile_options(ap):
+    """
+    options for how to compile, shared with batch.py
+    """
     ap.add_argument('--verbose', '-v', action='store_true',
                     help='Print verbose output')
 
+    ap.add_argument('--backend', choices=['llvm', 'native'], default='llvm',
+                    help='Emit llvm ir for llc, or x86-64 assembly directly')
+
+    ap.add_argument('-O', dest='opt_level', type=int, choices=sorted(passes.LEVELS), default=2,
+                    help='Optimization level, -O0 runs no passes (default: -O2)')
+
+    ap.add_argument('--passes', type=passes.pass_list,
+                    help=f'Comma separated passes to run instead of an -O level, from: {", ".join(passes.PASSES)}')
+
+    ap.add_argument('--time-passes', action='store_true',
+                    help='Print the time, instruction counts and changes of each pass')
+
+    ap.add_argument('--arena', action='store_true',
+                    help='Store the AST in a flat arena instead of node objects')
+
+    ap.add_argument('--cache-dir', default=cache.default_cache_dir(),
+                    help='Directory of the compilation cache (default: $CHEER_CACHE_DIR or ~/.cache/cheer)')
+
+    ap.add_argument('--cache-max-bytes', type=int, default=cache.DEFAULT_MAX_BYTES,
+                    help='Evict least recently used cache entries past this size')
+
+    ap.add_argument('--no-cache', action='store_true',
+                    help='Always compile, don\'t read or write the cache')
+
+    ap.add_argument('--clear-cache', action='store_true',
+                    help='Delete everything in the cache first')
+
+    ap.add_argument('--cache-stats', action='store_true',
+                    help='Print cache hit/miss statistics')
+
+
+if __name__ == "__main__":
+    ap = arg_parser()
     parsed = ap.parse_args()
+    if parsed.input is None and not (parsed.clear_cache or parsed.cache_stats):
+        ap.error("--input is required")
 
     main(parsed)
@@ -0,0 +1,33 @@
+"""
+dead code elimination for gen_ir functions
+
+mark and sweep: instructions with side effects (stores, inline asm,
+ branches and returns) are live, and so is anything that computes a value
+ a live instruction uses. everything else is removed
+"""
+from cheer import gen_ir
+
+
+def eliminate_dead_code(function: 'gen_ir.Function') -> int:
+    """
+    returns the number of instructions removed
+    """
+    live = set()
+    unexamined = [instr for instr in function.instructions() if not instr.is_pure]
+    while unexamined:
+        instr = unexamined.pop()
+        if instr in live:
+            continue
+        live.add(instr)
+        for register in instr.uses:
+            if register.definition is not None:
+                unexamined.append(register.definition)
+
+    dead = [instr for instr in function.instructions() if instr not in live]
+    # unlink every dead instruction first, so the uses of a register only
+    #  ever shrink to ones that are also being removed
+    for instr in dead:
+        instr.drop_operands()
+    for instr in dead:
+        instr.erase()
+    return len(dead)
@@ -0,0 +1,144 @@
+"""
+constant folding and algebraic simplification on the ast
+
+runs after type checking and before code generation. expressions whose
+ operands are all literals are evaluated here, and the result replaces
+ the expression node in place, so codegen just sees a literal
+"""
+from cheer import scanner
+from cheer import visit
+
+
+def wrap_i32(value: int) -> int:
+    """
+    two's complement wraparound, like the i32 arithmetic llvm does
+    """
+    return (value + 2**31) % 2**32 - 2**31
+
+
+# node type -> how to evaluate it on two constants
+EVALUATE = {
+    "plus_exp": lambda a, b: wrap_i32(a + b),
+    "minus_exp": lambda a, b: wrap_i32(a - b),
+    "times_exp": lambda a, b: wrap_i32(a * b),
+    "equality_exp": lambda a, b: a == b,
+}
+
+LITERALS = {"int_literal", "bool_literal"}
+
+
+def is_pure(node) -> bool:
+    """
+    whether evaluating node has no side effects, so it can be dropped
+    (input reads from stdin, and a function call might, everything else we have is pure)
+    """
+    unexamined = [node]
+    while unexamined:
+        look_at = unexamined.pop()
+        if look_at.ntype in ("input_exp", "call_exp"):
+            return False
+        unexamined.extend(look_at.children)
+    return True
+
+
+def same_expression(a, b) -> bool:
+    """
+    same node types and lexemes all the way down, wherever they are in the source
+    """
+    pairs = [(a, b)]
+    while pairs:
+        a, b = pairs.pop()
+        if a.kind != b.kind or a.symbol.lexeme != b.symbol.lexeme:
+            return False
+        a_children, b_children = a.children, b.children
+        if len(a_children) != len(b_children):
+            return False
+        pairs.extend(zip(a_children, b_children))
+    return True
+
+
+def constant(node):
+    """
+    value of a literal node, None if it isn't one
+    """
+    if node.ntype in LITERALS:
+        return node.symbol.value
+    return None
+
+
+class FoldingVisitor(visit.DFSVisitor):
+    """
+    children are left before their parents, so by the time an expression is
+     looked at its operands are already as folded as they'll get
+    """
+    def __init__(self, ast):
+        super().__init__(ast)
+        # number of expression nodes replaced
+        self.folded = 0
+
+    def default_in_visit(self, node):
+        # override
+        pass
+
+    def default_out_visit(self, node):
+        # override
+        pass
+
+    def to_literal(self, node, value):
+        symbol = node.symbol
+        if isinstance(value, bool):
+            lexeme = "true" if value else "false"
+            node.make_leaf("bool_literal", scanner.Symbol("bool_literal", lexeme, value, symbol.line, symbol.col))
+        else:
+            node.make_leaf("int_literal", scanner.Symbol("int literal", str(value), value, symbol.line, symbol.col))
+        self.folded += 1
+
+    def replace(self, node, other):
+        node.become(other)
+        self.folded += 1
+
+    def fold(self, node):
+        lhs, rhs = node.children
+        a, b = constant(lhs), constant(rhs)
+        if a is not None and b is not None:
+            self.to_literal(node, EVALUATE[node.ntype](a, b))
+            return True
+        return False
+
+    def _out_equality_exp(self, node):
+        self.fold(node)
+
+    def _out_plus_exp(self, node):
+        if self.fold(node):
+            return
+        lhs, rhs = node.children
+        # x + 0, 0 + x
+        if constant(rhs) == 0:
+            self.replace(node, lhs)
+        elif constant(lhs) == 0:
+            self.replace(node, rhs)
+
+    def _out_minus_exp(self, node):
+        if self.fold(node):
+            return
+        lhs, rhs = node.children
+        # x - 0
+        if constant(rhs) == 0:
+            self.replace(node, lhs)
+        # x - x, as long as evaluating x doesn't do anything
+        # (same_expression gives up at the first difference, is_pure walks all of lhs, so it goes second)
+        elif same_expression(lhs, rhs) and is_pure(lhs):
+            self.to_literal(node, 0)
+
+    def _out_times_exp(self, node):
+        if self.fold(node):
+            return
+        lhs, rhs = node.children
+        # x * 1, 1 * x
+        if constant(rhs) == 1:
+            self.replace(node, lhs)
+        elif constant(lhs) == 1:
+            self.replace(node, rhs)
+        # x * 0, 0 * x, can only drop x if it's pure
+        elif constant(rhs) == 0 and is_pure(lhs) or constant(lhs) == 0 and is_pure(rhs):
+            self.to_literal(node, 0)
@@ -1,4 +1,5 @@
-from typing import List
+import collections
+from typing import Any, Counter, Dict, List, Optional, Sequence, Set
 
 from cheer import visit, symbol_table
 
@@ -18,14 +19,35 @@ class Module:
 
 
 class Function:
-    def __init__(self, name, return_type):
+    def __init__(self, name, return_type, params=None):
         self.name = name
         self.return_type = return_type
+        # registers holding the arguments
+        self.params: List[Register] = params or []
         self.basic_blocks = []
 
+    def instructions(self):
+        for block in self.basic_blocks:
+            yield from block.instructions
+
+    def number_registers(self):
+        """
+        llvm wants unnamed registers numbered in the order they're defined,
+         so numbers are only handed out when the code is rendered
+        """
+        num = 0
+        for instr in self.instructions():
+            if instr.result is not None and not instr.result.named:
+                instr.result.name = str(num)
+                num += 1
+
     def to_code(self):
+        self.number_registers()
         lines = []
-        lines.append("define {} @{}() {{".format(self.return_type, self.name))
+        params = ", ".join(param.typed_ref() for param in self.params)
+        # only main is called from outside the module
+        linkage = "" if self.name == "main" else "internal "
+        lines.append("define {}{} @{}({}) {{".format(linkage, self.return_type, self.name, params))
         for index, block in enumerate(self.basic_blocks):
             lines.extend(block.to_code())
             if index < len(self.basic_blocks) - 1:
@@ -37,25 +59,70 @@ class Function:
 class BasicBlock:
     def __init__(self, name):
         self.name = name
-        self.lines = []
-        self.lines.append(f"{name}:")
-        self.terminated = False
-        self.returns = False
+        self._instructions: List[Instruction] = []
+        # erased but still in _instructions, they're dropped all at once
+        #  the next time the instructions are looked at
+        self.erased: Set[Instruction] = set()
         self.predecessors = set()
 
+    @property
+    def instructions(self) -> List['Instruction']:
+        if self.erased:
+            self._instructions[:] = [instr for instr in self._instructions if instr not in self.erased]
+            self.erased.clear()
+        return self._instructions
+
+    @instructions.setter
+    def instructions(self, instrs: List['Instruction']):
+        self._instructions = instrs
+        self.erased.clear()
+
+    @property
+    def terminated(self):
+        return len(self.instructions) > 0 and self.instructions[-1].is_terminator
+
+    @property
+    def returns(self):
+        return self.terminated and self.instructions[-1].opcode == "ret"
+
+    @property
+    def successors(self) -> List['BasicBlock']:
+        if not self.terminated:
+            return []
+        return self.instructions[-1].blocks
+
+    def phis(self) -> List['Instruction']:
+        return [instr for instr in self.instructions if instr.opcode == "phi"]
+
     def to_code(self):
-        return self.lines
+        return [f"{self.name}:"] + [indent + instr.to_code() for instr in self.instructions]
 
-    def add_instr(self, line):
+    def add_instr(self, instr):
         if not self.terminated:
-            self.lines.append(indent + line)
-            if line.startswith("ret"):
-                self.terminated = True
-                self.returns = True
-            if line.startswith("br"):
-                self.terminated = True
+            instr.block = self
+            self.instructions.append(instr)
         else:
-            print(f"ignoring line: {line}, basic block already terminated")
+            # code after a return can't run, leave it out
+            instr.drop_operands()
+
+    def insert_instr(self, index, instr):
+        instr.block = self
+        self.instructions.insert(index, instr)
+
+    def unlink(self, instr):
+        """
+        take instr out of the block, without shifting the rest of the list each time
+        """
+        self.erased.add(instr)
+
+    def alloca_end(self):
+        """
+        index just past the allocas at the start of the block
+        """
+        index = 0
+        while index < len(self.instructions) and self.instructions[index].opcode == "alloca":
+            index += 1
+        return index
 
     def __repr__(self):
         return f"BB<{self.name}>"
@@ -67,38 +134,256 @@ class BasicBlock:
         return self.name == other.name
 
 
-class Var:
-    def __init__(self, name, t):
+###### VALUES #######
+
+# llvm type of each cheer type
+LLVM_TYPES = {
+    "i32": "i32",
+    "bool": "i1",
+}
+
+
+class Value:
+    __slots__ = ["type"]
+
+    def __init__(self, t):
+        self.type = t # llvm type, ex: i32, i1, i8*
+
+    def ref(self):
+        raise NotImplementedError
+
+    def typed_ref(self):
+        return f"{self.type} {self.ref()}"
+
+
+class Const(Value):
+    __slots__ = ["value"]
+
+    def __init__(self, t, value):
+        super().__init__(t)
+        self.value = value
+
+    def ref(self):
+        if self.type == "i1":
+            return "true" if self.value else "false"
+        return str(self.value)
+
+    def __repr__(self):
+        return f"Const<{self.typed_ref()}>"
+
+
+class Register(Value):
+    """
+    virtual register, defined by exactly one instruction
+    uses are the instructions that read it, with how many of their operands it is
+    """
+    __slots__ = ["name", "named", "definition", "uses"]
+
+    def __init__(self, t, name=None):
+        super().__init__(t)
+        # unnamed registers get numbered when the function is rendered
         self.name = name
+        self.named = name is not None
+        self.definition: Optional[Instruction] = None
+        self.uses: Counter[Instruction] = collections.Counter()
+
+    def ref(self):
+        return f"%{self.name}"
+
+    def add_use(self, instr: 'Instruction'):
+        self.uses[instr] += 1
+
+    def remove_use(self, instr: 'Instruction'):
+        self.uses[instr] -= 1
+        if not self.uses[instr]:
+            del self.uses[instr]
+
+    def replace_all_uses_with(self, value: Value):
+        for instr in list(self.uses):
+            instr.replace_operand(self, value)
+
+    def __repr__(self):
+        return f"Register<{self.type} %{self.name}>"
+
+
+###### INSTRUCTIONS #######
+
+TERMINATORS = {"br", "ret"}
+# no side effects, so they can be removed if nothing uses them
+PURE_OPCODES = {"add", "sub", "mul", "icmp", "sext", "phi", "getelementptr", "load", "alloca"}
+
+
+class Instruction:
+    """
+    operands are Values, for br and phi blocks are the BasicBlocks they refer to
+     (a phi's incoming value operands[i] comes from blocks[i])
+    attrs hold whatever else an opcode needs, ex: the icmp predicate
+    """
+    __slots__ = ["opcode", "type", "operands", "result", "blocks", "attrs", "block"]
+
+    def __init__(self, opcode: str, t: Optional[str], operands: Sequence[Value] = (),
+                 result: Optional[Register] = None, blocks: Sequence[BasicBlock] = (), **attrs):
+        self.opcode = opcode
         self.type = t
+        self.operands: List[Value] = list(operands)
+        self.result = result
+        self.blocks: List[BasicBlock] = list(blocks)
+        self.attrs: Dict[str, Any] = attrs
+        self.block: Optional[BasicBlock] = None
+
+        for operand in self.operands:
+            if isinstance(operand, Register):
+                operand.add_use(self)
+        if result is not None:
+            result.definition = self
+
+    @property
+    def is_terminator(self):
+        return self.opcode in TERMINATORS
+
+    @property
+    def is_pure(self):
+        return self.opcode in PURE_OPCODES
+
+    @property
+    def defs(self) -> List[Register]:
+        return [self.result] if self.result is not None else []
+
+    @property
+    def uses(self) -> List[Register]:
+        return [op for op in self.operands if isinstance(op, Register)]
+
+    @property
+    def value(self) -> Register:
+        """
+        the register defined, for an instruction that has to define one
+        """
+        assert self.result is not None, f"{self} doesn't define a value"
+        return self.result
 
+    @property
+    def parent(self) -> BasicBlock:
+        """
+        the block this is in, for an instruction that has to be in one
+        """
+        assert self.block is not None, f"{self} isn't in a block"
+        return self.block
 
-class Phi:
-    def __init__(self):
-        self.map: Dict[str, symbol_table.STE] = {}
+    def replace_with(self, value: Value):
+        """
+        everything using the result uses value instead, and this instruction is erased
+        """
+        self.value.replace_all_uses_with(value)
+        self.erase()
+
+    def set_operand(self, index: int, value: Value):
+        old = self.operands[index]
+        if isinstance(old, Register):
+            old.remove_use(self)
+        if isinstance(value, Register):
+            value.add_use(self)
+        self.operands[index] = value
+
+    def replace_operand(self, old: Value, new: Value):
+        for index, operand in enumerate(self.operands):
+            if operand is old:
+                self.set_operand(index, new)
+
+    def add_incoming(self, value: Value, block: BasicBlock):
+        """
+        give a phi a value for when control comes from block
+        """
+        if isinstance(value, Register):
+            value.add_use(self)
+        self.operands.append(value)
+        self.blocks.append(block)
+
+    def remove_incoming(self, block: BasicBlock):
+        for index in reversed(range(len(self.blocks))):
+            if self.blocks[index] is block:
+                value = self.operands.pop(index)
+                del self.blocks[index]
+                if isinstance(value, Register):
+                    value.remove_use(self)
+
+    def drop_operands(self):
+        """
+        unlink this instruction from the registers it uses
+        """
+        for operand in self.operands:
+            if isinstance(operand, Register):
+                operand.remove_use(self)
+        self.operands = []
+
+    def erase(self):
+        self.drop_operands()
+        if self.block is not None:
+            self.block.unlink(self)
+            self.block = None
 
     def __repr__(self):
-        return str(self.map)
+        return f"Instruction<{self.opcode}>"
+
+    def to_code(self):
+        op = self.opcode
+        ops = self.operands
+        if op == "alloca":
+            code = f"alloca {self.attrs['allocated']}, align {self.attrs['align']}"
+        elif op == "store":
+            return f"store {ops[0].typed_ref()}, {ops[1].typed_ref()}"
+        elif op == "load":
+            code = f"load {self.type}, {ops[0].typed_ref()}, align {self.attrs['align']}"
+        elif op == "getelementptr":
+            indices = ", ".join(index.typed_ref() for index in ops[1:])
+            code = f"getelementptr inbounds {self.attrs['source']}, {ops[0].typed_ref()}, {indices}"
+        elif op == "asm":
+            args = ", ".join(arg.typed_ref() for arg in ops)
+            code = f'call {self.type} asm sideeffect "{self.attrs["template"]}", "{self.attrs["constraints"]}"({args})'
+        elif op == "call":
+            args = ", ".join(arg.typed_ref() for arg in ops)
+            code = f"call {self.type} @{self.attrs['callee']}({args})"
+        elif op == "sext":
+            code = f"sext {ops[0].typed_ref()} to {self.type}"
+        elif op == "icmp":
+            code = f"icmp {self.attrs['predicate']} {ops[0].typed_ref()}, {ops[1].ref()}"
+        elif op == "phi":
+            incoming = ", ".join(f"[{value.ref()}, %{block.name}]" for value, block in zip(ops, self.blocks))
+            code = f"phi {self.type} {incoming}"
+        elif op == "br":
+            if not ops:
+                return f"br label %{self.blocks[0].name}"
+            return f"br {ops[0].typed_ref()}, label %{self.blocks[0].name}, label %{self.blocks[1].name}"
+        elif op == "ret":
+            return f"ret {ops[0].typed_ref()}"
+        else:
+            # binary operators: add, sub, mul
+            code = f"{op} {self.type} {ops[0].ref()}, {ops[1].ref()}"
+        return f"{self.value.ref()} = {code}"
+
+
+# inline asm that reads 2 bytes from stdin into the buffer in rsi
+READ_SYSCALL = r"movl $$0x00000000, %edi\0Amovl $$0x00000002, %edx\0Amovl $$0, %eax\0Asyscall\0A"
+# the template sets rdi and rdx, syscall overwrites rcx and r11,
+#  and the read writes to the buffer behind llvm's back
+READ_SYSCALL_CONSTRAINTS = "={ax},{si},~{rdi},~{rdx},~{rcx},~{r11},~{memory},~{dirflag},~{fpsr},~{flags}"
 
 
 class CodeGenVisitor(visit.DFSVisitor):
     def __init__(self, ast, st):
         super().__init__(ast)
-        self.reg_num = 0
         self.bb_num = 1
-        self.exp_stack: List[Var] = []
+        self.exp_stack: List[Value] = []
         self.symbol_table = st
 
-        self.main = Function("main", "i32")
-        bb = BasicBlock("entry")
-        self.main.basic_blocks.append(bb)
+        self.module = Module()
+        # function being generated
+        self.function: Function = None # type: ignore
 
+        self.env = symbol_table.Environment(st)
         self.scope_num = 0
-        self.scope_stack: List[symbol_table.Scope] = []
+        self.scope_stack: List[symbol_table.Scope] = self.env.scope_stack
         self.recent_scope = None # scope that was just left
 
-        self.phi_stack = []
-
     def default_in_visit(self, node):
         # override
         pass
@@ -108,70 +393,101 @@ class CodeGenVisitor(visit.DFSVisitor):
         pass
 
     def get_code(self):
-        return "\n".join(self.main.to_code())
+        return "\n\n".join("\n".join(function.to_code()) for function in self.module.functions)
+
+    def add_instr(self, opcode, t, operands=(), blocks=(), **attrs) -> Optional[Register]:
+        """
+        add an instruction to the current basic block
+        returns the register it defines, if its type t isn't None
+         (except store, br and ret, which don't define anything)
+        """
+        result = None
+        if t is not None and opcode not in ("store", "br", "ret"):
+            result = Register(t)
+        instr = Instruction(opcode, t, operands, result, blocks, **attrs)
+        block = self.function.basic_blocks[-1]
+        if opcode == "alloca" and not block.terminated:
+            # stack slots all go at the top of the entry block,
+            #  so they're allocated once however the function branches
+            entry = self.function.basic_blocks[0]
+            entry.insert_instr(entry.alloca_end(), instr)
+        else:
+            block.add_instr(instr)
+        return result
+
+    ###### FUNCTIONS #######
+
+    def _in_function(self, node):
+        self.function = Function(node.symbol.lexeme, LLVM_TYPES[node.type])
+        self.module.functions.append(self.function)
+        self.function.basic_blocks.append(BasicBlock("entry"))
+        # same scope for the parameters as type checking made
+        new_scope = symbol_table.Scope(self.scope_num)
+        self.scope_num += 1
+        self.env.push(new_scope)
+
+    def _out_function(self, node):
+        self.env.pop()
 
-    def add_line(self, line):
-        self.main.basic_blocks[-1].add_instr(line)
+    def _out_param(self, node):
+        # arguments get a slot like any other variable
+        ste = self.declare(node)
+        # named, so they don't take up a number. the . keeps them apart from block names
+        param = Register(LLVM_TYPES[node.type], f"{node.symbol.lexeme}.arg")
+        self.function.params.append(param)
+        self.add_instr("store", param.type, [param, ste.slot])
 
     ###### STATEMENTS #######
 
     def _in_statement_list(self, node):
         new_scope = symbol_table.Scope(self.scope_num)
         self.scope_num += 1
-        self.scope_stack.append(new_scope)
+        self.env.push(new_scope)
 
     def _out_statement_list(self, node):
-        self.recent_scope = self.scope_stack.pop()
+        self.recent_scope = self.env.pop()
 
     def _visit_if_statement(self, node):
         # set up basic blocks
-        if_body = BasicBlock(f"if_taken{self.bb_num}")    
+        if_body = BasicBlock(f"if_taken{self.bb_num}")
         if_else_end = BasicBlock(f"if_else_end{self.bb_num}")
 
-        # set up Phi statement for assignments in condition body(ies)
-        self.phi_stack.append(Phi())
-
-        # keep track
-        start_basic_block = self.main.basic_blocks[-1]
-
-        if_body.predecessors.add(start_basic_block)
-        
         # first gen code for the condition
         self.visit_node(node.children[0])
         # gen code conditional branch
         condition = self.exp_stack.pop()
         if len(node.children) == 3:
             else_body = BasicBlock(f"else_taken{self.bb_num}")
-            else_body.predecessors.add(start_basic_block)
-            self.add_line(f"br i1 %{condition.name}, label %{if_body.name}, label %{else_body.name}")
+            self.add_instr("br", None, [condition], [if_body, else_body])
         else:
-            if_else_end.predecessors.add(start_basic_block)
-            self.add_line(f"br i1 %{condition.name}, label %{if_body.name}, label %{if_else_end.name}")
+            self.add_instr("br", None, [condition], [if_body, if_else_end])
 
         # needed so future if statement BBs to have unique names
         self.bb_num += 1
 
         # gen code for if taken body
-        self.main.basic_blocks.append(if_body)
+        self.function.basic_blocks.append(if_body)
         self.visit_node(node.children[1])
         # if the if body contains a return statement
         #  then we don't need to end the basic block with a br
-        if not if_body.returns:
+        # (the body might have ended in another block, ex: a nested if)
+        if_returns = self.function.basic_blocks[-1].returns
+        if not if_returns:
             # gen last line of if_body basic block, to jump to next basic block
-            self.add_line(f"br label %{if_else_end.name}")
-            if_else_end.predecessors.add(if_body)
+            self.add_instr("br", None, blocks=[if_else_end])
 
         # gen code for else
+        else_returns = False
         if len(node.children) == 3:
             self.bb_num += 1
 
             # gen code for else taken body
-            self.main.basic_blocks.append(else_body)
+            self.function.basic_blocks.append(else_body)
             self.visit_node(node.children[2])
-            if not else_body.returns:
+            else_returns = self.function.basic_blocks[-1].returns
+            if not else_returns:
                 # gen last line of else body bb, to jump to next bb
-                self.add_line(f"br label %{if_else_end.name}")
-                if_else_end.predecessors.add(else_body)
+                self.add_instr("br", None, blocks=[if_else_end])
 
         # if the if body and else body
         # ex:
@@ -180,146 +496,95 @@ class CodeGenVisitor(visit.DFSVisitor):
         #   else { return false; }
         # }
         # we don't want another basic block after the else one
+        if not (if_returns and else_returns):
+            self.function.basic_blocks.append(if_else_end)
+
+    def _visit_while_statement(self, node):
+        # the condition gets its own block, so the body can jump back to it
+        while_cond = BasicBlock(f"while_cond{self.bb_num}")
+        while_body = BasicBlock(f"while_body{self.bb_num}")
+        while_end = BasicBlock(f"while_end{self.bb_num}")
+        self.bb_num += 1
+
+        self.add_instr("br", None, blocks=[while_cond])
+        self.function.basic_blocks.append(while_cond)
+        self.visit_node(node.children[0])
+        condition = self.exp_stack.pop()
+        self.add_instr("br", None, [condition], [while_body, while_end])
 
-        # is there any code needed after the if-else statement?
-        nothing_after_if_else = len(node.children) == 3 \
-            and if_body.returns and else_body.returns
-
-        if not nothing_after_if_else:
-            self.main.basic_blocks.append(if_else_end)
-            # lets deal with the phi
-            phi = self.phi_stack.pop()
-            for lexeme, ste in phi.map.items():
-                recent_bb, recent_ir_name = ste.ir_names.pop()
-                if ste.ir_names[-1][0] == if_body:
-                    _, next_ir_name = ste.ir_names.pop()
-                else:
-                    _, next_ir_name = ste.ir_names[-1]
-                
-                # need to gen phi code
-                if len(if_else_end.predecessors) > 1:
-                    # some weird shit to figure out which basic block
-                    #  should be in the phi statement
-                    # (based on the previously set predecessors)
-                    predecessors = if_else_end.predecessors.copy()
-                    predecessors.remove(recent_bb)
-                    predecessors = list(predecessors)
-                    if len(predecessors) > 1:
-                        raise ValueError(f"predecessors should be 2")
-                    next_bb = predecessors[0]
-
-                    phi_code = "%{} = phi {} [%{}, %{}], [%{}, %{}]".format(
-                            self.reg_num,
-                            ste.node.type,
-                            recent_ir_name, recent_bb.name,
-                            next_ir_name, next_bb.name
-                        )
-
-                    self.add_line(phi_code)
-                    ste.assign_to_lexeme(self.main.basic_blocks[-1], self.reg_num)
-                    self.reg_num += 1
-                elif len(if_else_end.predecessors) == 1:
-                    # need to update the ir name for this variable to
-                    #  always be the ir var assigned to in the 1 predecessor
-                    predecessor = list(if_else_end.predecessors)[0]
-                    actual_ir_name = recent_ir_name if recent_bb == predecessor else next_ir_name
-                    ste.assign_to_lexeme(predecessor, actual_ir_name)
+        self.function.basic_blocks.append(while_body)
+        self.visit_node(node.children[1])
+        # back to the condition, unless the body returned
+        if not self.function.basic_blocks[-1].returns:
+            self.add_instr("br", None, blocks=[while_cond])
+
+        self.function.basic_blocks.append(while_end)
 
     def _out_return(self, node):
         op1 = self.exp_stack.pop()
-        self.add_line(f"ret {op1.type} %{op1.name}")
+        self.add_instr("ret", op1.type, [op1])
+
+    ###### VARIABLES #######
+    # every variable gets a stack slot in the entry block, assignments
+    #  store to it and uses load from it. the mem2reg pass turns the slots
+    #  into ssa values (with phis where control flow joins)
+
+    def declare(self, node):
+        ste = self.env.declare(node)
+        t = LLVM_TYPES[ste.node.type]
+        ste.slot = self.add_instr("alloca", f"{t}*", allocated=t, align=4)
+        return ste
+
+    def _out_var_decl(self, node):
+        self.declare(node)
 
     def _out_var_decl_assign(self, node):
-        ste = self.symbol_table.get(node, self.scope_stack)
-        ste.assign_to_lexeme(self.main.basic_blocks[-1], self.exp_stack[-1].name)
+        ste = self.declare(node)
+        value = self.exp_stack.pop()
+        self.add_instr("store", value.type, [value, ste.slot])
 
     def _visit_assignment(self, node):
         # visit rhs (expression)
         self.visit_node(node.children[1])
-        # ste for lhs
-        ste = self.symbol_table.get(node.children[0], self.scope_stack)
-        op1 = self.exp_stack[-1]
-
-        # figure out if we're assigning to variable declared in a parent scope
-        # we can guarantee that child scope has higher scope_num than parent scope
-        if ste.declared_scope < self.scope_stack[-1]:
-            # if so, need to generate phi statement
-            # since we are in a conditional scope (if/else) and assigning
-            phi = self.phi_stack[-1]
-            phi.map[ste.node.symbol.lexeme] = ste
-            ste.assign_to_lexeme(self.main.basic_blocks[-1], op1.name)
-        # assign to var declared in same scope
-        elif ste.declared_scope == self.scope_stack[-1]:
-            ste.assign_to_lexeme(self.main.basic_blocks[-1], op1.name)
-        # ???
-        else:
-            raise ValueError("shouldn't be assigning to var declared in younger scope")
+        ste = self.env.get(node.children[0])
+        value = self.exp_stack.pop()
+        self.add_instr("store", value.type, [value, ste.slot])
 
     def _out_var(self, node):
-        ste = self.symbol_table.get(node, self.scope_stack)
-        if self.main.basic_blocks[-1] == ste.ir_names[-1][0]:
-            ir_name_to_use = ste.ir_names[-1][1]
-        else:
-            for basic_block, ir_name in ste.ir_names:
-                if basic_block in self.main.basic_blocks[-1].predecessors:
-                    ir_name_to_use = ir_name
-                    break
-        try:
-            self.exp_stack.append(Var(ir_name_to_use, node.type))
-        except UnboundLocalError as e:
-            print(node.symbol)
-            print(ste.ir_names)
-            print(self.main.basic_blocks)
-            print(self.main.basic_blocks[-1].predecessors)
-
-            raise e
+        ste = self.env.get(node)
+        t = LLVM_TYPES[ste.node.type]
+        self.exp_stack.append(self.add_instr("load", t, [ste.slot], align=4))
 
     ###### EXPRESSIONS #######
 
     def _out_int_literal(self, node):
-        self.add_line("%{} = alloca i32, align 4".format(self.reg_num))
-        self.add_line("store i32 {}, i32* %{}".format(node.symbol.value, self.reg_num))
-        self.reg_num += 1
-        self.add_line("%{} = load i32, i32* %{}, align 4".format(self.reg_num, self.reg_num - 1))
-        self.exp_stack.append(Var(self.reg_num, "i32"))
-        self.reg_num += 1
+        self.exp_stack.append(Const("i32", node.symbol.value))
 
     def _out_bool_literal(self, node):
-        bool_value = 1 if node.symbol.value else 0
-        self.add_line("%{} = alloca i1, align 4".format(self.reg_num))
-        self.add_line("store i1 {}, i1* %{}".format(bool_value, self.reg_num))
-        self.reg_num += 1
-        self.add_line("%{} = load i1, i1* %{}, align 4".format(self.reg_num, self.reg_num - 1))
-        self.exp_stack.append(Var(self.reg_num, "i1"))
-        self.reg_num += 1
+        self.exp_stack.append(Const("i1", node.symbol.value))
 
-    def _out_equality_exp(self, node):
+    def binary_op(self, opcode, t, **attrs):
         op2 = self.exp_stack.pop()
         op1 = self.exp_stack.pop()
-        self.add_line(f"%{self.reg_num} = icmp eq i32 %{op1.name}, %{op2.name}")
-        self.exp_stack.append(Var(self.reg_num, "i1"))
-        self.reg_num += 1
+        self.exp_stack.append(self.add_instr(opcode, t, [op1, op2], **attrs))
+
+    def _out_equality_exp(self, node):
+        self.binary_op("icmp", "i1", predicate="eq")
 
     def _out_plus_exp(self, node):
-        op2 = self.exp_stack.pop()
-        op1 = self.exp_stack.pop()
-        self.add_line("%{} = add i32 %{}, %{}".format(self.reg_num, op1.name, op2.name))
-        self.exp_stack.append(Var(self.reg_num, "i32"))
-        self.reg_num += 1
+        self.binary_op("add", "i32")
 
     def _out_minus_exp(self, node):
-        op2 = self.exp_stack.pop()
-        op1 = self.exp_stack.pop()
-        self.add_line("%{} = sub i32 %{}, %{}".format(self.reg_num, op1.name, op2.name))
-        self.exp_stack.append(Var(self.reg_num, "i32"))
-        self.reg_num += 1
+        self.binary_op("sub", "i32")
 
     def _out_times_exp(self, node):
-        op2 = self.exp_stack.pop()
-        op1 = self.exp_stack.pop()
-        self.add_line("%{} = mul i32 %{}, %{}".format(self.reg_num, op1.name, op2.name))
-        self.exp_stack.append(Var(self.reg_num, "i32"))
-        self.reg_num += 1
+        self.binary_op("mul", "i32")
+
+    def _out_call_exp(self, node):
+        count = len(node.children)
+        args = self.exp_stack[len(self.exp_stack) - count:]
+        del self.exp_stack[len(self.exp_stack) - count:]
+        self.exp_stack.append(self.add_instr("call", LLVM_TYPES[node.type], args, callee=node.symbol.lexeme))
 
     def _out_input_exp(self, node):
         """
@@ -335,20 +600,16 @@ class CodeGenVisitor(visit.DFSVisitor):
         define i32 @main() #0 {
           %1 = alloca [2 x i8], align 1
           %2 = getelementptr inbounds [2 x i8], [2 x i8]* %1, i32 0, i32 0
-          %3 = call i32 asm sideeffect "movl $$0x00000000, %edi\0Amovl $$0x00000002, %edx\0Amovl $$0, %eax\0Asyscall\0A", "={ax},{si},~{dirflag},~{fpsr},~{flags}"(i8* %2)
+          %3 = call i32 asm sideeffect "movl $$0x00000000, %edi\0Amovl $$0x00000002, %edx\0Amovl $$0, %eax\0Asyscall\0A", "={ax},{si},~{rdi},~{rdx},~{rcx},~{r11},~{memory},~{dirflag},~{fpsr},~{flags}"(i8* %2)
           %5 = load i8, i8* %2, align 1
           %6 = sext i8 %5 to i32
           ret i32 %6
         }
         """
-        self.add_line("%{} = alloca [2 x i8], align 1".format(self.reg_num))
-        self.reg_num += 1
-        self.add_line("%{} = getelementptr inbounds [2 x i8], [2 x i8]* %{}, i32 0, i32 0".format(self.reg_num, self.reg_num - 1))
-        self.reg_num += 1
-        self.add_line('%{} = call i32 asm sideeffect "movl $$0x00000000, %edi\\0Amovl $$0x00000002, %edx\\0Amovl $$0, %eax\\0Asyscall\\0A", "={{ax}},{{si}},~{{dirflag}},~{{fpsr}},~{{flags}}"(i8* %{})'.format(self.reg_num, self.reg_num - 1))
-        self.reg_num += 1
-        self.add_line("%{} = load i8, i8* %{}, align 1".format(self.reg_num, self.reg_num - 2))
-        self.reg_num += 1
-        self.add_line("%{} = sext i8 %{} to i32".format(self.reg_num, self.reg_num - 1))
-        self.exp_stack.append(Var(self.reg_num, "i32"))
-        self.reg_num += 1
\ No newline at end of file
+        buffer = self.add_instr("alloca", "[2 x i8]*", allocated="[2 x i8]", align=1)
+        char = self.add_instr("getelementptr", "i8*", [buffer, Const("i32", 0), Const("i32", 0)],
+                              source="[2 x i8]")
+        self.add_instr("asm", "i32", [char],
+                       template=READ_SYSCALL, constraints=READ_SYSCALL_CONSTRAINTS)
+        loaded = self.add_instr("load", "i8", [char], align=1)
+        self.exp_stack.append(self.add_instr("sext", "i32", [loaded]))
@@ -0,0 +1,68 @@
+"""
+global value numbering
+
+walks the dominator tree, remembering every pure computation it has seen
+ on the way down. an instruction that computes the same thing as one in a
+ dominating block (or earlier in its own block) is replaced by that
+ instruction's result. what was seen in one subtree is forgotten before
+ walking its siblings, since those blocks aren't dominated by it
+"""
+from typing import Dict, List, Tuple
+
+from cheer import cfg
+from cheer import gen_ir
+
+# opcodes whose result only depends on their operands
+NUMBERED_OPCODES = {"add", "sub", "mul", "icmp", "sext", "getelementptr"}
+
+# opcodes where the operands can be swapped
+COMMUTATIVE_OPCODES = {"add", "mul"}
+COMMUTATIVE_PREDICATES = {"eq", "ne"}
+
+
+def operand_key(value: 'gen_ir.Value'):
+    if isinstance(value, gen_ir.Const):
+        return (0, value.type, int(value.value))
+    return (1, id(value))
+
+
+def expression_key(instr: 'gen_ir.Instruction') -> Tuple:
+    operands = [operand_key(operand) for operand in instr.operands]
+    if instr.opcode in COMMUTATIVE_OPCODES or \
+            instr.opcode == "icmp" and instr.attrs["predicate"] in COMMUTATIVE_PREDICATES:
+        operands.sort()
+    return (instr.opcode, instr.type, tuple(sorted(instr.attrs.items())), tuple(operands))
+
+
+def number_values(function: 'gen_ir.Function') -> int:
+    """
+    returns the number of instructions eliminated
+    """
+    tree = cfg.DominatorTree(function)
+    available: Dict[Tuple, 'gen_ir.Register'] = {}
+    eliminated = 0
+
+    # (block, keys it added, whether we're leaving it)
+    stack: List[Tuple['gen_ir.BasicBlock', List[Tuple], bool]] = [(tree.order[0], [], False)]
+    while stack:
+        block, added, leaving = stack.pop()
+        if leaving:
+            for key in added:
+                del available[key]
+            continue
+
+        for instr in list(block.instructions):
+            if instr.opcode not in NUMBERED_OPCODES:
+                continue
+            key = expression_key(instr)
+            earlier = available.get(key)
+            if earlier is not None:
+                instr.replace_with(earlier)
+                eliminated += 1
+            else:
+                available[key] = instr.value
+                added.append(key)
+
+        stack.append((block, added, True))
+        stack.extend((child, [], False) for child in reversed(tree.children[block]))
+    return eliminated
@@ -0,0 +1,146 @@
+"""
+inline function calls
+
+a call is replaced by a copy of the function it calls: the block with the
+ call is split in two, the copied blocks go in between, with the arguments
+ in place of the parameters, and each ret jumps to the second half instead
+ (a phi there picks the return value when there's more than one ret)
+
+functions are inlined when they are small, or when they are only called
+ from one place and not too big. a function that can end up calling
+ itself is never inlined. afterwards the functions nothing calls anymore
+ are dropped, except main
+"""
+from typing import Dict, List, Set
+
+from cheer import cfg
+from cheer import gen_ir
+
+# a function this many instructions or less is inlined everywhere
+SMALL_FUNCTION = 12
+# the most instructions a function called once can have to be inlined
+INLINE_BUDGET = 200
+
+
+def calls(function: 'gen_ir.Function') -> List['gen_ir.Instruction']:
+    return [instr for instr in function.instructions() if instr.opcode == "call"]
+
+
+def size(function: 'gen_ir.Function') -> int:
+    return sum(1 for _ in function.instructions())
+
+
+def recursive(module: 'gen_ir.Module') -> Set[str]:
+    """
+    names of the functions that can call themselves, directly or not
+    """
+    callees = {function.name: set(call.attrs["callee"] for call in calls(function)) for function in module.functions}
+    found = set()
+    for name in callees:
+        seen: Set[str] = set()
+        unexamined = list(callees[name])
+        while unexamined:
+            look_at = unexamined.pop()
+            if look_at == name:
+                found.add(name)
+                break
+            if look_at in seen or look_at not in callees:
+                continue
+            seen.add(look_at)
+            unexamined.extend(callees[look_at])
+    return found
+
+
+def inline_call(caller: 'gen_ir.Function', call: 'gen_ir.Instruction', callee: 'gen_ir.Function', number: int):
+    block = call.parent
+    prefix = f"{callee.name}.{number}."
+    after = gen_ir.BasicBlock(f"{prefix}ret")
+
+    # everything after the call moves to the block control returns to
+    index = block.instructions.index(call)
+    for instr in block.instructions[index + 1:]:
+        after.add_instr(instr)
+    del block.instructions[index + 1:]
+    for successor in after.successors:
+        for phi in successor.phis():
+            phi.blocks = [after if pred is block else pred for pred in phi.blocks]
+
+    values: Dict[gen_ir.Value, gen_ir.Value] = dict(zip(callee.params, call.operands))
+    blocks = {old: gen_ir.BasicBlock(prefix + old.name) for old in callee.basic_blocks}
+    results: Dict[gen_ir.Register, gen_ir.Register] = {}
+    for instr in callee.instructions():
+        if instr.result is not None:
+            values[instr.result] = results[instr.result] = gen_ir.Register(instr.result.type)
+
+    returned = []
+    entry = caller.basic_blocks[0]
+    for old in callee.basic_blocks:
+        new = blocks[old]
+        for instr in old.instructions:
+            operands = [values.get(operand, operand) for operand in instr.operands]
+            if instr.opcode == "ret":
+                returned.append((operands[0], new))
+                new.add_instr(gen_ir.Instruction("br", None, blocks=[after]))
+                continue
+            copy_result = results[instr.result] if instr.result is not None else None
+            copy = gen_ir.Instruction(instr.opcode, instr.type, operands, copy_result,
+                                      [blocks[target] for target in instr.blocks], **instr.attrs)
+            if instr.opcode == "alloca":
+                # stack slots stay in the entry block, even if the call is in a loop
+                entry.insert_instr(entry.alloca_end(), copy)
+            else:
+                new.add_instr(copy)
+
+    if len(returned) == 1:
+        result: gen_ir.Value = returned[0][0]
+    else:
+        result = gen_ir.Register(call.type)
+        phi = gen_ir.Instruction("phi", call.type, [], result)
+        for value, from_block in returned:
+            phi.add_incoming(value, from_block)
+        after.insert_instr(0, phi)
+    call.replace_with(result)
+    block.add_instr(gen_ir.Instruction("br", None, blocks=[blocks[callee.basic_blocks[0]]]))
+
+    position = caller.basic_blocks.index(block) + 1
+    caller.basic_blocks[position:position] = [blocks[old] for old in callee.basic_blocks] + [after]
+    cfg.recompute_predecessors(caller)
+
+
+def inline_functions(module: 'gen_ir.Module', budget: int = INLINE_BUDGET) -> Dict[str, int]:
+    """
+    returns how many calls were inlined and how many functions were dropped
+    """
+    counts = {"calls inlined": 0, "functions removed": 0}
+    never = recursive(module)
+    changed = True
+    while changed:
+        changed = False
+        functions = {function.name: function for function in module.functions}
+        sites: Dict[str, int] = {}
+        for function in module.functions:
+            for call in calls(function):
+                sites[call.attrs["callee"]] = sites.get(call.attrs["callee"], 0) + 1
+        for caller in module.functions:
+            chosen = next((call for call in calls(caller) if worth_inlining(
+                functions[call.attrs["callee"]], sites, never, budget)), None)
+            if chosen is None:
+                continue
+            counts["calls inlined"] += 1
+            inline_call(caller, chosen, functions[chosen.attrs["callee"]], counts["calls inlined"])
+            # call sites have changed, count them again
+            changed = True
+            break
+
+    called = set(call.attrs["callee"] for function in module.functions for call in calls(function))
+    kept = [function for function in module.functions if function.name == "main" or function.name in called]
+    counts["functions removed"] = len(module.functions) - len(kept)
+    module.functions[:] = kept
+    return counts
+
+
+def worth_inlining(callee: 'gen_ir.Function', sites: Dict[str, int], never: Set[str], budget: int) -> bool:
+    if callee.name in never:
+        return False
+    n = size(callee)
+    return n <= SMALL_FUNCTION or sites[callee.name] == 1 and n <= budget
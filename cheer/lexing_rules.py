@@ -1,21 +1,24 @@
-from cheer.scanner import SymbolRule
+from cheer.scanner import SymbolRule, get_lexer
 
 RULES = [
     SymbolRule("fn", "function def"),
     SymbolRule("[0-9]+", "int literal", to_value=lambda x: int(x)),
-    SymbolRule("\(", "left paren"),
-    SymbolRule("\)", "right paren"),
+    SymbolRule(r"\(", "left paren"),
+    SymbolRule(r"\)", "right paren"),
     SymbolRule("{", "left brace"),
     SymbolRule("}", "right brace"),
-    SymbolRule("\+", "plus"),
+    SymbolRule(r"\+", "plus"),
     SymbolRule("-", "minus"),
-    SymbolRule("\*", "times"),
+    SymbolRule("->", "arrow"),
+    SymbolRule(r"\*", "times"),
     SymbolRule("return", "return"),
     SymbolRule("input", "input"),
     SymbolRule("if", "if"),
     SymbolRule("else", "else"),
+    SymbolRule("while", "while"),
     SymbolRule("==", "equality"),
     SymbolRule(";", "semicolon"),
+    SymbolRule(",", "comma"),
     SymbolRule("let", "let"),
     SymbolRule("=", "assign"),
     SymbolRule(":", "colon"),
@@ -25,4 +28,6 @@ RULES = [
     
     SymbolRule(r"[a-zA-z][\w]*", "id"),
     SymbolRule("[ \t\n]", "whitespace", add_symbol=False)
-]
\ No newline at end of file
+]
+
+TokenKind = get_lexer(tuple(RULES)).token_kinds()
@@ -0,0 +1,127 @@
+"""
+loop invariant code motion
+
+a loop is found from a back edge, a jump to a block (the header) that
+ dominates the block jumping. the loop is the header plus every block that
+ can reach that jump without going through the header
+
+an instruction in a loop that only depends on values from outside the loop
+ computes the same thing every time around, so it's moved to the loop's
+ preheader: a block that runs once, right before the loop is entered.
+ only pure instructions are moved, and none of them can trap, so it's fine
+ to run them even when the loop body never does
+
+inner loops are done first, what gets hoisted out of them can then be
+ hoisted out of the loops around them
+"""
+from typing import Dict, List, Set, Tuple
+
+from cheer import cfg
+from cheer import gen_ir
+from cheer import gvn
+
+
+def find_loops(function: 'gen_ir.Function', tree: 'cfg.DominatorTree') \
+        -> List[Tuple['gen_ir.BasicBlock', Set['gen_ir.BasicBlock']]]:
+    """
+    (header, blocks in the loop) for every loop, smallest first
+    back edges to the same header make one loop
+    """
+    loops: Dict[gen_ir.BasicBlock, Set[gen_ir.BasicBlock]] = {}
+    for block in tree.order:
+        for successor in block.successors:
+            if not tree.dominates(successor, block):
+                continue
+            body = loops.setdefault(successor, {successor})
+            unexamined = [block]
+            while unexamined:
+                look_at = unexamined.pop()
+                if look_at in body:
+                    continue
+                body.add(look_at)
+                unexamined.extend(pred for pred in look_at.predecessors if pred in tree.idom)
+    return sorted(loops.items(), key=lambda loop: len(loop[1]))
+
+
+def preheader(function: 'gen_ir.Function', header: 'gen_ir.BasicBlock', body: Set['gen_ir.BasicBlock']):
+    """
+    the block that jumps into the loop from outside it, made if there isn't one
+    """
+    outside = [pred for pred in function.basic_blocks if pred in header.predecessors and pred not in body]
+    if not outside:
+        return None
+    if len(outside) == 1 and outside[0].successors == [header]:
+        return outside[0]
+
+    pre = gen_ir.BasicBlock(f"{header.name}_pre")
+    for pred in outside:
+        cfg.retarget(pred, header, pre)
+    # the header's phis get one value from the preheader now, when that
+    #  could be one of several it's picked with a phi in the preheader
+    for phi in header.phis():
+        incoming = [(value, block) for value, block in zip(phi.operands, phi.blocks) if block in outside]
+        for pred in outside:
+            phi.remove_incoming(pred)
+        if len(set(cfg.value_key(value) for value, _ in incoming)) == 1:
+            value = incoming[0][0]
+        else:
+            value = gen_ir.Register(phi.type)
+            merge = gen_ir.Instruction("phi", phi.type, [], value)
+            for incoming_value, block in incoming:
+                merge.add_incoming(incoming_value, block)
+            pre.add_instr(merge)
+        phi.add_incoming(value, pre)
+    pre.add_instr(gen_ir.Instruction("br", None, blocks=[header]))
+    function.basic_blocks.insert(function.basic_blocks.index(header), pre)
+    cfg.recompute_predecessors(function)
+    return pre
+
+
+def invariants(function: 'gen_ir.Function', body: Set['gen_ir.BasicBlock']) -> List['gen_ir.Instruction']:
+    """
+    the instructions of the loop that only depend on values from outside it,
+     or on other instructions in the list before them
+    """
+    found: List[gen_ir.Instruction] = []
+    seen: Set[gen_ir.Instruction] = set()
+    changed = True
+    while changed:
+        changed = False
+        for block in function.basic_blocks:
+            if block not in body:
+                continue
+            for instr in block.instructions:
+                if instr.opcode not in gvn.NUMBERED_OPCODES or instr in seen:
+                    continue
+                if all(operand.definition is None or operand.definition.block not in body
+                       or operand.definition in seen for operand in instr.uses):
+                    found.append(instr)
+                    seen.add(instr)
+                    changed = True
+    return found
+
+
+def hoist_invariants(function: 'gen_ir.Function') -> int:
+    """
+    returns the number of instructions moved out of loops
+    """
+    tree = cfg.DominatorTree(function)
+    loops = find_loops(function, tree)
+    hoisted = 0
+    for header, body in loops:
+        instrs = invariants(function, body)
+        if not instrs:
+            continue
+        pre = preheader(function, header, body)
+        if pre is None:
+            continue
+        # a new preheader is inside any loop around this one
+        for _, other in loops:
+            if other is not body and header in other:
+                other.add(pre)
+        for instr in instrs:
+            instr.parent.unlink(instr)
+            # right before the jump into the loop
+            pre.insert_instr(len(pre.instructions) - 1, instr)
+        hoisted += len(instrs)
+    return hoisted
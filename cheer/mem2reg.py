@@ -0,0 +1,145 @@
+"""
+promote stack slots to ssa values
+
+codegen gives every variable an alloca, stores to it on assignment and
+ loads from it on use. an alloca of a plain value (not an array) that is
+ only ever loaded from and stored to is just a variable, so it can be
+ turned into ssa values:
+
+1. phis go in the iterated dominance frontier of the blocks that store to
+    the slot, the places where different stores can meet. only where the
+    variable is live though (pruned ssa), a phi nothing reads is useless
+2. walk the dominator tree, keeping for every block a map of each slot to
+    the value it holds at the end of that block. a block starts with its
+    immediate dominator's map. loads become the current value, stores
+    just change it
+3. fill in each phi with the value from the end of each predecessor
+
+(Cytron et al, "Efficiently Computing Static Single Assignment Form and
+ the Control Dependence Graph")
+"""
+from typing import Dict, Set
+
+from cheer import cfg
+from cheer import gen_ir
+
+
+def promotable(alloca: 'gen_ir.Instruction') -> bool:
+    slot = alloca.value
+    if alloca.attrs["allocated"] not in gen_ir.LLVM_TYPES.values():
+        return False
+    for instr in slot.uses:
+        if instr.opcode == "load":
+            continue
+        # storing to the slot is fine, storing its address somewhere isn't
+        if instr.opcode == "store" and instr.operands[0] is not slot:
+            continue
+        return False
+    return True
+
+
+def live_in(function: 'gen_ir.Function', slots) -> Dict['gen_ir.BasicBlock', Set['gen_ir.Register']]:
+    """
+    the slots each block might load before storing to them
+    """
+    upward: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {}
+    stored: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {}
+    for block in function.basic_blocks:
+        upward[block] = set()
+        stored[block] = set()
+        for instr in block.instructions:
+            if instr.opcode == "load" and instr.operands[0] in slots:
+                if instr.operands[0] not in stored[block]:
+                    upward[block].add(instr.operands[0])
+            elif instr.opcode == "store" and instr.operands[1] in slots:
+                stored[block].add(instr.operands[1])
+
+    live = {block: set(upward[block]) for block in function.basic_blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(function.basic_blocks):
+            live_out: Set[gen_ir.Register] = set()
+            for successor in block.successors:
+                live_out |= live[successor]
+            new = upward[block] | (live_out - stored[block])
+            if new != live[block]:
+                live[block] = new
+                changed = True
+    return live
+
+
+def place_phis(tree, slots, live) -> Dict['gen_ir.Instruction', 'gen_ir.Register']:
+    """
+    returns which slot each new phi is for
+    """
+    frontiers = tree.frontiers()
+    phi_slots: Dict[gen_ir.Instruction, gen_ir.Register] = {}
+    for slot, t in slots.items():
+        def_blocks = [instr.block for instr in slot.uses if instr.opcode == "store"]
+        has_phi: Set[int] = set()
+        unexamined = list(def_blocks)
+        while unexamined:
+            block = unexamined.pop()
+            for frontier in frontiers.get(block, ()):
+                if id(frontier) in has_phi or slot not in live[frontier]:
+                    continue
+                phi = gen_ir.Instruction("phi", t, [], gen_ir.Register(t))
+                frontier.insert_instr(0, phi)
+                phi_slots[phi] = slot
+                has_phi.add(id(frontier))
+                if frontier not in def_blocks:
+                    unexamined.append(frontier)
+    return phi_slots
+
+
+def promote_allocas(function: 'gen_ir.Function') -> int:
+    """
+    returns the number of allocas promoted
+    """
+    allocas = [instr for instr in function.instructions() if instr.opcode == "alloca" and promotable(instr)]
+    if not allocas:
+        return 0
+    # slot -> type of the value in it
+    slots = {alloca.result: alloca.attrs["allocated"] for alloca in allocas}
+
+    tree = cfg.DominatorTree(function)
+    phi_slots = place_phis(tree, slots, live_in(function, slots))
+
+    # value each slot has at the end of each block
+    defined_at_end: Dict[gen_ir.BasicBlock, Dict[gen_ir.Register, gen_ir.Value]] = {}
+    # a variable read before it's ever set (on some path) reads 0
+    undefined = {slot: gen_ir.Const(t, 0) for slot, t in slots.items()}
+    for block in tree.preorder():
+        parent = tree.idom[block]
+        current = dict(defined_at_end[parent] if parent is not None else undefined)
+        rename(block, slots, phi_slots, current)
+        defined_at_end[block] = current
+    # blocks that can't run still need their loads and stores gone
+    for block in function.basic_blocks:
+        if block not in tree.idom:
+            rename(block, slots, phi_slots, dict(undefined))
+
+    for phi, slot in phi_slots.items():
+        for pred in function.basic_blocks:
+            if pred in phi.parent.predecessors:
+                phi.add_incoming(defined_at_end.get(pred, undefined)[slot], pred)
+
+    for alloca in allocas:
+        alloca.erase()
+    # a phi still isn't needed when every path stores the same value,
+    #  ex: phi i32 [1, %a], [1, %b]
+    while sum(cfg.simplify_phis(block) for block in function.basic_blocks) > 0:
+        pass
+    return len(allocas)
+
+
+def rename(block, slots, phi_slots, current):
+    for instr in list(block.instructions):
+        if instr.opcode == "phi" and instr in phi_slots:
+            current[phi_slots[instr]] = instr.result
+        elif instr.opcode == "load" and instr.operands[0] in slots:
+            instr.replace_with(current[instr.operands[0]])
+        elif instr.opcode == "store" and instr.operands[1] in slots:
+            current[instr.operands[1]] = instr.operands[0]
+            instr.erase()
@@ -1,139 +1,257 @@
-from typing import List
+import collections
+from typing import Deque, Iterable, Iterator, List, Optional
 
 from cheer import scanner
 from cheer import ast
+from cheer.lexing_rules import TokenKind
+
+
+# token kind -> (precedence, node type)
+# higher precedence binds tighter, all of them are left associative
+# adding a binary operator only needs an entry here (and its lexing rule)
+BINARY_OPERATORS = {
+    TokenKind.EQUALITY: (1, "equality_exp"),
+    TokenKind.PLUS: (2, "plus_exp"),
+    TokenKind.MINUS: (2, "minus_exp"),
+    TokenKind.TIMES: (3, "times_exp"),
+}
+
+
+class TokenStream:
+    """
+    cursor over the tokens the parser consumes
+
+    tokens can be a list or a lazy iterator (ex: scanner.iter_scan), only the
+     lookahead buffer is held on to, so tokens are dropped once consumed
+    """
+    def __init__(self, tokens: Iterable[scanner.Symbol]):
+        self.tokens: Iterator[scanner.Symbol] = iter(tokens)
+        self.buffer: Deque[scanner.Symbol] = collections.deque()
+        self.eof = scanner.Symbol("EOF", "$", -1, -1, -1, TokenKind.EOF)
+
+    def peek(self, k=0):
+        """
+        look at the token k tokens ahead of the cursor without consuming it
+        """
+        while len(self.buffer) <= k:
+            self.buffer.append(next(self.tokens, self.eof))
+        return self.buffer[k]
+
+    def advance(self):
+        token = self.peek()
+        self.buffer.popleft()
+        return token
+
+
+def token_name(kind) -> str:
+    """
+    for error messages, ex: TokenKind.LEFT_PAREN is "left paren"
+    """
+    return TokenKind(kind).name.lower().replace("_", " ")
 
 
 class Parser:
-    def __init__(self, tokens: List[scanner.Symbol]):
-        self.tokens = tokens
-        self.tokens.append(scanner.Symbol("EOF", "$", -1, -1, -1))
+    def __init__(self, tokens: Iterable[scanner.Symbol], arena=False, diagnostics: Optional[List[str]] = None):
+        self.tokens = TokenStream(tokens)
+        # if set, the AST is built in this flat arena, and nodes are views into it
+        self.arena: Optional[ast.Arena] = ast.Arena() if arena else None
+        # if set, errors are added to this list instead of printed
+        self.diagnostics = diagnostics
+        self.errors = 0
 
     def peek(self):
-        return self.tokens[0]
+        return self.tokens.peek()
 
     def error(self, e):
-        print(e)
+        self.errors += 1
+        if self.diagnostics is None:
+            print(e)
+        else:
+            self.diagnostics.append(e)
 
     def start(self):
-        root = self.fn()
+        root = self.program()
 
-        if self.peek().token != "EOF":
+        if self.peek().kind != TokenKind.EOF:
             self.error(f"Expected end of file, got {self.peek()}")
 
         return root
 
-    def match(self, token):
+    def node(self, ntype, symbol, children=None):
+        """
+        a new ast node, made in the arena if there is one
+        """
+        if self.arena is not None:
+            return self.arena.add(ast.NodeKind[ntype], symbol, children or ())
+        return ast.ASTNode(ntype, symbol, children)
+
+    def match(self, kind):
         peek = self.peek()
-        if peek.token == token:
-            self.tokens = self.tokens[1:]
-            return peek
+        if peek.kind == kind:
+            return self.tokens.advance()
         else:
-            self.error(f"Expected {token}, saw {peek}")
+            self.error(f"Expected {token_name(kind)}, saw {peek}")
+
+    def program(self):
+        """
+        Prog -> Fn Prog | Fn
+        """
+        functions = [self.fn()]
+        while self.peek().kind == TokenKind.FUNCTION_DEF:
+            functions.append(self.fn())
+        return self.node("program", functions[0].symbol, functions)
 
     def fn(self):
-        self.match("function def")
-        f = self.match("id")
-        self.match("left paren")
-        self.match("right paren")
-        self.match("left brace")
-        s = self.statement_list()
-        self.match("right brace")
-        return ast.ASTNode("main", f, [s])
+        """
+        Fn -> fn id (Params) { L } | fn id (Params) -> Ty { L }
+        """
+        self.match(TokenKind.FUNCTION_DEF)
+        f = self.match(TokenKind.ID)
+        params = self.params()
+        children = [params]
+        # no return type means i32
+        if self.peek().kind == TokenKind.ARROW:
+            self.match(TokenKind.ARROW)
+            children.append(self.type_decl())
+        self.match(TokenKind.LEFT_BRACE)
+        children.append(self.statement_list())
+        self.match(TokenKind.RIGHT_BRACE)
+        # children are:
+        #  params, return type (if given), body statement list
+        return self.node("function", f, children)
+
+    def params(self):
+        """
+        Params -> id: Ty, Params | id: Ty | <empty>
+        """
+        p = self.match(TokenKind.LEFT_PAREN)
+        params = []
+        while self.peek().kind == TokenKind.ID:
+            i = self.match(TokenKind.ID)
+            self.match(TokenKind.COLON)
+            params.append(self.node("param", i, [self.type_decl()]))
+            if self.peek().kind != TokenKind.COMMA:
+                break
+            self.match(TokenKind.COMMA)
+        self.match(TokenKind.RIGHT_PAREN)
+        return self.node("params", p, params)
 
     def statement_list(self):
         """
         L -> S L | S
         assume all statement lists must end if next token is }
         """
-        statements = []
-        s = self.statement()
-        statements.append(s)
-        while self.peek().token != "right brace":
+        # the first statement might not parse, so the list goes by its first token
+        symbol = self.peek()
+        statements = [self.statement()]
+        while self.peek().kind not in (TokenKind.RIGHT_BRACE, TokenKind.EOF):
             statements.append(self.statement())
-        return ast.ASTNode("statement_list", s.symbol, statements)
+        # leave out the statements that didn't parse
+        return self.node("statement_list", symbol, [s for s in statements if s is not None])
 
     def statement(self):
         """
         S -> R
         S -> If
+        S -> While
         S -> Let
         S -> Ass
         """
         peek = self.peek()
 
-        if peek.token == "return":
+        if peek.kind == TokenKind.RETURN:
             return self.return_statement()
-        elif peek.token == "if":
+        elif peek.kind == TokenKind.IF:
             return self.if_statement()
+        elif peek.kind == TokenKind.WHILE:
+            return self.while_statement()
 
-        elif peek.token == "let":
+        elif peek.kind == TokenKind.LET:
             return self.var_decl_statement()
         
-        elif peek.token == "id":
+        elif peek.kind == TokenKind.ID:
             return self.assign_statement()
-            
+
+        self.error(f"Expected a statement, saw {peek}")
+        # skip it so we don't get stuck on it, but leave the end of the block for the caller
+        if peek.kind not in (TokenKind.RIGHT_BRACE, TokenKind.EOF):
+            self.tokens.advance()
 
     def return_statement(self):
         """
         R -> return E
         """
-        r = self.match("return")
+        r = self.match(TokenKind.RETURN)
         e = self.expr()
-        self.match("semicolon")
-        return ast.ASTNode("return", r, [e])
+        self.match(TokenKind.SEMICOLON)
+        return self.node("return", r, [e])
 
     def if_statement(self):
         """
         If -> if (E) { L } | if (E) { L } else { L }
         """
-        i = self.match("if")
-        self.match("left paren")
+        i = self.match(TokenKind.IF)
+        self.match(TokenKind.LEFT_PAREN)
         e = self.expr()
-        self.match("right paren")
-        self.match("left brace")
+        self.match(TokenKind.RIGHT_PAREN)
+        self.match(TokenKind.LEFT_BRACE)
         l1 = self.statement_list()
-        self.match("right brace")
-        if self.peek().token == "else":
-            self.match("else")
-            self.match("left brace")
+        self.match(TokenKind.RIGHT_BRACE)
+        if self.peek().kind == TokenKind.ELSE:
+            self.match(TokenKind.ELSE)
+            self.match(TokenKind.LEFT_BRACE)
             l2 = self.statement_list()
-            self.match("right brace")
+            self.match(TokenKind.RIGHT_BRACE)
             # children are:
             #  expression condition, if statement list, else statment list
-            return ast.ASTNode("if_statement", i, [e, l1, l2])
+            return self.node("if_statement", i, [e, l1, l2])
             
         # children are:
         #  expression condition, if statement list
-        return ast.ASTNode("if_statement", i, [e, l1])
+        return self.node("if_statement", i, [e, l1])
+
+    def while_statement(self):
+        """
+        While -> while (E) { L }
+        """
+        w = self.match(TokenKind.WHILE)
+        self.match(TokenKind.LEFT_PAREN)
+        e = self.expr()
+        self.match(TokenKind.RIGHT_PAREN)
+        self.match(TokenKind.LEFT_BRACE)
+        body = self.statement_list()
+        self.match(TokenKind.RIGHT_BRACE)
+        # children are:
+        #  expression condition, loop body statement list
+        return self.node("while_statement", w, [e, body])
 
     def var_decl_statement(self):
         """
         Let -> let id = E; | let id: Ty;
         """
-        self.match("let")
-        i = self.match("id")
+        self.match(TokenKind.LET)
+        i = self.match(TokenKind.ID)
         # let id = E
-        if self.peek().token == "assign":
-            self.match("assign")
+        if self.peek().kind == TokenKind.ASSIGN:
+            self.match(TokenKind.ASSIGN)
             e = self.expr()
-            self.match("semicolon")
-            return ast.ASTNode("var_decl_assign", i, [e])
+            self.match(TokenKind.SEMICOLON)
+            return self.node("var_decl_assign", i, [e])
         # let id: Ty
-        self.match("colon")
+        self.match(TokenKind.COLON)
         ty = self.type_decl()
-        self.match("semicolon")
-        return ast.ASTNode("var_decl", i, [ty])
+        self.match(TokenKind.SEMICOLON)
+        return self.node("var_decl", i, [ty])
 
     def type_decl(self):
         """
         Ty -> i32 | bool | <id>
         """
         peek = self.peek()
-        valid_type_tokens = ["i32", "bool", "id"]
-        if peek.token in valid_type_tokens:
-            t = self.match(peek.token)
-            return ast.ASTNode(peek.token, t, None)
+        if peek.kind in (TokenKind.I32, TokenKind.BOOL, TokenKind.ID):
+            t = self.match(peek.kind)
+            # the node type is the token name, ex: i32
+            return self.node(t.token, t, None)
         self.error(f"Expected a type found: {peek}")
 
     def assign_statement(self):
@@ -141,93 +259,123 @@ class Parser:
         Ass -> id = E
         """
         lhs = self.var()
-        e = self.match("assign")
+        e = self.match(TokenKind.ASSIGN)
         ex = self.expr()
-        self.match("semicolon")
-        return ast.ASTNode("assignment", e, [lhs, ex])
+        self.match(TokenKind.SEMICOLON)
+        return self.node("assignment", e, [lhs, ex])
 
     def expr(self):
         """
-        E -> T
-        E -> T == T
-        """
-        t = self.term()
-        peek = self.peek()
-        if peek.token == "equality":
-            e = self.match("equality")
-            t2 = self.term()
-            return ast.ASTNode("equality_exp", e, [t, t2])
-        return t
-        
+        E -> P | E op E
+        with op and its precedence from BINARY_OPERATORS
 
-    def term(self):
-        """
-        T -> F | F + T | F - T 
+        operator precedence parsing with explicit operand and operator stacks,
+         so the depth of the python stack doesn't depend on how long the
+         expression is or how deeply its parentheses nest
         """
-        left = self.factor()
-        peek = self.peek()
-        if peek.token == "plus":
-            plus = self.match("plus")
-            right = self.term()
-            return ast.ASTNode("plus_exp", plus, [left, right])
-        elif peek.token == "minus":
-            minus = self.match("minus")
-            right = self.term()
-            return ast.ASTNode("minus_exp", minus, [left, right])
+        operands: List[ast.ASTNode] = []
+        # symbols of binary operators not reduced yet, and open parens
+        operators: List[scanner.Symbol] = []
+        open_parens = 0
 
-        return left
+        while True:
+            while self.peek().kind == TokenKind.LEFT_PAREN:
+                operators.append(self.match(TokenKind.LEFT_PAREN))
+                open_parens += 1
 
-    def factor(self):
+            operands.append(self.primary())
+
+            # a right paren when none are open belongs to the caller, ex: if (E)
+            while open_parens > 0 and self.peek().kind == TokenKind.RIGHT_PAREN:
+                self.match(TokenKind.RIGHT_PAREN)
+                while operators[-1].kind != TokenKind.LEFT_PAREN:
+                    self.reduce(operands, operators)
+                operators.pop()
+                open_parens -= 1
+
+            peek = self.peek()
+            if peek.kind not in BINARY_OPERATORS:
+                break
+            precedence, _ = BINARY_OPERATORS[peek.kind]
+            # everything is left associative, so reduce operators that bind
+            #  at least as tightly as this one first
+            while operators and operators[-1].kind != TokenKind.LEFT_PAREN \
+                    and BINARY_OPERATORS[operators[-1].kind][0] >= precedence:
+                self.reduce(operands, operators)
+            operators.append(self.match(peek.kind))
+
+        if open_parens > 0:
+            self.match(TokenKind.RIGHT_PAREN)
+        while operators:
+            if operators[-1].kind == TokenKind.LEFT_PAREN:
+                operators.pop()
+            else:
+                self.reduce(operands, operators)
+
+        return operands[-1]
+
+    def reduce(self, operands: List[ast.ASTNode], operators: List[scanner.Symbol]):
         """
-        F -> P | P * F
+        replace the top two operands with the top operator applied to them
         """
-        left = self.paren()
-        peek = self.peek()
-        if peek.token == "times":
-            times = self.match("times")
-            right = self.factor()
-            return ast.ASTNode("times_exp", times, [left, right])
+        op = operators.pop()
+        right = operands.pop()
+        left = operands.pop()
+        _, ntype = BINARY_OPERATORS[op.kind]
+        operands.append(self.node(ntype, op, [left, right]))
 
-        return left
-
-    def paren(self):
+    def primary(self):
         """
-        P -> I | (E) | input | bool | Var
+        P -> I | input | bool | Call | Var
+        (E) is handled by expr
         """
         peek = self.peek()
-        if peek.token == "left paren":
-            self.match("left paren")
-            ex = self.term()
-            self.match("right paren")
-            return ex
-        elif peek.token == "int literal":
+        if peek.kind == TokenKind.INT_LITERAL:
             return self.int_literal()
-        elif peek.token == "input":
-            i = self.match("input")
-            self.match("left paren")
-            self.match("right paren")
-            return ast.ASTNode("input_exp", i, None)
-        elif peek.token == "bool_literal":
+        elif peek.kind == TokenKind.INPUT:
+            i = self.match(TokenKind.INPUT)
+            self.match(TokenKind.LEFT_PAREN)
+            self.match(TokenKind.RIGHT_PAREN)
+            return self.node("input_exp", i, None)
+        elif peek.kind == TokenKind.BOOL_LITERAL:
             return self.bool_literal()
-        elif peek.token == "id":
+        elif peek.kind == TokenKind.ID and self.tokens.peek(1).kind == TokenKind.LEFT_PAREN:
+            return self.call()
+        elif peek.kind == TokenKind.ID:
             return self.var()
 
         self.error(f"unexpected {peek}")
 
+    def call(self):
+        """
+        Call -> id(Args)
+        Args -> E, Args | E | <empty>
+        """
+        i = self.match(TokenKind.ID)
+        self.match(TokenKind.LEFT_PAREN)
+        args = []
+        while self.peek().kind not in (TokenKind.RIGHT_PAREN, TokenKind.EOF):
+            args.append(self.expr())
+            if self.peek().kind != TokenKind.COMMA:
+                break
+            self.match(TokenKind.COMMA)
+        self.match(TokenKind.RIGHT_PAREN)
+        return self.node("call_exp", i, args)
+
     def var(self):
         """
         Var -> id
         """
-        i = self.match("id")
-        return ast.ASTNode("var", i, None)
+        i = self.match(TokenKind.ID)
+        return self.node("var", i, None)
 
     def int_literal(self):
-        sym = self.match("int literal")
-        return ast.ASTNode("int_literal", sym, None)
+        sym = self.match(TokenKind.INT_LITERAL)
+        return self.node("int_literal", sym, None)
 
     def bool_literal(self):
-        s = self.match("bool_literal")
-        return ast.ASTNode("bool_literal", s, None)
+        s = self.match(TokenKind.BOOL_LITERAL)
+        return self.node("bool_literal", s, None)
             
 
 if __name__ == "__main__":
@@ -235,8 +383,6 @@ if __name__ == "__main__":
     import sys
     fname = sys.argv[1]
     with open(fname) as f:
-        symbols = scanner.scan(f, RULES)
-
-    p = Parser(symbols)
-    root = p.start()
+        p = Parser(scanner.iter_scan(f, RULES))
+        root = p.start()
     print(ast.gen_ast_digraph(root))
@@ -0,0 +1,230 @@
+"""
+optimization pass manager
+
+a pass is registered with a name, whether it works on the ast (along with
+ type checking, before codegen), on each gen_ir function or on the whole gen_ir
+ module, and the passes it has to run after when they're both in a pipeline. -O levels are just
+ lists of pass names, and so is --passes
+
+an ast pass is a visitor, and all of them share one walk over the tree with
+ the type checker (see visit.FusedVisitor)
+
+every pass run is recorded: how long it took, the size of what it worked
+ on before and after (ast nodes, or ir instructions), and what it changed
+"""
+import argparse
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from cheer import cfg
+from cheer import dce
+from cheer import fold
+from cheer import gvn
+from cheer import inline
+from cheer import licm
+from cheer import mem2reg
+from cheer import peephole
+from cheer import visit
+
+
+class Pass:
+    __slots__ = ["name", "kind", "run", "after"]
+
+    def __init__(self, name: str, kind: str, run: Callable, after: Sequence[str]):
+        self.name = name
+        self.kind = kind # "ast", "ir" or "module"
+        # returns a count of changes, or a dict of counts
+        # an ast pass returns its visitor instead, and how to count its changes after the walk
+        self.run = run
+        self.after = after
+
+    def __repr__(self):
+        return f"Pass<{self.name}>"
+
+
+PASSES: Dict[str, Pass] = {}
+
+
+def register(name: str, kind: str, after: Sequence[str] = ()):
+    def decorator(run):
+        PASSES[name] = Pass(name, kind, run, after)
+        return run
+    return decorator
+
+
+@register("fold", "ast")
+def run_fold(ast_root):
+    folder = fold.FoldingVisitor(ast_root)
+    return folder, lambda: folder.folded
+
+
+@register("mem2reg", "ir")
+def run_mem2reg(function):
+    return mem2reg.promote_allocas(function)
+
+
+@register("inline", "module", after=["mem2reg"])
+def run_inline(module):
+    return inline.inline_functions(module)
+
+
+@register("simplify-cfg", "ir", after=["mem2reg", "inline"])
+def run_simplify_cfg(function):
+    return cfg.simplify_cfg(function)
+
+
+@register("gvn", "ir", after=["mem2reg", "inline", "simplify-cfg"])
+def run_gvn(function):
+    return gvn.number_values(function)
+
+
+@register("licm", "ir", after=["mem2reg", "inline", "simplify-cfg", "gvn"])
+def run_licm(function):
+    return licm.hoist_invariants(function)
+
+
+@register("peephole", "ir", after=["mem2reg", "inline", "gvn"])
+def run_peephole(function):
+    return peephole.optimize(function)
+
+
+@register("dce", "ir", after=["mem2reg", "inline", "simplify-cfg", "gvn", "licm", "peephole"])
+def run_dce(function):
+    return dce.eliminate_dead_code(function)
+
+
+LEVELS = {
+    0: [],
+    1: ["fold", "mem2reg", "simplify-cfg", "dce"],
+    2: ["fold", "mem2reg", "inline", "simplify-cfg", "gvn", "licm", "peephole", "dce"],
+}
+
+
+def pass_list(text: str) -> List[str]:
+    """
+    argparse type for --passes, ex: --passes=gvn,dce
+    """
+    names = [name.strip() for name in text.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PASSES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown passes: {', '.join(unknown)} (choose from {', '.join(PASSES)})")
+    return names
+
+
+def order(names: Sequence[str]) -> List[Pass]:
+    """
+    the passes in names, moved later when needed so each runs after the ones
+     it depends on. otherwise they keep the order they were given in
+    """
+    remaining = [PASSES[name] for name in dict.fromkeys(names)]
+    ordered: List[Pass] = []
+    while remaining:
+        waiting_on = set(p.name for p in remaining)
+        ready = next((p for p in remaining if not any(dep in waiting_on for dep in p.after)), None)
+        if ready is None:
+            raise ValueError(f"passes depend on each other: {remaining}")
+        ordered.append(ready)
+        remaining.remove(ready)
+    return ordered
+
+
+def count_nodes(root) -> int:
+    count = 0
+    unexamined = [root]
+    while unexamined:
+        node = unexamined.pop()
+        count += 1
+        unexamined.extend(node.children)
+    return count
+
+
+def count_instructions(module) -> int:
+    return sum(1 for function in module.functions for _ in function.instructions())
+
+
+class PassRecord:
+    __slots__ = ["name", "seconds", "before", "after", "changes", "counts"]
+
+    def __init__(self, name: str, seconds: float, before: int, after: int, result):
+        self.name = name
+        self.seconds = seconds
+        self.before = before
+        self.after = after
+        # passes like peephole count each kind of change
+        self.counts: Optional[Dict[str, int]] = result if isinstance(result, dict) else None
+        self.changes: int = sum(result.values()) if isinstance(result, dict) else result
+
+    @property
+    def changed(self) -> bool:
+        return self.changes > 0
+
+
+class PassManager:
+    def __init__(self, names: Sequence[str]):
+        self.passes = order(names)
+        self.records: List[PassRecord] = []
+
+    @classmethod
+    def from_options(cls, options) -> 'PassManager':
+        """
+        --passes if it was given, otherwise the -O level
+        """
+        names = getattr(options, "passes", None)
+        if names is None:
+            names = LEVELS[getattr(options, "opt_level", 2)]
+        return cls(names)
+
+    def run_ast(self, ast_root, checker: Optional[visit.DFSVisitor] = None):
+        """
+        the ast passes run in one walk over the tree, with checker (the type
+         checker) ahead of them, so a node is checked before any pass changes it
+        they can't be timed apart, so the walk gets one record
+        """
+        ast_passes = [p for p in self.passes if p.kind == "ast"]
+        made = [p.run(ast_root) for p in ast_passes]
+        visitors = [visitor for visitor, _ in made]
+        if checker is not None:
+            visitors.insert(0, checker)
+        if not ast_passes:
+            if checker is not None:
+                checker.accept()
+            return
+        before = count_nodes(ast_root)
+        start = time.perf_counter()
+        visit.FusedVisitor(ast_root, visitors).accept()
+        seconds = time.perf_counter() - start
+        counts = {p.name: count() for p, (_, count) in zip(ast_passes, made)}
+        result = counts if len(counts) > 1 else counts[ast_passes[0].name]
+        self.records.append(PassRecord("+".join(counts), seconds, before, count_nodes(ast_root), result))
+
+    def run_ir(self, module):
+        for p in self.passes:
+            if p.kind == "ast":
+                continue
+            before = count_instructions(module)
+            start = time.perf_counter()
+            result: Dict[str, int] = {}
+            changes = 0
+            # a module pass runs once, on all the functions together
+            runs = [p.run(module)] if p.kind == "module" else [p.run(function) for function in module.functions]
+            for run_result in runs:
+                if isinstance(run_result, dict):
+                    for k, v in run_result.items():
+                        result[k] = result.get(k, 0) + v
+                else:
+                    changes += run_result
+            seconds = time.perf_counter() - start
+            self.records.append(PassRecord(p.name, seconds, before, count_instructions(module),
+                                           result or changes))
+
+    def report(self) -> str:
+        lines = [f"{'pass':<14}{'time (ms)':>10}{'before':>8}{'after':>8}{'changes':>9}"]
+        for record in self.records:
+            lines.append(f"{record.name:<14}{record.seconds * 1000:>10.3f}{record.before:>8}"
+                         f"{record.after:>8}{record.changes:>9}")
+            if record.counts:
+                lines.extend(f"    {name}: {count}" for name, count in record.counts.items() if count > 0)
+        total = sum(record.seconds for record in self.records)
+        lines.append(f"{'total':<14}{total * 1000:>10.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,119 @@
+"""
+peephole optimizer for gen_ir functions
+
+each rule looks at one instruction (and the one right before it in its
+ block) and, if it matches, gives a simpler value the instruction's result
+ can be replaced with. the instruction is then removed
+
+rules are just entries in RULES, to add one write when/rewrite for it.
+ the rules are applied over and over until none of them match anything
+"""
+from typing import Callable, Dict, List, Optional
+
+from cheer import cfg
+from cheer import fold
+from cheer import gen_ir
+
+
+class Rule:
+    """
+    when(instr, prev) says whether the rule applies to instr,
+     rewrite(instr, prev) is the value that replaces instr's result
+    prev is the instruction before instr in its block, or None
+    """
+    __slots__ = ["name", "opcode", "when", "rewrite"]
+
+    def __init__(self, name: str, opcode: str, when: Callable, rewrite: Callable):
+        self.name = name
+        self.opcode = opcode
+        self.when = when
+        self.rewrite = rewrite
+
+    def __repr__(self):
+        return f"Rule<{self.name}>"
+
+
+def is_const(value, n=None) -> bool:
+    return isinstance(value, gen_ir.Const) and (n is None or value.value == n)
+
+
+def both_const(instr, prev) -> bool:
+    return is_const(instr.operands[0]) and is_const(instr.operands[1])
+
+
+def same_operands(instr, prev) -> bool:
+    return cfg.value_key(instr.operands[0]) == cfg.value_key(instr.operands[1])
+
+
+def i32(value) -> 'gen_ir.Const':
+    return gen_ir.Const("i32", fold.wrap_i32(value))
+
+
+def lhs(instr, prev):
+    return instr.operands[0]
+
+
+def rhs(instr, prev):
+    return instr.operands[1]
+
+
+def zero(instr, prev):
+    return gen_ir.Const(instr.type, 0)
+
+
+def values(instr):
+    return [int(operand.value) for operand in instr.operands]
+
+
+def stored_right_before(instr, prev) -> bool:
+    return prev is not None and prev.opcode == "store" and prev.operands[1] is instr.operands[0]
+
+
+RULES = [
+    Rule("add constants", "add", both_const, lambda i, p: i32(sum(values(i)))),
+    Rule("sub constants", "sub", both_const, lambda i, p: i32(values(i)[0] - values(i)[1])),
+    Rule("mul constants", "mul", both_const, lambda i, p: i32(values(i)[0] * values(i)[1])),
+    Rule("icmp eq constants", "icmp",
+         lambda i, p: i.attrs["predicate"] == "eq" and both_const(i, p),
+         lambda i, p: gen_ir.Const("i1", values(i)[0] == values(i)[1])),
+    Rule("icmp eq x, x", "icmp",
+         lambda i, p: i.attrs["predicate"] == "eq" and same_operands(i, p),
+         lambda i, p: gen_ir.Const("i1", True)),
+    Rule("sext constant", "sext", lambda i, p: is_const(i.operands[0]),
+         lambda i, p: gen_ir.Const(i.type, int(i.operands[0].value))),
+    Rule("add x, 0", "add", lambda i, p: is_const(i.operands[1], 0), lhs),
+    Rule("add 0, x", "add", lambda i, p: is_const(i.operands[0], 0), rhs),
+    Rule("sub x, 0", "sub", lambda i, p: is_const(i.operands[1], 0), lhs),
+    Rule("sub x, x", "sub", same_operands, zero),
+    Rule("mul x, 1", "mul", lambda i, p: is_const(i.operands[1], 1), lhs),
+    Rule("mul 1, x", "mul", lambda i, p: is_const(i.operands[0], 1), rhs),
+    Rule("mul x, 0", "mul", lambda i, p: is_const(i.operands[0], 0) or is_const(i.operands[1], 0), zero),
+    # store x to a slot then immediately load it back, just use x
+    Rule("store then load", "load", stored_right_before, lambda i, p: p.operands[0]),
+]
+
+
+def optimize(function: 'gen_ir.Function', rules: List[Rule] = RULES) -> Dict[str, int]:
+    """
+    returns how many times each rule fired
+    """
+    by_opcode: Dict[str, List[Rule]] = {}
+    for rule in rules:
+        by_opcode.setdefault(rule.opcode, []).append(rule)
+    fired = {rule.name: 0 for rule in rules}
+
+    changed = True
+    while changed:
+        changed = False
+        for block in function.basic_blocks:
+            prev: Optional[gen_ir.Instruction] = None
+            for instr in list(block.instructions):
+                match = next((rule for rule in by_opcode.get(instr.opcode, ()) if rule.when(instr, prev)), None)
+                if match is None:
+                    prev = instr
+                    continue
+                instr.replace_with(match.rewrite(instr, prev))
+                fired[match.name] += 1
+                changed = True
+    return fired
+
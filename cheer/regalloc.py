@@ -0,0 +1,229 @@
+"""
+linear scan register allocation for gen_ir functions
+
+instructions are numbered in block layout order, and every virtual
+ register gets one live interval: from its definition to the last place
+ it is live, using block level liveness so values that live across a
+ branch (or around a loop) cover the whole stretch. intervals are handed
+ registers in order of where they start. when there are none left, the
+ interval that ends last is spilled to the stack
+
+a call can overwrite the registers the caller doesn't expect to be saved,
+ so values live across a call only get callee saved registers
+
+(Poletto and Sarkar, "Linear Scan Register Allocation")
+"""
+import bisect
+from typing import Dict, List, Optional, Sequence, Set
+
+from cheer import gen_ir
+
+# x86-64 registers values can live in, (64 bit, 32 bit)
+# the backend uses rax and rcx as scratch, and the read syscall needs
+#  rdi, rsi and rdx and clobbers rcx and r11, so those are left out
+REGISTERS = [
+    ("%rbx", "%ebx"),
+    ("%r8", "%r8d"),
+    ("%r9", "%r9d"),
+    ("%r10", "%r10d"),
+    ("%r12", "%r12d"),
+    ("%r13", "%r13d"),
+    ("%r14", "%r14d"),
+    ("%r15", "%r15d"),
+]
+
+# the caller expects these to be the same after we return
+CALLEE_SAVED = {"%rbx", "%r12", "%r13", "%r14", "%r15"}
+
+
+class Interval:
+    __slots__ = ["value", "start", "end", "register"]
+
+    def __init__(self, value: 'gen_ir.Register', start: int):
+        self.value = value
+        self.start = start
+        self.end = start
+        self.register: Optional[int] = None # index into the registers, None if spilled
+
+    def cover(self, position: int):
+        self.start = min(self.start, position)
+        self.end = max(self.end, position)
+
+    def __repr__(self):
+        return f"Interval<{self.value} [{self.start}, {self.end}]>"
+
+
+class Allocation:
+    """
+    where each value of a function lives, plus how hard that was
+    """
+    def __init__(self, function: 'gen_ir.Function', registers: Sequence):
+        self.function = function
+        self.registers = registers
+        self.intervals: Dict[gen_ir.Register, Interval] = {}
+        self.spills = 0
+        self.max_pressure = 0
+
+    def register(self, value: 'gen_ir.Register') -> Optional[str]:
+        """
+        name of the register value is in (sized for its type), None if it's on the stack
+        """
+        interval = self.intervals.get(value)
+        if interval is None or interval.register is None:
+            return None
+        wide, narrow = self.registers[interval.register]
+        return wide if value.type.endswith("*") else narrow
+
+    def used_registers(self) -> List[str]:
+        used = sorted(set(i.register for i in self.intervals.values() if i.register is not None))
+        return [self.registers[index][0] for index in used]
+
+    def report(self) -> str:
+        return f"{self.function.name}: {len(self.intervals)} values, {len(self.used_registers())} registers, " \
+            f"{self.spills} spilled, max pressure {self.max_pressure}"
+
+
+def block_liveness(function: 'gen_ir.Function'):
+    """
+    returns (live_in, live_out) for every block
+    a phi's value is used at the end of the predecessor it comes from,
+     and defined at the start of its own block
+    """
+    upward: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {}
+    defined: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {}
+    phi_defs: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {}
+    # phi uses, by the block they come from
+    phi_uses: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {block: set() for block in function.basic_blocks}
+    for block in function.basic_blocks:
+        upward[block] = set()
+        defined[block] = set()
+        phi_defs[block] = set()
+        for instr in block.instructions:
+            if instr.opcode == "phi":
+                phi_defs[block].add(instr.result)
+                for value, pred in zip(instr.operands, instr.blocks):
+                    if isinstance(value, gen_ir.Register) and pred in phi_uses:
+                        phi_uses[pred].add(value)
+            else:
+                for value in instr.uses:
+                    if value not in defined[block]:
+                        upward[block].add(value)
+            defined[block].update(instr.defs)
+
+    live_in: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {block: set() for block in function.basic_blocks}
+    live_out: Dict[gen_ir.BasicBlock, Set[gen_ir.Register]] = {block: set() for block in function.basic_blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(function.basic_blocks):
+            out = set(phi_uses[block])
+            for successor in block.successors:
+                out |= live_in[successor] - phi_defs[successor]
+            new_in = phi_defs[block] | upward[block] | (out - defined[block])
+            if out != live_out[block] or new_in != live_in[block]:
+                live_out[block] = out
+                live_in[block] = new_in
+                changed = True
+    return live_in, live_out
+
+
+def build_intervals(function: 'gen_ir.Function') -> Dict['gen_ir.Register', Interval]:
+    live_in, live_out = block_liveness(function)
+    intervals: Dict[gen_ir.Register, Interval] = {}
+    starts: Dict[gen_ir.BasicBlock, int] = {}
+    ends: Dict[gen_ir.BasicBlock, int] = {}
+
+    # the arguments are there before the first instruction
+    for param in function.params:
+        intervals[param] = Interval(param, -1)
+
+    position = 0
+    for block in function.basic_blocks:
+        starts[block] = position
+        for instr in block.instructions:
+            for value in instr.defs:
+                intervals[value] = Interval(value, position)
+            for value in instr.uses:
+                if value in intervals:
+                    intervals[value].cover(position)
+            position += 1
+        ends[block] = max(position - 1, starts[block])
+
+    for block in function.basic_blocks:
+        for value in live_in[block]:
+            if value in intervals:
+                intervals[value].cover(starts[block])
+        for value in live_out[block]:
+            if value in intervals:
+                intervals[value].cover(ends[block])
+        # phis are written on the way out of each predecessor
+        for phi in block.phis():
+            for pred in phi.blocks:
+                if pred in ends:
+                    intervals[phi.result].cover(ends[pred]) # type: ignore
+    return intervals
+
+
+def max_pressure(intervals: Sequence[Interval]) -> int:
+    events = []
+    for interval in intervals:
+        events.append((interval.start, 1))
+        events.append((interval.end + 1, -1))
+    events.sort()
+    live = most = 0
+    for _, change in events:
+        live += change
+        most = max(most, live)
+    return most
+
+
+def call_positions(function: 'gen_ir.Function') -> List[int]:
+    return [position for position, instr in enumerate(function.instructions()) if instr.opcode == "call"]
+
+
+def crosses_call(interval: Interval, calls: List[int]) -> bool:
+    """
+    whether the value has to survive a call, the call's own arguments and
+     result don't
+    """
+    index = bisect.bisect_right(calls, interval.start)
+    return index < len(calls) and calls[index] < interval.end
+
+
+def allocate(function: 'gen_ir.Function', registers: Sequence = REGISTERS) -> Allocation:
+    allocation = Allocation(function, registers)
+    allocation.intervals = build_intervals(function)
+    intervals = sorted(allocation.intervals.values(), key=lambda i: (i.start, i.end))
+    allocation.max_pressure = max_pressure(intervals)
+    calls = call_positions(function)
+
+    free = list(reversed(range(len(registers))))
+    # sorted by end
+    active: List[Interval] = []
+    for interval in intervals:
+        while active and active[0].end < interval.start:
+            free.append(active.pop(0).register) # type: ignore
+        survives_call = crosses_call(interval, calls)
+        choice = next((index for index in reversed(free)
+                       if not survives_call or registers[index][0] in CALLEE_SAVED), None)
+        # whatever is live the longest, that we could take the register of
+        longest = next((other for other in reversed(active)
+                        if not survives_call or registers[other.register][0] in CALLEE_SAVED), None) # type: ignore
+        if choice is not None:
+            free.remove(choice)
+            interval.register = choice
+        elif longest is not None and longest.end > interval.end:
+            active.remove(longest)
+            interval.register = longest.register
+            longest.register = None
+            allocation.spills += 1
+        else:
+            allocation.spills += 1
+            continue
+        active.append(interval)
+        active.sort(key=lambda i: i.end)
+    return allocation
+
+
+def report(allocations: Sequence[Allocation]) -> str:
+    return "\n".join(["register allocation:"] + [f"  {allocation.report()}" for allocation in allocations])
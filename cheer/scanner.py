@@ -1,4 +1,10 @@
+import array
+import bisect
+import enum
+import functools
 import re
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
 
 
 class SymbolRule:
@@ -10,12 +16,15 @@ class SymbolRule:
 
 
 class Symbol:
-    def __init__(self, token, lexeme, value, line, col):
+    __slots__ = ["token", "lexeme", "value", "line", "col", "kind"]
+
+    def __init__(self, token, lexeme, value, line, col, kind=-1):
         self.token = token # ex: function def, int literal, if, etc...
         self.lexeme = lexeme # what was in the source code
         self.value = value # value, ex token "5" has value 5
         self.line = line # line number
         self.col = col # column number
+        self.kind = kind # number of the token name, what the parser compares (see Lexer.token_kinds)
 
     def __repr__(self):
         return f"{self.token}<{self.lexeme}> at ({self.line},{self.col})"
@@ -26,46 +35,278 @@ class Symbol:
     def __eq__(self, other):
         if not isinstance(other, Symbol):
             return False
-        return (self.token, self.lexeme, self.value, self.line, self.col) == \
-            (other.token, other.lexeme, other.value, other.line, other.col)
+        # compare the cheap integer fields first
+        return self.line == other.line and self.col == other.col \
+            and self.token == other.token and self.lexeme == other.lexeme \
+            and self.value == other.value
 
     def __hash__(self):
-        return hash( (self.token, self.lexeme, self.value, self.line, self.col) )
+        return hash(self.lexeme) ^ (self.line << 16) ^ self.col
 
-def scan(f_iter, rules):
+
+class TokenSymbol(Symbol):
+    """
+    Symbol view of a token stored in a TokenTable
+    line and col are only worked out if something asks for them
+    """
+    __slots__ = ["table", "index"]
+
+    def __init__(self, table: 'TokenTable', index: int, token, lexeme, value, kind):
+        self.token = token
+        self.lexeme = lexeme
+        self.value = value
+        self.kind = kind
+        self.table = table
+        self.index = index
+
+    @property # type: ignore
+    def line(self):
+        return self.table.location(self.index)[0]
+
+    @property # type: ignore
+    def col(self):
+        return self.table.location(self.index)[1]
+
+
+def line_col(text, pos):
+    """
+    (line, col) of offset pos in a str or bytes-like text, both starting at 1
+    """
+    before = text[:pos] if isinstance(text, str) else bytes(text[:pos])
+    newline = "\n" if isinstance(text, str) else b"\n"
+    return before.count(newline) + 1, pos - (before.rfind(newline) + 1) + 1
+
+
+class Lexer:
+    """
+    all of the rules compiled into a single regular expression
+
+    each rule becomes an optional lookahead group, so one match at a position
+     reports how far every rule would match from there without consuming
+     anything. the longest match wins and ties go to the rule listed first,
+     same as trying each rule in order with re.match
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        self.pattern = re.compile("".join(
+            f"(?:(?=(?P<_r{index}>{rule.re}))|)" for index, rule in enumerate(rules)))
+        # group number of each rule, so we can read the spans straight out of m.regs
+        self.groups = [self.pattern.groupindex[f"_r{index}"] for index in range(len(rules))]
+        # same pattern for matching bytes, compiled the first time it's needed
+        self._bytes_pattern = None
+
+        # token kinds are numbered by the order their token name first shows up
+        self.kind_names: List[str] = []
+        self.kind_ids: Dict[str, int] = {}
+        # the rule that gives a kind its value, first rule with that token name
+        self.kind_rules: List[SymbolRule] = []
+        self.rule_kinds: List[int] = []
+        for rule in rules:
+            if rule.token_name not in self.kind_ids:
+                self.kind_ids[rule.token_name] = len(self.kind_names)
+                self.kind_names.append(sys.intern(rule.token_name))
+                self.kind_rules.append(rule)
+            self.rule_kinds.append(self.kind_ids[rule.token_name])
+        # (rule, kind, group) for each rule, what spans() looks at for every token
+        self.ruled_groups = list(zip(self.rules, self.rule_kinds, self.groups))
+
+    @property
+    def bytes_pattern(self):
+        if self._bytes_pattern is None:
+            self._bytes_pattern = re.compile(self.pattern.pattern.encode())
+        return self._bytes_pattern
+
+    def spans(self, line, line_num=None):
+        """
+        yields (kind, start, end) for each token in line that adds a symbol,
+         moving a position through the line instead of slicing off each token
+
+        line can be a str or a bytes-like object (bytes, mmap, memoryview),
+         in which case it can be a whole file instead of a single line
+        """
+        if isinstance(line, str):
+            match = self.pattern.match
+        else:
+            match = self.bytes_pattern.match
+        ruled_groups = self.ruled_groups
+        pos = 0
+        end = len(line)
+        while pos < end:
+            regs = match(line, pos).regs
+            # remember which rule matched the longest string
+            max_end = pos
+            max_rule = None
+            max_kind = -1
+            for rule, kind, group in ruled_groups:
+                # groups that didn't participate have an end of -1
+                rule_end = regs[group][1]
+                if rule_end > max_end:
+                    max_end = rule_end
+                    max_rule = rule
+                    max_kind = kind
+
+            if max_rule is None:
+                if line_num is None:
+                    line_num, col_num = line_col(line, pos)
+                else:
+                    col_num = pos + 1
+                raise ValueError(f"No match found for {line[pos:pos + 20]!r} ({line_num}, {col_num})")
+
+            if max_rule.add_symbol:
+                yield max_kind, pos, max_end
+            pos = max_end
+
+    def tokens(self, line, line_num):
+        """
+        yields the symbols in line
+        """
+        for kind, start, end in self.spans(line, line_num):
+            lexeme = line[start:end]
+            value = self.kind_rules[kind].to_value(lexeme)
+            yield Symbol(self.kind_names[kind], lexeme, value, line_num, start + 1, kind)
+
+    def token_kinds(self):
+        """
+        IntEnum of the token kinds, ex: token name "int literal" is INT_LITERAL
+        plus EOF after them, for the parser's end of file symbol
+        """
+        return enum.IntEnum("TokenKind", [
+            (name.upper().replace(" ", "_"), kind) for kind, name in enumerate(self.kind_names)]
+            + [("EOF", len(self.kind_names))])
+
+
+class TokenTable:
+    """
+    compact struct of arrays storage for the tokens of a source file
+
+    token i has kind kinds[i], spans starts[i]:ends[i] of the source and its
+     lexeme is lexemes[lexeme_ids[i]], with each distinct lexeme stored once.
+     line and column are worked out from the offsets when asked for, and
+     Symbols are only created when a token is looked at
+    """
+    def __init__(self, lexer: Lexer, source=None, line_starts=None):
+        self.lexer = lexer
+        # buffer the offsets point into, if we have it
+        self.source = source
+        self.kinds = array.array("H")
+        self.starts = array.array("I")
+        self.ends = array.array("I")
+        self.lexeme_ids = array.array("I")
+        self.lexemes: List[str] = []
+        self.interned: Dict[str, int] = {}
+        # offset of the first character of each line
+        # built from the newlines in source the first time a location is needed
+        self._line_starts: Optional[array.array] = line_starts
+
+    @property
+    def line_starts(self) -> array.array:
+        if self._line_starts is None:
+            self._line_starts = array.array("I", [0])
+            if self.source is not None:
+                newline = "\n" if isinstance(self.source, str) else b"\n"
+                self._line_starts.extend(m.end() for m in re.finditer(newline, self.source))
+        return self._line_starts
+
+    def intern(self, lexeme: str) -> int:
+        lexeme_id = self.interned.get(lexeme)
+        if lexeme_id is None:
+            lexeme_id = self.interned[lexeme] = len(self.lexemes)
+            self.lexemes.append(sys.intern(lexeme))
+        return lexeme_id
+
+    def append(self, kind: int, start: int, end: int, lexeme: str):
+        self.append_id(kind, start, end, self.intern(lexeme))
+
+    def append_id(self, kind: int, start: int, end: int, lexeme_id: int):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lexeme_ids.append(lexeme_id)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def location(self, index: int) -> Tuple[int, int]:
+        """
+        (line, col) of token index, both starting at 1
+        """
+        start = self.starts[index]
+        line = bisect.bisect_right(self.line_starts, start)
+        return line, start - self.line_starts[line - 1] + 1
+
+    def __getitem__(self, index: int) -> Symbol:
+        kind = self.kinds[index]
+        lexeme = self.lexemes[self.lexeme_ids[index]]
+        value = self.lexer.kind_rules[kind].to_value(lexeme)
+        return TokenSymbol(self, index, self.lexer.kind_names[kind], lexeme, value, kind)
+
+    def __iter__(self) -> Iterator[Symbol]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+@functools.lru_cache(maxsize=None)
+def get_lexer(rules):
+    """
+    rules is a tuple of SymbolRules, so the same rule list is only compiled once
+    """
+    return Lexer(rules)
+
+
+def iter_scan(f_iter, rules):
     """
+    lazily yields symbols, a line at a time
     won't be able to scan tokens that are multiline tokens
     """
-    symbols = []
+    lexer = get_lexer(tuple(rules))
 
     for _line_num, line in enumerate(f_iter):
-        line_num = _line_num + 1
-        col_num = 1
-        while len(line) > 0:
-            # remember which regular expression matched the longest string
-            max_match_len = 0
-            max_symbol = None
-
-            for rule in rules:
-                m = re.match(rule.re, line)
-                if m is not None:
-                    lexeme = m.group()
-                    if len(lexeme) > max_match_len:
-                        max_match_len = len(lexeme)
-                        symbol = None
-                        if rule.add_symbol:
-                            symbol = Symbol(rule.token_name, lexeme, rule.to_value(lexeme), line_num, col_num)
-                        max_symbol = symbol
-
-            if max_match_len == 0:
-                raise ValueError(f"No match found for {line} ({line_num}, {col_num})")
-            
-            if max_symbol is not None:
-                symbols.append(max_symbol)
-            col_num += max_match_len
-            line = line[max_match_len:]
-
-    return symbols
+        yield from lexer.tokens(line, _line_num + 1)
+
+
+def scan(f_iter, rules):
+    return list(iter_scan(f_iter, rules))
+
+
+def scan_table(f_iter, rules):
+    """
+    same as scan, but stores the tokens in a TokenTable
+    """
+    lexer = get_lexer(tuple(rules))
+    table = TokenTable(lexer, line_starts=array.array("I"))
+    offset = 0
+
+    for _line_num, line in enumerate(f_iter):
+        table.line_starts.append(offset)
+        for kind, start, end in lexer.spans(line, _line_num + 1):
+            table.append(kind, offset + start, offset + end, line[start:end])
+        offset += len(line)
+
+    return table
+
+
+def scan_buffer(source, rules):
+    """
+    scan a whole bytes-like source (ex: an mmap of the file) into a TokenTable
+
+    the rules are matched against the bytes directly, so nothing is decoded
+     except each distinct lexeme once, tokens can span lines, and the newline
+     index for line numbers is only built if a location is needed.
+     columns count bytes
+    """
+    lexer = get_lexer(tuple(rules))
+    table = TokenTable(lexer, source)
+    lexeme_ids: Dict[bytes, int] = {}
+
+    for kind, start, end in lexer.spans(source):
+        raw = bytes(source[start:end])
+        lexeme_id = lexeme_ids.get(raw)
+        if lexeme_id is None:
+            lexeme_id = lexeme_ids[raw] = table.intern(raw.decode())
+        table.append_id(kind, start, end, lexeme_id)
+
+    return table
+
 
 def dummy_tokenize(input_str):
     """
@@ -0,0 +1,177 @@
+"""
+long running compile server, listening on a unix domain socket
+
+keeps the compiler imported and its lexers compiled between compiles, and
+ remembers recent output in memory. clients send a source path or the
+ source text plus compile options, and get back the output or the errors. see
+ client.py for the protocol and a thin client
+"""
+import argparse
+import collections
+import os
+import signal
+import socketserver
+import threading
+import time
+import typing
+from typing import Dict, List, Optional
+
+from cheer import cache
+from cheer import client
+from cheer import compile
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class OptionsError(Exception):
+    pass
+
+
+class OptionParser(argparse.ArgumentParser):
+    """
+    compile.py's options, a bad one is sent back to the client
+     instead of exiting the server
+    """
+    def __init__(self):
+        super().__init__(prog="cheer compile server", add_help=False)
+        compile.add_compile_options(self)
+
+    def error(self, message):
+        raise OptionsError(message)
+
+
+class WarmCache:
+    """
+    compiled output held in memory, least recently used dropped first
+     once the total size of the output goes over max_bytes
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: typing.OrderedDict[str, str] = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            code = self.entries.get(key)
+            if code is not None:
+                self.entries.move_to_end(key)
+            return code
+
+    def put(self, key: str, code: str):
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = code
+            self.size += len(code)
+            while self.size > self.max_bytes and self.entries:
+                _, dropped = self.entries.popitem(last=False)
+                self.size -= len(dropped)
+
+
+class CompileHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.busy(1)
+        try:
+            message = client.recv_message(self.connection)
+            client.send_message(self.connection, self.server.compile_request(message))
+        finally:
+            self.server.busy(-1)
+
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    each connection is handled on its own thread
+
+    shuts itself down once idle_timeout seconds go by with no requests
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, idle_timeout: float = 600, max_bytes: int = DEFAULT_MAX_BYTES):
+        # a socket left over from a server that died
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, CompileHandler)
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.warm = WarmCache(max_bytes)
+        self.active = 0
+        self.last_active = time.monotonic()
+        self.activity_lock = threading.Lock()
+        self.option_parser = OptionParser()
+
+    def busy(self, delta: int):
+        with self.activity_lock:
+            self.active += delta
+            self.last_active = time.monotonic()
+
+    def options(self, args: List[str]) -> argparse.Namespace:
+        """
+        args are compile options as they'd be given to compile.py, ex: ["-O", "1"]
+        """
+        return self.option_parser.parse_args(args)
+
+    def compile_request(self, message: Dict) -> Dict:
+        try:
+            options = self.options(message.get("args", []))
+            if "path" in message:
+                with open(message["path"], "rb") as f:
+                    source = f.read()
+            else:
+                source = message["source"].encode()
+
+            key = cache.cache_key(source, compile.cache_options(options))
+            code = self.warm.get(key)
+            if code is None:
+                diagnostics: List[str] = []
+                code = compile.compile(options, source, diagnostics)
+                if diagnostics:
+                    return {"ok": False, "error": "\n".join(diagnostics)}
+                self.warm.put(key, code)
+            return {"ok": True, "code": code, "suffix": compile.output_suffix(options)}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def watch_idle(self):
+        while True:
+            time.sleep(min(1.0, self.idle_timeout))
+            with self.activity_lock:
+                idle = self.active == 0 and time.monotonic() - self.last_active > self.idle_timeout
+            if idle:
+                self.shutdown()
+                return
+
+    def serve(self):
+        threading.Thread(target=self.watch_idle, daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def main(options):
+    server = CompileServer(options.socket, options.idle_timeout, options.max_bytes)
+
+    def stop(signum, frame):
+        # shutdown blocks until serve_forever returns, so it can't run on this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    server.serve()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run a compile server")
+    ap.add_argument('--socket', '-s', default=client.DEFAULT_SOCKET,
+                    help='Unix socket to listen on')
+
+    ap.add_argument('--idle-timeout', type=float, default=600,
+                    help='Shut down after this many seconds without a request')
+
+    ap.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                    help='Memory to spend remembering compiled output')
+
+    main(ap.parse_args())
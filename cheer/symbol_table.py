@@ -1,5 +1,5 @@
 import collections
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set
 
 from cheer import ast, gen_ir
 
@@ -44,10 +44,8 @@ class STE:
         # scope this var is declared in
         self.declared_scope: Scope = declared
 
-        # for IR gen, list of names
-        # its a stack for the scopes this lexeme is used in
-        # tuple of (Scope, register_name)
-        self.ir_names: List[Tuple['gen_ir.BasicBlock', str]] = []
+        # for IR gen, the alloca holding this variable
+        self.slot: Optional['gen_ir.Register'] = None
 
     def __repr__(self):
         return str(f"<{self.node}, Scopes: {self.assigned_scopes}>")
@@ -55,53 +53,98 @@ class STE:
     def assign_in_scope(self, scope: Scope):
         self.assigned_scopes.add(scope)
 
-    def is_assigned_in_scope(self, scope_stack: List[Scope]):
-        # search through scope stack and see if its assigned in one of them
-        for scope in scope_stack[::-1]:
-            if scope in self.assigned_scopes:
-                return True
-        return False
-
-    # used in IR gen, not type checking
-    def assign_to_lexeme(self, basic_block: 'gen_ir.BasicBlock', ir_name: str):
-        # if there is an entry in ir_names
-        # and the most recent entry has the same bb as the parameter
-        if len(self.ir_names) > 0 and self.ir_names[-1][0] == basic_block:
-            # overwrite it with the new ir_name
-            self.ir_names.pop()
-            self.ir_names.append((basic_block, ir_name))
-        else:
-            # create new entry in ir_names
-            self.ir_names.append((basic_block, ir_name))
-
 
 class SymTable:
     def __init__(self):
+        # the latest declaration of each name in each scope
         self.st: Dict[Scope, Dict[str, STE]] = collections.defaultdict(dict)
+        # every declaration, a name can be declared again in the same scope
+        self.declarations: Dict[ast.ASTNode, STE] = {}
 
     def create(self, node: ast.ASTNode, scope_stack: List[Scope]):
-        if node.ntype != "var_decl" and node.ntype != "var_decl_assign":
+        if node.ntype not in ("var_decl", "var_decl_assign", "param"):
             raise ValueError(f"expected var type, not {node.ntype}")
         if node.symbol.lexeme in self.st:
             raise AlreadyCreatedError(f"lexeme {node.symbol} already exists in this scope")
 
         ste = STE(node, scope_stack[-1])
         self.st[scope_stack[-1]][node.symbol.lexeme] = ste
+        self.declarations[node] = ste
         return ste
 
-    def get(self, node: ast.ASTNode, scope_stack: List[Scope]):
-        # walk scope stack, from youngest child scope to oldest parent scope
-        for scope in scope_stack[::-1]:
-            try:
-                return self.st[scope][node.symbol.lexeme]
-            except KeyError:
-                # didn't exist in that scope
-                pass
-        # tried all scopes in the scope stack and it wasn't in any of them
-        raise NotDeclaredError(f"{node.symbol} is not declared in available scopes")
+    def __repr__(self):
+        return str(self.st)
+
+
+class Environment:
+    """
+    the variables visible from the current scope, during one walk of the tree
+
+    each lexeme maps to a stack of the STEs declared for it in live scopes,
+     innermost last, so a lookup is a dict lookup however deep the scopes
+     nest. same idea for assignments: we count how many live scopes each STE
+     was assigned in. popping a scope undoes what was declared and assigned in it
+    """
+    def __init__(self, symbol_table: SymTable):
+        self.symbol_table = symbol_table
+        self.scope_stack: List[Scope] = []
+        self.bindings: Dict[str, List[STE]] = collections.defaultdict(list)
+        self.assigned: Dict[STE, int] = collections.defaultdict(int)
+        # what to undo when each scope is popped
+        self.declared_in: Dict[Scope, List[str]] = collections.defaultdict(list)
+        self.assigned_in: Dict[Scope, Set[STE]] = collections.defaultdict(set)
+
+    def push(self, scope: Scope):
+        self.scope_stack.append(scope)
+
+    def pop(self) -> Scope:
+        scope = self.scope_stack.pop()
+        for lexeme in self.declared_in.pop(scope, []):
+            self.bindings[lexeme].pop()
+        for ste in self.assigned_in.pop(scope, set()):
+            self.assigned[ste] -= 1
+        return scope
+
+    def bind(self, ste: STE):
+        lexeme = ste.node.symbol.lexeme
+        self.bindings[lexeme].append(ste)
+        self.declared_in[self.scope_stack[-1]].append(lexeme)
+
+    def create(self, node: ast.ASTNode) -> STE:
+        """
+        add a new STE for a declaration in the current scope
+        """
+        ste = self.symbol_table.create(node, self.scope_stack)
+        self.bind(ste)
+        return ste
 
-    def get_type(self, node: ast.ASTNode, scope_stack: List[Scope]):
-        return self.get(node, scope_stack).node.type
+    def declare(self, node: ast.ASTNode) -> STE:
+        """
+        bring the STE already created for this declaration into view
+         (for walks after type checking, which created the STEs)
+        """
+        ste = self.symbol_table.declarations[node]
+        self.bind(ste)
+        return ste
 
-    def __repr__(self):
-        return str(self.st)
\ No newline at end of file
+    def get(self, node: ast.ASTNode) -> STE:
+        stack = self.bindings.get(node.symbol.lexeme)
+        if not stack:
+            raise NotDeclaredError(f"{node.symbol} is not declared in available scopes")
+        return stack[-1]
+
+    def assign(self, ste: STE):
+        """
+        record that ste is assigned in the current scope
+        """
+        scope = self.scope_stack[-1]
+        ste.assign_in_scope(scope)
+        if ste not in self.assigned_in[scope]:
+            self.assigned_in[scope].add(ste)
+            self.assigned[ste] += 1
+
+    def is_assigned(self, ste: STE) -> bool:
+        """
+        whether ste is assigned in any of the live scopes
+        """
+        return self.assigned[ste] > 0
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, Dict, List, Set
 from cheer import visit
 from cheer import symbol_table
 
@@ -11,8 +11,14 @@ class TCVisitor(visit.DFSVisitor):
     def __init__(self, ast):
         super().__init__(ast)
         self.symbol_table = symbol_table.SymTable()
+        self.env = symbol_table.Environment(self.symbol_table)
         self.scope_num = 0
-        self.scope_stack: List[symbol_table.Scope] = []
+        self.scope_stack: List[symbol_table.Scope] = self.env.scope_stack
+        # function nodes by name, and the one we're in
+        self.functions: Dict[str, Any] = {}
+        self.function = None
+        # statements (and statement lists) that return on every path through them
+        self.returning: Set[Any] = set()
 
     def error(self, msg):
         raise TypeCheckingError(msg)
@@ -29,13 +35,72 @@ class TCVisitor(visit.DFSVisitor):
         # override
         pass
 
+    def _in_program(self, node):
+        # functions can be called before they're defined,
+        #  so know about all of them before checking any
+        for function in node.children:
+            name = function.symbol.lexeme
+            if name in self.functions:
+                msg = f"Function {name} is already defined\n"
+                msg += f"{function.symbol}"
+                self.error(msg)
+            self.functions[name] = function
+            function.type = return_type(function)
+        main = self.functions.get("main")
+        if main is None:
+            self.error("No main function")
+        elif main.children[0].children or main.type != "i32":
+            msg = "main should take no parameters and return i32\n"
+            msg += f"{main.symbol}"
+            self.error(msg)
+
+    def _in_function(self, node):
+        self.function = node
+        if node.type is None:
+            node.type = return_type(node)
+        # the parameters are in a scope around the body
+        new_scope = symbol_table.Scope(self.scope_num)
+        self.scope_num += 1
+        self.env.push(new_scope)
+
+    def _out_function(self, node):
+        self.env.pop()
+        self.function = None
+        # every function returns a value, so falling off the end is an error
+        if node.children[-1] not in self.returning:
+            msg = f"Function {node.symbol.lexeme} doesn't return on every path\n"
+            msg += f"{node.symbol}"
+            self.error(msg)
+
+    def _out_param(self, node):
+        if node.symbol.lexeme in self.symbol_table.st[self.scope_stack[-1]]:
+            msg = f"Parameter {node.symbol.lexeme} is already defined\n"
+            msg += f"{node.symbol}"
+            self.error(msg)
+        node.type = node.children[0].symbol.lexeme
+        ste = self.env.create(node)
+        self.env.assign(ste)
+
     def _in_statement_list(self, node):
         new_scope = symbol_table.Scope(self.scope_num)
         self.scope_num += 1
-        self.scope_stack.append(new_scope)
+        self.env.push(new_scope)
 
     def _out_statement_list(self, node):
-        self.scope_stack.pop()
+        self.env.pop()
+        if any(statement in self.returning for statement in node.children):
+            self.returning.add(node)
+
+    def _out_if_statement(self, node):
+        # without an else, the condition being false skips the return
+        if len(node.children) == 3 and node.children[1] in self.returning and node.children[2] in self.returning:
+            self.returning.add(node)
+
+    def _out_id(self, node):
+        # a type declaration naming something other than i32 or bool
+        msg = f"Unknown type {node.symbol.lexeme}\n"
+        msg += f"{node.symbol}"
+        self.error(msg)
 
     def _out_int_literal(self, node):
         node.type = "i32"
@@ -45,13 +110,14 @@ class TCVisitor(visit.DFSVisitor):
 
     def _out_var(self, node):
         try:
-            node.type = self.symbol_table.get_type(node, self.scope_stack)
+            ste = self.env.get(node)
         except symbol_table.NotDeclaredError:
             msg = f"Use of variable {node.symbol.lexeme} before declaration\n"
             msg += f"{node.symbol}"
             self.error(msg)
+        node.type = ste.node.type
 
-        if not self.symbol_table.get(node, self.scope_stack).is_assigned_in_scope(self.scope_stack):
+        if not self.env.is_assigned(ste):
             msg = f"Use of variable {node.symbol.lexeme} before assignment\n"
             msg += f"{node.symbol}"
             self.error(msg)
@@ -59,14 +125,43 @@ class TCVisitor(visit.DFSVisitor):
     def _out_input_exp(self, node):
         node.type = "i32";
 
+    def _out_call_exp(self, node):
+        name = node.symbol.lexeme
+        function = self.functions.get(name)
+        if function is None:
+            msg = f"Call to undefined function {name}\n"
+            msg += f"{node.symbol}"
+            self.error(msg)
+        params = function.children[0].children
+        if len(params) != len(node.children):
+            msg = f"{name} takes {len(params)} arguments, not {len(node.children)}\n"
+            msg += f"{node.symbol}"
+            self.error(msg)
+        for param, arg in zip(params, node.children):
+            # the function might not be checked yet, so go by its declaration
+            t = param.children[0].symbol.lexeme
+            if arg.type != t:
+                msg = f"Argument {param.symbol.lexeme} of {name} should be {t} not {arg.type}\n"
+                msg += f"{node.symbol}"
+                self.error(msg)
+        node.type = function.type
+
+    def _out_return(self, node):
+        self.returning.add(node)
+        t = node.children[0].type
+        if self.function is not None and t != self.function.type:
+            msg = f"Return type should be {self.function.type} not {t}\n"
+            msg += f"{node.symbol}"
+            self.error(msg)
+
     def _out_var_decl(self, node):
         node.type = node.children[0].symbol.lexeme
-        self.symbol_table.create(node, self.scope_stack)
+        self.env.create(node)
 
     def _out_var_decl_assign(self, node):
         node.type = node.children[0].type
-        ste = self.symbol_table.create(node, self.scope_stack)
-        ste.assign_in_scope(self.scope_stack[-1])
+        ste = self.env.create(node)
+        self.env.assign(ste)
 
     def _visit_assignment(self, node):
         """
@@ -79,16 +174,24 @@ class TCVisitor(visit.DFSVisitor):
         
         lhs = node.children[0]
         try:
-            t = self.symbol_table.get_type(lhs, self.scope_stack)
+            ste = self.env.get(lhs)
         except symbol_table.NotDeclaredError:
             msg = f"Assignment to variable {lhs.symbol.lexeme} before declaration\n"
             msg += f"{lhs.symbol}"
             self.error(msg)
+        t = ste.node.type
         if t != node.children[1].type:
             msg = f"Assignment to {lhs.symbol.lexeme} should be {t} not {node.children[1].type}"
             self.error(msg)
 
-        self.symbol_table.get(lhs, self.scope_stack).assign_in_scope(self.scope_stack[-1])
+        self.env.assign(ste)
+
+    def _out_while_statement(self, node):
+        t = node.children[0].type
+        if t != "bool":
+            msg = f"While condition should be bool not {t}\n"
+            msg += f"{node.symbol}"
+            self.error(msg)
 
     # assumes children nodes should have matching types
     def op_helper(self, node, valid_types):
@@ -119,3 +222,12 @@ class TCVisitor(visit.DFSVisitor):
     def _out_equality_exp(self, node):
         _ = self.op_helper(node, None)
         node.type = "bool"
+
+
+def return_type(function) -> str:
+    """
+    type a function node returns, i32 if it doesn't say
+    """
+    if len(function.children) == 3:
+        return function.children[1].symbol.lexeme
+    return "i32"
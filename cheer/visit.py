@@ -1,8 +1,34 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cheer import ast
+
+
+# (_visit_X, _in_X, _out_X) for each node kind, indexed by kind
+# _visit_X is None when the class doesn't define it
+DispatchTable = List[Tuple[Optional[Callable], Callable, Callable]]
+
+# built once per visitor class, the first time one is created
+_dispatch_tables: Dict[type, DispatchTable] = {}
+
+
+def dispatch_table(cls) -> DispatchTable:
+    table = _dispatch_tables.get(cls)
+    if table is None:
+        table = []
+        for ntype in ast.NODE_TYPES:
+            table.append((
+                getattr(cls, f"_visit_{ntype}", None),
+                getattr(cls, f"_in_{ntype}", cls.default_in_visit),
+                getattr(cls, f"_out_{ntype}", cls.default_out_visit),
+            ))
+        _dispatch_tables[cls] = table
+    return table
+
 
 class DFSVisitor:
     def __init__(self, ast):
         self.ast = ast
-        self.methods = dir(self)
+        self.dispatch = dispatch_table(type(self))
 
     def accept(self):
         self.visit_node(self.ast)
@@ -20,26 +46,73 @@ class DFSVisitor:
 
         most of the time you don't need _visit_foobar,
          but some node types you do
+
+        walks the tree with its own stack instead of recursing, so deep trees
+         don't hit the recursion limit. _visit_foobar can call visit_node
+         on whichever children it wants
         """
-        visit_name = f"_visit_{node.ntype}"
-        if visit_name in self.methods:
-            getattr(self, visit_name)(node)
-        else:
-            in_node_name = "_in_{}".format(node.ntype)
-            out_node_name = "_out_{}".format(node.ntype)
-            if in_node_name in self.methods:
-                getattr(self, in_node_name)(node)
+        dispatch = self.dispatch
+        # (node, whether we're leaving it)
+        stack = [(node, False)]
+        while stack:
+            node, leaving = stack.pop()
+            visit, enter, leave = dispatch[node.kind]
+            if leaving:
+                leave(self, node)
+            elif visit is not None:
+                visit(self, node)
             else:
-                self.default_in_visit(node)
-            for child in node.children:
-                self.visit_node(child)
-            if out_node_name in self.methods:
-                getattr(self, out_node_name)(node)
-            else:
-                self.default_out_visit(node)
+                enter(self, node)
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.children))
 
     def default_in_visit(self, node):
         print("Entering {}".format(node))
 
     def default_out_visit(self, node):
         print("Exiting {}".format(node))
+
+
+class FusedVisitor:
+    """
+    runs several visitors over the tree in a single walk
+
+    at each node, every pass's _in handler is called in the order the passes
+     were given, then the children are visited, then every pass's _out handler,
+     again in order. so a later pass can use what an earlier pass worked out
+     for the same node
+
+    if any pass defines _visit_X for a node type, we can't share the walk of
+     that node's subtree. instead each pass, in order, visits the whole subtree
+     on its own (with its _visit_X if it has one) before the next pass does
+    """
+    def __init__(self, root, passes: List[DFSVisitor]):
+        self.ast = root
+        self.passes = passes
+        tables = [p.dispatch for p in passes]
+        # for each node kind, whether some pass overrides _visit
+        self.split = [any(table[kind][0] is not None for table in tables)
+                      for kind in range(len(ast.NODE_TYPES))]
+        # (pass, _in, _out) for each pass, indexed by node kind
+        self.handlers = [[(p, table[kind][1], table[kind][2]) for p, table in zip(passes, tables)]
+                         for kind in range(len(ast.NODE_TYPES))]
+
+    def accept(self):
+        self.visit_node(self.ast)
+
+    def visit_node(self, node):
+        # (node, whether we're leaving it)
+        stack = [(node, False)]
+        while stack:
+            node, leaving = stack.pop()
+            if leaving:
+                for p, _, leave in self.handlers[node.kind]:
+                    leave(p, node)
+            elif self.split[node.kind]:
+                for p in self.passes:
+                    p.visit_node(node)
+            else:
+                for p, enter, _ in self.handlers[node.kind]:
+                    enter(p, node)
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.children))
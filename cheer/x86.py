@@ -0,0 +1,320 @@
+"""
+native x86-64 backend
+
+lowers the functions gen_ir builds straight to GNU as (AT&T syntax)
+ assembly, so building a program doesn't need to run llc
+
+regalloc decides which ir values live in registers, the rest get their
+ own 8 byte stack slot. each instruction loads its operands into scratch
+ registers, does its thing and writes the result back to where it lives.
+ phis don't generate code where they are, instead every edge into their
+ block copies the incoming values into the phis
+
+calls follow the System V calling convention, arguments in rdi, rsi, rdx,
+ rcx, r8, r9 then on the stack, and the result in eax
+"""
+import re
+from typing import Dict, List, Optional
+
+from cheer import gen_ir
+from cheer import regalloc
+
+# ir register names of the registers inline asm constraints talk about
+# name -> (64 bit, 32 bit)
+ASM_REGISTERS = {
+    "ax": ("%rax", "%eax"),
+    "bx": ("%rbx", "%ebx"),
+    "cx": ("%rcx", "%ecx"),
+    "dx": ("%rdx", "%edx"),
+    "si": ("%rsi", "%esi"),
+    "di": ("%rdi", "%edi"),
+}
+
+# where the first arguments of a call go, (64 bit, 32 bit)
+ARG_REGISTERS = [
+    ("%rdi", "%edi"),
+    ("%rsi", "%esi"),
+    ("%rdx", "%edx"),
+    ("%rcx", "%ecx"),
+    ("%r8", "%r8d"),
+    ("%r9", "%r9d"),
+]
+
+BINARY_OPS = {
+    "add": "addl",
+    "sub": "subl",
+    "mul": "imull",
+}
+
+ARRAY_TYPE_RE = re.compile(r"\[(\d+) x i(\d+)\]")
+
+
+class BackendError(Exception):
+    pass
+
+
+def type_size(t: str) -> int:
+    """
+    bytes of memory an alloca of llvm type t needs
+    """
+    m = ARRAY_TYPE_RE.fullmatch(t)
+    if m is not None:
+        return int(m.group(1)) * int(m.group(2)) // 8
+    return 8
+
+
+class FunctionLowering:
+    """
+    assembly for one gen_ir.Function
+    """
+    def __init__(self, function: 'gen_ir.Function', allocation: 'regalloc.Allocation'):
+        self.function = function
+        self.allocation = allocation
+        self.frame_size = 0
+        # rbp offset of the slot each spilled ir value lives in
+        self.slots: Dict[gen_ir.Register, int] = {}
+        # callee saved registers we use, and where they're saved
+        self.saved: Dict[str, int] = {}
+        self.lines: List[str] = []
+        # where each phi's incoming value waits while all the phis of a block are copied
+        self.phi_temps: List[int] = []
+        self.edge_num = 0
+        # block laid out after the one being lowered, jumps there can fall through
+        self.next_block: Optional[gen_ir.BasicBlock] = None
+
+    def reserve(self, size: int) -> int:
+        self.frame_size += (size + 7) // 8 * 8
+        return -self.frame_size
+
+    def location(self, register: 'gen_ir.Register') -> str:
+        """
+        the register an ir value was allocated, or its stack slot
+        """
+        name = self.allocation.register(register)
+        if name is not None:
+            return name
+        if register not in self.slots:
+            self.slots[register] = self.reserve(8)
+        return f"{self.slots[register]}(%rbp)"
+
+    def result(self, instr: 'gen_ir.Instruction') -> str:
+        """
+        where the value instr defines lives
+        """
+        if instr.result is None:
+            raise BackendError(f"{instr.to_code()} doesn't define a value")
+        return self.location(instr.result)
+
+    def label(self, block: 'gen_ir.BasicBlock') -> str:
+        return f".L{self.function.name}_{block.name}"
+
+    def operand(self, value: 'gen_ir.Value') -> str:
+        """
+        where to read an ir value from, a register, a slot or an immediate
+        """
+        if isinstance(value, gen_ir.Const):
+            return f"${int(value.value)}"
+        return self.location(value) # type: ignore
+
+    def emit(self, line: str):
+        self.lines.append("\t" + line)
+
+    def lower(self) -> List[str]:
+        for register in self.allocation.used_registers():
+            if register in regalloc.CALLEE_SAVED:
+                self.saved[register] = self.reserve(8)
+        most_phis = max((len(block.phis()) for block in self.function.basic_blocks), default=0)
+        self.phi_temps = [self.reserve(8) for _ in range(most_phis)]
+        self.lower_params()
+
+        blocks = self.function.basic_blocks
+        for index, block in enumerate(blocks):
+            self.next_block = blocks[index + 1] if index + 1 < len(blocks) else None
+            self.lines.append(f"{self.label(block)}:")
+            for instr in block.instructions:
+                self.lower_instr(instr)
+
+        frame = (self.frame_size + 15) // 16 * 16
+        # only main is called from outside
+        visibility = [f"\t.globl {self.function.name}"] if self.function.name == "main" else []
+        return visibility + [
+            f"\t.type {self.function.name}, @function",
+            f"{self.function.name}:",
+            "\tpushq %rbp",
+            "\tmovq %rsp, %rbp",
+            f"\tsubq ${frame}, %rsp",
+        ] + [f"\tmovq {register}, {offset}(%rbp)" for register, offset in self.saved.items()] + self.lines + [
+            f"\t.size {self.function.name}, .-{self.function.name}",
+        ]
+
+    def lower_params(self):
+        """
+        copy the arguments to where they were allocated. the ones in registers
+         are all pushed before any is written, since an argument register
+         can be where another argument goes
+        """
+        in_registers = self.function.params[:len(ARG_REGISTERS)]
+        for reg64, _ in ARG_REGISTERS[:len(in_registers)]:
+            self.emit(f"pushq {reg64}")
+        for param in reversed(in_registers):
+            self.emit("popq %rax")
+            self.emit(f"movl %eax, {self.location(param)}")
+        for index, param in enumerate(self.function.params[len(ARG_REGISTERS):]):
+            # past the saved rbp and the return address
+            self.emit(f"movl {16 + 8 * index}(%rbp), %eax")
+            self.emit(f"movl %eax, {self.location(param)}")
+
+    def lower_call(self, instr: 'gen_ir.Instruction'):
+        """
+        every argument is pushed, last first, then the first six are popped
+         into their registers. so none of them is written before all are read,
+         and the rest are left on the stack in the right order
+        """
+        args = instr.operands
+        on_stack = max(0, len(args) - len(ARG_REGISTERS))
+        # the stack has to be 16 byte aligned at the call
+        padding = on_stack % 2
+        if padding:
+            self.emit("subq $8, %rsp")
+        for arg in reversed(args):
+            self.emit(f"movl {self.operand(arg)}, %eax")
+            self.emit("pushq %rax")
+        for reg64, _ in ARG_REGISTERS[:len(args)]:
+            self.emit(f"popq {reg64}")
+        self.emit(f"call {instr.attrs['callee']}")
+        if on_stack + padding:
+            self.emit(f"addq ${8 * (on_stack + padding)}, %rsp")
+        self.emit(f"movl %eax, {self.result(instr)}")
+
+    def jump(self, block: 'gen_ir.BasicBlock'):
+        if block is not self.next_block:
+            self.emit(f"jmp {self.label(block)}")
+
+    def copy_phis(self, from_block: 'gen_ir.BasicBlock', to_block: 'gen_ir.BasicBlock'):
+        """
+        set the phis of to_block for the edge from from_block
+        all the incoming values are read before any phi is written,
+         since they are supposed to happen at the same time
+        """
+        block_phis = to_block.phis()
+        for temp, phi in zip(self.phi_temps, block_phis):
+            self.emit(f"movl {self.operand(incoming(phi, from_block))}, %eax")
+            self.emit(f"movl %eax, {temp}(%rbp)")
+        for temp, phi in zip(self.phi_temps, block_phis):
+            self.emit(f"movl {temp}(%rbp), %eax")
+            self.emit(f"movl %eax, {self.result(phi)}")
+
+    def lower_instr(self, instr: 'gen_ir.Instruction'):
+        op = instr.opcode
+        ops = instr.operands
+        block = instr.block
+        if block is None:
+            raise BackendError(f"{instr.to_code()} isn't in a block")
+        if op == "ret":
+            self.emit(f"movl {self.operand(ops[0])}, %eax")
+            for register, offset in self.saved.items():
+                self.emit(f"movq {offset}(%rbp), {register}")
+            self.emit("leave")
+            self.emit("ret")
+        elif op == "br" and not ops:
+            self.copy_phis(block, instr.blocks[0])
+            self.jump(instr.blocks[0])
+        elif op == "br":
+            true_target, false_target = instr.blocks
+            edge = f".L{self.function.name}_edge{self.edge_num}"
+            self.edge_num += 1
+            # the condition might be an immediate, which cmp can't compare to
+            self.emit(f"movl {self.operand(ops[0])}, %eax")
+            self.emit("cmpl $0, %eax")
+            self.emit(f"jne {edge}")
+            self.copy_phis(block, false_target)
+            self.emit(f"jmp {self.label(false_target)}")
+            self.lines.append(f"{edge}:")
+            self.copy_phis(block, true_target)
+            self.jump(true_target)
+        elif op == "store":
+            self.emit(f"movl {self.operand(ops[0])}, %eax")
+            self.emit(f"movq {self.operand(ops[1])}, %rcx")
+            self.emit("movl %eax, (%rcx)")
+        elif op == "phi":
+            pass
+        elif op == "alloca":
+            self.emit(f"leaq {self.reserve(type_size(instr.attrs['allocated']))}(%rbp), %rax")
+            self.emit(f"movq %rax, {self.result(instr)}")
+        elif op == "load":
+            self.emit(f"movq {self.operand(ops[0])}, %rcx")
+            if instr.type == "i8":
+                self.emit("movsbl (%rcx), %eax")
+            else:
+                self.emit("movl (%rcx), %eax")
+            self.emit(f"movl %eax, {self.result(instr)}")
+        elif op == "getelementptr":
+            if any(not isinstance(index, gen_ir.Const) or index.value != 0 for index in ops[1:]):
+                raise BackendError(f"can't lower {instr.to_code()}")
+            self.emit(f"movq {self.operand(ops[0])}, %rax")
+            self.emit(f"movq %rax, {self.result(instr)}")
+        elif op == "sext":
+            # loads of i8 already sign extend
+            self.emit(f"movl {self.operand(ops[0])}, %eax")
+            self.emit(f"movl %eax, {self.result(instr)}")
+        elif op == "icmp" and instr.attrs["predicate"] == "eq":
+            self.emit(f"movl {self.operand(ops[0])}, %eax")
+            self.emit(f"cmpl {self.operand(ops[1])}, %eax")
+            self.emit("sete %al")
+            self.emit("movzbl %al, %eax")
+            self.emit(f"movl %eax, {self.result(instr)}")
+        elif op in BINARY_OPS:
+            self.emit(f"movl {self.operand(ops[0])}, %eax")
+            self.emit(f"{BINARY_OPS[op]} {self.operand(ops[1])}, %eax")
+            self.emit(f"movl %eax, {self.result(instr)}")
+        elif op == "asm":
+            self.lower_inline_asm(instr)
+        elif op == "call":
+            self.lower_call(instr)
+        else:
+            raise BackendError(f"can't lower {instr.to_code()}")
+
+    def lower_inline_asm(self, instr: 'gen_ir.Instruction'):
+        """
+        supports constraints that name single registers, ex: "={ax},{si},~{flags}"
+        """
+        outputs = []
+        inputs = []
+        for constraint in instr.attrs["constraints"].split(","):
+            if constraint.startswith("~"):
+                continue
+            elif constraint.startswith("="):
+                outputs.append(ASM_REGISTERS[constraint[2:-1]])
+            else:
+                inputs.append(ASM_REGISTERS[constraint[1:-1]])
+
+        for (reg64, _), arg in zip(inputs, instr.operands):
+            self.emit(f"movq {self.operand(arg)}, {reg64}")
+        for asm_line in instr.attrs["template"].replace("$$", "$").split("\\0A"):
+            if asm_line:
+                self.emit(asm_line)
+        if outputs:
+            self.emit(f"movl {outputs[0][1]}, {self.result(instr)}")
+
+
+def incoming(phi: 'gen_ir.Instruction', block: 'gen_ir.BasicBlock') -> 'gen_ir.Value':
+    """
+    the value phi takes when coming from block
+    """
+    for value, from_block in zip(phi.operands, phi.blocks):
+        if from_block is block:
+            return value
+    raise BackendError(f"{phi.to_code()} has no value for {block}")
+
+
+def emit_module(module: 'gen_ir.Module', allocations: Optional[List['regalloc.Allocation']] = None) -> str:
+    """
+    allocations are the register allocation of each function, done here if not given
+    """
+    if allocations is None:
+        allocations = [regalloc.allocate(function) for function in module.functions]
+    lines = ["\t.text"]
+    for function, allocation in zip(module.functions, allocations):
+        lines.extend(FunctionLowering(function, allocation).lower())
+    lines.append('\t.section .note.GNU-stack,"",@progbits')
+    return "\n".join(lines) + "\n"
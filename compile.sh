@@ -1,7 +1,12 @@
 #!/usr/bin/env bash
 
-python3 cheer/compile.py -i $1 -o example.ll
-llc example.ll -march=x86-64 -o example.s
+# BACKEND=native ./compile.sh prog.ch skips llc
+if [ "$BACKEND" = "native" ]; then
+    python3 cheer/compile.py -i $1 -o example.s --backend native
+else
+    python3 cheer/compile.py -i $1 -o example.ll
+    llc example.ll -march=x86-64 -o example.s
+fi
 gcc -c example.s -o example.o
 gcc example.o -o a.out
-#rm example.s example.o
\ No newline at end of file
+#rm example.s example.o
@@ -0,0 +1,50 @@
+import argparse
+
+from cheer import batch, compile
+
+
+def batch_options(tmp_path):
+    ap = argparse.ArgumentParser()
+    compile.add_compile_options(ap)
+    options = ap.parse_args(["--no-cache"])
+    options.output_dir = str(tmp_path / "out")
+    options.jobs = 2
+    return options
+
+
+def test_batch_compile(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "a.ch").write_text("fn main() { return 1; }")
+    (src / "sub" / "b.ch").write_text("fn main() { return 2; }")
+    (src / "sub" / "bad.ch").write_text("fn main() { return true + 1; }")
+    (src / "sub" / "unparsed.ch").write_text("fn main() { let x = 5 return x; }")
+
+    inputs = batch.find_inputs([str(src)])
+    results = batch.compile_all(batch_options(tmp_path), inputs)
+
+    assert [r.iname for r in results] == inputs
+    assert [r.ok for r in results] == [True, True, False, False]
+    assert "TypeCheckingError" in results[2].error
+    assert "Expected semicolon" in results[3].error
+    assert (tmp_path / "out" / "a.ll").exists()
+    assert (tmp_path / "out" / "sub" / "b.ll").exists()
+    assert "2 failed" in batch.report(results, 0.0)
+
+
+def test_batch_cache_stats(tmp_path, capsys):
+    (tmp_path / "a.ch").write_text("fn main() { return 1; }")
+    options = batch_options(tmp_path)
+    options.no_cache = False
+    options.cache_dir = str(tmp_path / "cache")
+    options.cache_stats = True
+    options.inputs = [str(tmp_path / "a.ch")]
+
+    batch.main(options)
+    assert "this run: 0 hits, 1 misses" in capsys.readouterr().out
+
+    # where the output goes and how many workers there are doesn't change it
+    options.output_dir = str(tmp_path / "elsewhere")
+    options.jobs = 1
+    batch.main(options)
+    assert "this run: 1 hits, 0 misses" in capsys.readouterr().out
@@ -0,0 +1,44 @@
+import os
+
+from cheer import cache
+from cheer import compile
+
+
+def test_cache_hit_and_miss(tmp_path):
+    c = cache.CompileCache(str(tmp_path))
+    key = c.key(b"fn main() { return 1; }", {})
+    assert c.get(key) is None
+    c.put(key, b"define i32 @main()")
+    assert c.get(key) == b"define i32 @main()"
+    assert (c.hits, c.misses) == (1, 1)
+
+    assert key != c.key(b"fn main() { return 1; }", {"backend": "native"})
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    c = cache.CompileCache(str(tmp_path), max_bytes=250)
+    keys = [c.key(str(i).encode(), {}) for i in range(3)]
+    for i, key in enumerate(keys):
+        c.put(key, b"x" * 100)
+        # make sure mtimes are ordered even on coarse clocks
+        os.utime(c.path(key, ".ll"), (i, i))
+
+    c.put(c.key(b"3", {}), b"x" * 100)
+    assert c.get(keys[0]) is None
+    assert c.get(keys[1]) is None
+    assert c.get(keys[2]) == b"x" * 100
+    assert c.evictions == 2
+
+    c.clear()
+    assert c.entries() == []
+
+
+def test_cached_compile_keeps_errors(tmp_path):
+    c = cache.CompileCache(str(tmp_path))
+    options = compile.arg_parser().parse_args([])
+    source = b"fn main() {\n return 1\n}"
+    for _ in range(2):
+        diagnostics = []
+        compile.cached_compile(options, source, c, diagnostics)
+        assert "Expected semicolon" in diagnostics[0]
+    assert c.entries() == []
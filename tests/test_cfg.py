@@ -0,0 +1,66 @@
+from cheer import cfg, gen_ir
+
+
+def const(value):
+    return gen_ir.Const("i32", value)
+
+
+def br(*blocks, condition=None):
+    operands = [condition] if condition is not None else []
+    return gen_ir.Instruction("br", None, operands, blocks=blocks)
+
+
+def function(*blocks):
+    f = gen_ir.Function("main", "i32")
+    f.basic_blocks.extend(blocks)
+    return f
+
+
+def test_constant_branch_and_unreachable():
+    entry, taken, skipped, end = (gen_ir.BasicBlock(name) for name in ["entry", "taken", "skipped", "end"])
+    entry.add_instr(br(taken, skipped, condition=gen_ir.Const("i1", True)))
+    taken.add_instr(br(end))
+    skipped.add_instr(br(end))
+    result = gen_ir.Register("i32")
+    end.add_instr(gen_ir.Instruction("phi", "i32", [const(1), const(2)], result, [taken, skipped]))
+    end.add_instr(gen_ir.Instruction("ret", "i32", [result]))
+    f = function(entry, taken, skipped, end)
+
+    assert cfg.simplify_cfg(f) > 0
+    assert f.basic_blocks == [entry]
+    assert [instr.to_code() for instr in entry.instructions] == ["ret i32 1"]
+
+
+def test_thread_jumps_keeps_phis():
+    entry, left, middle, right, end = (gen_ir.BasicBlock(name) for name in ["entry", "left", "middle", "right", "end"])
+    condition = gen_ir.Register("i1", "cond")
+    entry.add_instr(br(left, right, condition=condition))
+    left.add_instr(br(middle))
+    middle.add_instr(br(end))
+    right.add_instr(br(end))
+    result = gen_ir.Register("i32")
+    end.add_instr(gen_ir.Instruction("phi", "i32", [const(1), const(2)], result, [middle, right]))
+    end.add_instr(gen_ir.Instruction("ret", "i32", [result]))
+    f = function(entry, left, middle, right, end)
+
+    cfg.simplify_cfg(f)
+    assert right in f.basic_blocks and middle not in f.basic_blocks and left not in f.basic_blocks
+    assert entry.successors == [end, right]
+    phi = end.phis()[0]
+    assert dict(zip((b.name for b in phi.blocks), (v.value for v in phi.operands))) == {"right": 2, "entry": 1}
+    assert end.predecessors == {entry, right}
+
+
+def test_merge_chain():
+    entry, second, third = (gen_ir.BasicBlock(name) for name in ["entry", "second", "third"])
+    value = gen_ir.Register("i32")
+    entry.add_instr(br(second))
+    second.add_instr(gen_ir.Instruction("add", "i32", [const(1), const(2)], value))
+    second.add_instr(br(third))
+    third.add_instr(gen_ir.Instruction("ret", "i32", [value]))
+    f = function(entry, second, third)
+
+    cfg.simplify_cfg(f)
+    assert f.basic_blocks == [entry]
+    assert [instr.opcode for instr in entry.instructions] == ["add", "ret"]
+    assert all(instr.block is entry for instr in entry.instructions)
@@ -0,0 +1,20 @@
+from cheer import dce, gen_ir
+
+
+def test_removes_unused_pure_chain():
+    f = gen_ir.Function("main", "i32")
+    block = gen_ir.BasicBlock("entry")
+    f.basic_blocks.append(block)
+    buffer, char, read, a, b = (gen_ir.Register(t) for t in ["[2 x i8]*", "i8*", "i32", "i32", "i32"])
+    block.add_instr(gen_ir.Instruction("alloca", "[2 x i8]*", [], buffer, allocated="[2 x i8]", align=1))
+    block.add_instr(gen_ir.Instruction("getelementptr", "i8*", [buffer, gen_ir.Const("i32", 0), gen_ir.Const("i32", 0)],
+                                       char, source="[2 x i8]"))
+    # the read has a side effect, so it stays even though its value is unused
+    block.add_instr(gen_ir.Instruction("asm", "i32", [char], read, template="", constraints="={ax},{si}"))
+    block.add_instr(gen_ir.Instruction("add", "i32", [read, read], a))
+    block.add_instr(gen_ir.Instruction("mul", "i32", [a, a], b))
+    block.add_instr(gen_ir.Instruction("ret", "i32", [gen_ir.Const("i32", 0)]))
+
+    assert dce.eliminate_dead_code(f) == 2
+    assert [instr.opcode for instr in block.instructions] == ["alloca", "getelementptr", "asm", "ret"]
+    assert not read.uses
@@ -1,13 +1,15 @@
 import subprocess
-import shlex
 import pytest
 
 from cheer import compile
 
 
 class FakeOptions:
-    def __init__(self):
+    def __init__(self, arena=False, backend="llvm", opt_level=2):
         self.verbose = False
+        self.arena = arena
+        self.backend = backend
+        self.opt_level = opt_level
 
 
 class ProgramConfig:
@@ -18,19 +20,135 @@ class ProgramConfig:
         self.output = output
 
 
-def compile_backend(code):
-    with open('example.ll', 'w') as f:
-        f.write(code)
+def compile_backend(code, directory, backend="llvm"):
+    """
+    build code into directory/a.out
+    """
+    ll, asm, obj, exe = (str(directory / name) for name in ("example.ll", "example.s", "example.o", "a.out"))
+    if backend == "llvm":
+        with open(ll, 'w') as f:
+            f.write(code)
+    else:
+        with open(asm, 'w') as f:
+            f.write(code)
     try:
-        subprocess.run(shlex.split('llc example.ll -march=x86-64 -o example.s'), check=True)
-        subprocess.run(shlex.split('gcc -c example.s -o example.o'), check=True)
-        subprocess.run(shlex.split('gcc example.o -o a.out'), check=True)
+        if backend == "llvm":
+            subprocess.run(['llc', ll, '-march=x86-64', '-o', asm], check=True)
+        subprocess.run(['gcc', '-c', asm, '-o', obj], check=True)
+        subprocess.run(['gcc', obj, '-o', exe], check=True)
     except subprocess.CalledProcessError:
         # failed to compile
         return False
     return True
 
 
+NESTED_IF = '''
+    fn main() {
+        let x = input();
+        let y = 0;
+        let z = x * 2;
+        if (x == 49) {
+            y = 1;
+            if (z == 98) {
+                y = y + 7;
+            }
+        } else {
+            let w = x + 1;
+            if (w == 52) {
+                return w;
+            } else {
+                y = 3;
+            }
+        }
+        return y;
+    }
+'''
+
+SUM_LOOP = '''
+    fn main() {
+        let n = input();
+        let i = 0;
+        let sum = 0;
+        while (i == n == false) {
+            let k = n * 3;
+            sum = sum + k + i;
+            i = i + 1;
+        }
+        return sum;
+    }
+'''
+
+NESTED_LOOP = '''
+    fn main() {
+        let n = input() - 48;
+        let i = 0;
+        let total = 0;
+        while (i == n == false) {
+            let j = 0;
+            while (j == i == false) {
+                total = total + n * n + i;
+                j = j + 1;
+            }
+            if (total == 80) {
+                return 1;
+            }
+            i = i + 1;
+        }
+        return total;
+    }
+'''
+
+FUNCTIONS = '''
+    fn square(x: i32) -> i32 {
+        return x * x;
+    }
+
+    fn is_big(x: i32, limit: i32) -> bool {
+        return x == limit;
+    }
+
+    fn fact(n: i32) -> i32 {
+        if (n == 0) {
+            return 1;
+        }
+        return n * fact(n - 1);
+    }
+
+    fn many(a: i32, b: i32, c: i32, d: i32, e: i32, f: i32, g: i32, h: i32) -> i32 {
+        return a + b * 2 + c * 3 + d * 4 + e * 5 + f * 6 + g * 7 + h * 8;
+    }
+
+    fn main() {
+        let x = input() - 48;
+        let y = square(x) + fact(x);
+        if (is_big(y, 40)) {
+            return 1;
+        }
+        return y + many(1, 2, 3, 4, 5, 6, 7, x);
+    }
+'''
+
+CALL_IN_LOOP = '''
+    fn pick(flag: bool, a: i32, b: i32) -> i32 {
+        if (flag) {
+            return a;
+        }
+        return b;
+    }
+
+    fn main() {
+        let n = input() - 48;
+        let i = 0;
+        let total = 0;
+        let offset = n * 3;
+        while (i == n == false) {
+            total = total + pick(i == 2, 100, i) + offset;
+            i = i + 1;
+        }
+        return total + offset;
+    }
+'''
+
 tests = [
     ProgramConfig(
         '''
@@ -170,16 +288,99 @@ tests = [
     }
     ''', returns=5,
     ),
-
+    ProgramConfig(
+    '''
+    fn main() {
+        let x = input();
+        let y = input();
+        if (x == 52) {
+            return x * y + y * x;
+        }
+        return (x - y) * (x - y) + x * y;
+    }
+    ''', returns=80, input=b'4\n2\n' # 52 * 50 * 2 = 5200, 80 mod 256
+    ),
+    ProgramConfig(
+    '''
+    fn main() {
+        let x = input();
+        let y = input();
+        if (x == 52) {
+            return x * y + y * x;
+        }
+        return (x - y) * (x - y) + x * y;
+    }
+    ''', returns=196, input=b'2\n2\n' # 0 * 0 + 50 * 50 = 2500, 196 mod 256
+    ),
+    ProgramConfig(
+    '''
+    fn main() {
+        let a = input();
+        let b = a + 1;
+        let c = b * 2;
+        let d = c + a;
+        let e = d * b;
+        let f = e + c;
+        let g = f * d;
+        let h = g + e;
+        let i = h + a;
+        let j = i * b;
+        let k = j + c;
+        let l = k + d;
+        return a + b + c + d + e + f + g + h + i + j + k + l;
+    }
+    ''', returns=14, input=b'1\n' # more live values than registers
+    ),
+    ProgramConfig(
+    '''
+    fn main() {
+        let x = 3;
+        return x;
+        x = x + 1;
+        let y = x * 2;
+    }
+    ''', returns=3,
+    ),
+    ProgramConfig(
+    '''
+    fn main() {
+        let x = 5;
+        let y = x + 1;
+        let x = true;
+        if (x) {
+            return y;
+        }
+        return 0;
+    }
+    ''', returns=6, # the second x is a bool in its own slot
+    ),
+    ProgramConfig(NESTED_IF, returns=8, input=b'1\n'),
+    ProgramConfig(NESTED_IF, returns=52, input=b'3\n'),
+    ProgramConfig(NESTED_IF, returns=3, input=b'5\n'),
+    ProgramConfig(SUM_LOOP, returns=222, input=b'4\n'), # 52 * 156 + 51 * 52 / 2 = 9438, 222 mod 256
+    ProgramConfig(NESTED_LOOP, returns=0, input=b'0\n'), # never goes around
+    ProgramConfig(NESTED_LOOP, returns=32, input=b'3\n'), # 10 + 2 * 11
+    ProgramConfig(NESTED_LOOP, returns=1, input=b'5\n'), # 26 + 2 * 27 is 80
+    ProgramConfig(FUNCTIONS, returns=179, input=b'3\n'), # 9 + 6 + 164
+    ProgramConfig(FUNCTIONS, returns=1, input=b'4\n'), # 16 + 24
+    ProgramConfig(CALL_IN_LOOP, returns=164, input=b'4\n'), # 0 + 1 + 100 + 3, plus 5 * 12
 ]
 
 
+@pytest.mark.parametrize("opt_level", [0, 2])
+@pytest.mark.parametrize("backend", ["llvm", "native"])
 @pytest.mark.parametrize("test_config", tests)
-def test_e2e_program(test_config):
+def test_e2e_program(test_config, backend, opt_level, tmp_path):
     lines = test_config.prog.split('\n')
-    code = compile.compile(FakeOptions(), lines)
-    assert compile_backend(code), test_config.prog
-    proc = subprocess.Popen('./a.out',
+    code = compile.compile(FakeOptions(backend=backend, opt_level=opt_level), lines)
+    assert compile_backend(code, tmp_path, backend), test_config.prog
+    proc = subprocess.Popen(str(tmp_path / 'a.out'),
         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     out, errs = proc.communicate(input=test_config.input)
-    assert proc.returncode == test_config.returns, test_config.prog
\ No newline at end of file
+    assert proc.returncode == test_config.returns, test_config.prog
+
+
+@pytest.mark.parametrize("test_config", tests)
+def test_arena_same_code(test_config):
+    lines = test_config.prog.split('\n')
+    assert compile.compile(FakeOptions(arena=True), lines) == compile.compile(FakeOptions(), lines)
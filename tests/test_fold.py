@@ -0,0 +1,55 @@
+import pytest
+from cheer import fold, scanner, parser, lexing_rules
+
+
+def fold_expr(source, arena=False):
+    tokens = scanner.scan([f"return {source};"], lexing_rules.RULES)
+    root = parser.Parser(tokens, arena=arena).statement()
+    folder = fold.FoldingVisitor(root)
+    folder.accept()
+    return root.children[0], folder
+
+
+@pytest.mark.parametrize("arena", [False, True])
+def test_fold_constants(arena):
+    exp, folder = fold_expr("5 + 5 * (6 - 4) + 4", arena)
+    assert exp.ntype == "int_literal"
+    assert exp.symbol.value == 19
+    assert len(exp.children) == 0
+    assert folder.folded == 4
+
+
+def test_fold_wraps_like_i32():
+    exp, _ = fold_expr("2147483647 + 1")
+    assert exp.symbol.value == -2**31
+    exp, _ = fold_expr("65536 * 65536")
+    assert exp.symbol.value == 0
+
+
+def test_fold_equality():
+    exp, _ = fold_expr("1 + 1 == 2")
+    assert exp.ntype == "bool_literal"
+    assert exp.symbol.value is True
+    assert exp.symbol.lexeme == "true"
+
+
+@pytest.mark.parametrize("arena", [False, True])
+@pytest.mark.parametrize("source", ["x * 1", "1 * x", "x + 0", "0 + x", "x - 0", "x + (3 - 3)"])
+def test_identities(source, arena):
+    exp, _ = fold_expr(source, arena)
+    assert exp.ntype == "var"
+    assert exp.symbol.lexeme == "x"
+
+
+@pytest.mark.parametrize("source", ["x * 0", "0 * x", "x - x", "(x + 2) - (x + 2)"])
+def test_pure_identities(source):
+    exp, _ = fold_expr(source)
+    assert exp.ntype == "int_literal"
+    assert exp.symbol.value == 0
+
+
+@pytest.mark.parametrize("source", ["input() * 0", "0 * input()", "input() - input()", "x - y"])
+def test_keeps_side_effects(source):
+    exp, folder = fold_expr(source)
+    assert exp.ntype in ("times_exp", "minus_exp")
+    assert folder.folded == 0
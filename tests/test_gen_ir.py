@@ -0,0 +1,91 @@
+from cheer import gen_ir, scanner, parser, lexing_rules, type_checker
+
+
+def test_use_def_links():
+    block = gen_ir.BasicBlock("entry")
+    a = gen_ir.Register("i32")
+    b = gen_ir.Register("i32")
+    block.add_instr(gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 1), gen_ir.Const("i32", 2)], a))
+    block.add_instr(gen_ir.Instruction("mul", "i32", [a, a], b))
+    ret = gen_ir.Instruction("ret", "i32", [b])
+    block.add_instr(ret)
+
+    assert a.definition is block.instructions[0]
+    assert a.uses == {block.instructions[1]: 2}
+    assert ret.uses == [b]
+    assert block.returns
+
+    b.replace_all_uses_with(gen_ir.Const("i32", 9))
+    assert not b.uses
+    assert ret.to_code() == "ret i32 9"
+
+
+def test_erase_while_iterating():
+    block = gen_ir.BasicBlock("entry")
+    regs = [gen_ir.Register("i32") for _ in range(4)]
+    for reg in regs:
+        block.add_instr(gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 1), gen_ir.Const("i32", 1)], reg))
+    for instr in block.instructions:
+        if instr.result in (regs[0], regs[2]):
+            instr.erase()
+
+    assert [instr.result for instr in block.instructions] == [regs[1], regs[3]]
+    assert all(instr.block is block for instr in block.instructions)
+
+
+def test_render_numbers_registers():
+    f = gen_ir.Function("main", "i32")
+    block = gen_ir.BasicBlock("entry")
+    f.basic_blocks.append(block)
+    dead = gen_ir.Register("i32")
+    kept = gen_ir.Register("i32")
+    block.add_instr(gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 1), gen_ir.Const("i32", 1)], dead))
+    block.add_instr(gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 2), gen_ir.Const("i32", 2)], kept))
+    block.add_instr(gen_ir.Instruction("ret", "i32", [kept]))
+
+    block.instructions[0].erase()
+    assert f.to_code()[2] == "  %0 = add i32 2, 2"
+    assert f.to_code()[3] == "  ret i32 %0"
+
+
+def test_allocas_hoisted_to_entry():
+    prog = """
+        fn main() {
+            if (input() == 49) {
+                return input();
+            }
+            return 5 * 2;
+        }
+    """
+    root = parser.Parser(scanner.scan(prog.split("\n"), lexing_rules.RULES)).start()
+    tc = type_checker.TCVisitor(root)
+    tc.accept()
+    gen_code = gen_ir.CodeGenVisitor(root, tc.symbol_table)
+    gen_code.accept()
+
+    entry, *rest = gen_code.function.basic_blocks
+    assert [instr.opcode for instr in entry.instructions[:2]] == ["alloca", "alloca"]
+    assert all(instr.opcode != "alloca" for block in rest for instr in block.instructions)
+    # literals are immediates
+    assert "mul i32 5, 2" in gen_code.get_code()
+
+
+def test_code_after_return_left_out():
+    prog = """
+        fn main() {
+            let x = input();
+            return x;
+            let y = x + 1;
+            x = y * 2;
+        }
+    """
+    root = parser.Parser(scanner.scan(prog.split("\n"), lexing_rules.RULES)).start()
+    tc = type_checker.TCVisitor(root)
+    tc.accept()
+    gen_code = gen_ir.CodeGenVisitor(root, tc.symbol_table)
+    gen_code.accept()
+
+    block = gen_code.function.basic_blocks[-1]
+    assert block.instructions[-1].opcode == "ret"
+    assert not any(instr.opcode in ("add", "mul") for instr in gen_code.function.instructions())
+    assert gen_code.get_code().splitlines()[-2].strip().startswith("ret")
@@ -0,0 +1,57 @@
+from cheer import cfg, gen_ir, gvn
+
+
+def test_commutative_and_scoped():
+    f = gen_ir.Function("main", "i32")
+    entry, left, right = (gen_ir.BasicBlock(name) for name in ["entry", "left", "right"])
+    f.basic_blocks.extend([entry, left, right])
+    x = gen_ir.Register("i32", "x")
+    y = gen_ir.Register("i32", "y")
+    xy, yx, cond, cond2, left_xy, right_sum, right_sum2 = (gen_ir.Register(t) for t in
+                                                            ["i32", "i32", "i1", "i1", "i32", "i32", "i32"])
+    entry.add_instr(gen_ir.Instruction("mul", "i32", [x, y], xy))
+    entry.add_instr(gen_ir.Instruction("mul", "i32", [y, x], yx))
+    entry.add_instr(gen_ir.Instruction("icmp", "i1", [xy, yx], cond, predicate="eq"))
+    entry.add_instr(gen_ir.Instruction("br", None, [cond], blocks=[left, right]))
+    left.add_instr(gen_ir.Instruction("icmp", "i1", [yx, xy], cond2, predicate="eq"))
+    left.add_instr(gen_ir.Instruction("ret", "i32", [cond2]))
+    right.add_instr(gen_ir.Instruction("add", "i32", [x, gen_ir.Const("i32", 1)], right_sum))
+    right.add_instr(gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 1), x], right_sum2))
+    right.add_instr(gen_ir.Instruction("sub", "i32", [right_sum, right_sum2], left_xy))
+    right.add_instr(gen_ir.Instruction("ret", "i32", [left_xy]))
+
+    assert gvn.number_values(f) == 3
+    assert [instr.opcode for instr in entry.instructions] == ["mul", "icmp", "br"]
+    assert entry.instructions[1].operands == [xy, xy]
+    assert left.instructions[0].operands == [cond]
+    assert right.instructions[1].operands == [right_sum, right_sum]
+
+
+def test_siblings_not_shared():
+    f = gen_ir.Function("main", "i32")
+    entry, left, right = (gen_ir.BasicBlock(name) for name in ["entry", "left", "right"])
+    f.basic_blocks.extend([entry, left, right])
+    x = gen_ir.Register("i1", "x")
+    a, b = gen_ir.Register("i32"), gen_ir.Register("i32")
+    entry.add_instr(gen_ir.Instruction("br", None, [x], blocks=[left, right]))
+    left.add_instr(gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 2), gen_ir.Const("i32", 3)], a))
+    left.add_instr(gen_ir.Instruction("ret", "i32", [a]))
+    right.add_instr(gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 2), gen_ir.Const("i32", 3)], b))
+    right.add_instr(gen_ir.Instruction("ret", "i32", [b]))
+
+    assert gvn.number_values(f) == 0
+
+
+def test_dominator_tree():
+    f = gen_ir.Function("main", "i32")
+    entry, left, right, end = (gen_ir.BasicBlock(name) for name in ["entry", "left", "right", "end"])
+    f.basic_blocks.extend([entry, left, right, end])
+    entry.add_instr(gen_ir.Instruction("br", None, [gen_ir.Register("i1", "c")], blocks=[left, right]))
+    left.add_instr(gen_ir.Instruction("br", None, blocks=[end]))
+    right.add_instr(gen_ir.Instruction("br", None, blocks=[end]))
+    end.add_instr(gen_ir.Instruction("ret", "i32", [gen_ir.Const("i32", 0)]))
+
+    tree = cfg.DominatorTree(f)
+    assert tree.idom == {entry: None, left: entry, right: entry, end: entry}
+    assert tree.dominates(entry, end) and not tree.dominates(left, end)
+    assert tree.preorder()[0] is entry
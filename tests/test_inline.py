@@ -0,0 +1,108 @@
+from cheer import gen_ir, inline, scanner, parser, lexing_rules, type_checker, passes
+
+
+def build(prog, names=("mem2reg",)):
+    root = parser.Parser(scanner.scan(prog.split("\n"), lexing_rules.RULES)).start()
+    tc = type_checker.TCVisitor(root)
+    tc.accept()
+    gen_code = gen_ir.CodeGenVisitor(root, tc.symbol_table)
+    gen_code.accept()
+    passes.PassManager(names).run_ir(gen_code.module)
+    return gen_code.module
+
+
+def opcodes(function):
+    return [instr.opcode for instr in function.instructions()]
+
+
+def test_small_function_inlined_everywhere():
+    module = build("""
+        fn pick(flag: bool, a: i32, b: i32) -> i32 {
+            if (flag) {
+                return a;
+            }
+            return b;
+        }
+
+        fn main() {
+            let x = input();
+            return pick(x == 1, x, 2) + pick(x == 2, 3, x);
+        }
+    """)
+    counts = inline.inline_functions(module)
+
+    assert counts == {"calls inlined": 2, "functions removed": 1}
+    main, = module.functions
+    assert "call" not in opcodes(main)
+    # both returns of pick come together in a phi
+    assert opcodes(main).count("phi") == 2
+    assert main.basic_blocks[1].name == "pick.1.entry"
+    assert all(block in main.basic_blocks for block in main.basic_blocks[-1].predecessors)
+
+
+def test_recursive_not_inlined():
+    module = build("""
+        fn fact(n: i32) -> i32 {
+            if (n == 0) {
+                return 1;
+            }
+            return n * fact(n - 1);
+        }
+
+        fn main() {
+            return fact(5);
+        }
+    """)
+    assert inline.recursive(module) == {"fact"}
+    assert inline.inline_functions(module)["calls inlined"] == 0
+    assert [function.name for function in module.functions] == ["fact", "main"]
+
+
+def test_budget():
+    prog = """
+        fn big(a: i32) -> i32 {
+            let b = a * a + a;
+            let c = b * b + a;
+            let d = c * c + b;
+            let e = d * d + c;
+            let f = e * e + d;
+            let g = f * f + e;
+            return g * g + f;
+        }
+
+        fn main() {
+            let x = input();
+            return big(x) + big(x + 1);
+        }
+    """
+    module = build(prog)
+    big = module.functions[0]
+    assert inline.size(big) > inline.SMALL_FUNCTION
+    # called from two places, so only small functions would be inlined
+    assert inline.inline_functions(module)["calls inlined"] == 0
+
+    module = build(prog.replace(" + big(x + 1)", ""))
+    assert inline.inline_functions(module, budget=inline.size(big) - 1)["calls inlined"] == 0
+    assert inline.inline_functions(module)["calls inlined"] == 1
+    assert [function.name for function in module.functions] == ["main"]
+
+
+def test_stack_slots_stay_in_entry():
+    module = build("""
+        fn add(a: i32, b: i32) -> i32 {
+            return a + b;
+        }
+
+        fn main() {
+            let i = 0;
+            while (i == 3 == false) {
+                i = add(i, 1);
+            }
+            return i;
+        }
+    """, names=())
+    inline.inline_functions(module)
+
+    main, = module.functions
+    assert opcodes(main).count("alloca") == 3
+    assert all(instr.block is main.basic_blocks[0] for instr in main.instructions() if instr.opcode == "alloca")
@@ -0,0 +1,81 @@
+from cheer import gen_ir, licm
+
+
+def loop_function():
+    """
+    entry -> header <-> body, header -> end
+    """
+    f = gen_ir.Function("main", "i32")
+    entry, header, body, end = (gen_ir.BasicBlock(name) for name in ["entry", "header", "body", "end"])
+    f.basic_blocks.extend([entry, header, body, end])
+    entry.add_instr(gen_ir.Instruction("br", None, blocks=[header]))
+    return f, entry, header, body, end
+
+
+def test_hoists_invariant_chain():
+    f, entry, header, body, end = loop_function()
+    n = gen_ir.Register("i32", "n")
+    i, cond, square, plus, next_i = (gen_ir.Register(t) for t in ["i32", "i1", "i32", "i32", "i32"])
+    phi = gen_ir.Instruction("phi", "i32", [], i)
+    header.add_instr(phi)
+    header.add_instr(gen_ir.Instruction("icmp", "i1", [i, n], cond, predicate="eq"))
+    header.add_instr(gen_ir.Instruction("br", None, [cond], blocks=[end, body]))
+    body.add_instr(gen_ir.Instruction("mul", "i32", [n, n], square))
+    body.add_instr(gen_ir.Instruction("add", "i32", [square, gen_ir.Const("i32", 1)], plus))
+    body.add_instr(gen_ir.Instruction("add", "i32", [i, plus], next_i))
+    body.add_instr(gen_ir.Instruction("br", None, blocks=[header]))
+    phi.add_incoming(gen_ir.Const("i32", 0), entry)
+    phi.add_incoming(next_i, body)
+    end.add_instr(gen_ir.Instruction("ret", "i32", [i]))
+
+    assert licm.hoist_invariants(f) == 2
+    # entry only jumps to the loop, so it's already the preheader
+    assert [instr.opcode for instr in entry.instructions] == ["mul", "add", "br"]
+    assert [instr.opcode for instr in body.instructions] == ["add", "br"]
+    assert len(f.basic_blocks) == 4
+
+
+def test_makes_preheader():
+    f, entry, header, body, end = loop_function()
+    other = gen_ir.BasicBlock("other")
+    entry.instructions[-1].erase()
+    c, n = gen_ir.Register("i1", "c"), gen_ir.Register("i32", "n")
+    entry.add_instr(gen_ir.Instruction("br", None, [c], blocks=[header, other]))
+    other.add_instr(gen_ir.Instruction("br", None, blocks=[header]))
+    f.basic_blocks.insert(1, other)
+    i, double = gen_ir.Register("i32"), gen_ir.Register("i32")
+    phi = gen_ir.Instruction("phi", "i32", [], i)
+    header.add_instr(phi)
+    header.add_instr(gen_ir.Instruction("br", None, [c], blocks=[body, end]))
+    body.add_instr(gen_ir.Instruction("add", "i32", [n, n], double))
+    body.add_instr(gen_ir.Instruction("br", None, blocks=[header]))
+    phi.add_incoming(gen_ir.Const("i32", 1), entry)
+    phi.add_incoming(gen_ir.Const("i32", 2), other)
+    phi.add_incoming(double, body)
+    end.add_instr(gen_ir.Instruction("ret", "i32", [i]))
+
+    assert licm.hoist_invariants(f) == 1
+    pre = f.basic_blocks[2]
+    assert pre.name == "header_pre"
+    assert entry.successors == [pre, other] and other.successors == [pre]
+    # the values from outside the loop are picked before it
+    assert [instr.opcode for instr in pre.instructions] == ["phi", "add", "br"]
+    assert pre.instructions[0].blocks == [entry, other]
+    assert phi.blocks == [body, pre] and phi.operands == [double, pre.instructions[0].result]
+    assert body.instructions[0].opcode == "br"
+
+
+def test_nothing_invariant():
+    f, entry, header, body, end = loop_function()
+    i, next_i = gen_ir.Register("i32"), gen_ir.Register("i32")
+    phi = gen_ir.Instruction("phi", "i32", [], i)
+    header.add_instr(phi)
+    header.add_instr(gen_ir.Instruction("br", None, [gen_ir.Register("i1", "c")], blocks=[body, end]))
+    body.add_instr(gen_ir.Instruction("add", "i32", [i, gen_ir.Const("i32", 1)], next_i))
+    body.add_instr(gen_ir.Instruction("br", None, blocks=[header]))
+    phi.add_incoming(gen_ir.Const("i32", 0), entry)
+    phi.add_incoming(next_i, body)
+    end.add_instr(gen_ir.Instruction("ret", "i32", [i]))
+
+    assert licm.hoist_invariants(f) == 0
+    assert len(f.basic_blocks) == 4
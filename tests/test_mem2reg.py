@@ -0,0 +1,82 @@
+from cheer import gen_ir, mem2reg
+
+
+def build(instrs):
+    f = gen_ir.Function("main", "i32")
+    block = gen_ir.BasicBlock("entry")
+    f.basic_blocks.append(block)
+    for instr in instrs:
+        block.add_instr(instr)
+    return f
+
+
+def test_promote_slot():
+    slot = gen_ir.Register("i32*")
+    first = gen_ir.Register("i32")
+    total = gen_ir.Register("i32")
+    second = gen_ir.Register("i32")
+    f = build([
+        gen_ir.Instruction("alloca", "i32*", [], slot, allocated="i32", align=4),
+        gen_ir.Instruction("store", "i32", [gen_ir.Const("i32", 5), slot]),
+        gen_ir.Instruction("load", "i32", [slot], first, align=4),
+        gen_ir.Instruction("add", "i32", [first, first], total),
+        gen_ir.Instruction("store", "i32", [total, slot]),
+        gen_ir.Instruction("load", "i32", [slot], second, align=4),
+        gen_ir.Instruction("ret", "i32", [second]),
+    ])
+
+    assert mem2reg.promote_allocas(f) == 1
+    assert f.to_code()[2:4] == ["  %0 = add i32 5, 5", "  ret i32 %0"]
+
+
+def test_leaves_escaping_slot():
+    buffer = gen_ir.Register("[2 x i8]*")
+    char = gen_ir.Register("i8*")
+    f = build([
+        gen_ir.Instruction("alloca", "[2 x i8]*", [], buffer, allocated="[2 x i8]", align=1),
+        gen_ir.Instruction("getelementptr", "i8*", [buffer, gen_ir.Const("i32", 0), gen_ir.Const("i32", 0)],
+                           char, source="[2 x i8]"),
+        gen_ir.Instruction("ret", "i32", [gen_ir.Const("i32", 0)]),
+    ])
+    assert mem2reg.promote_allocas(f) == 0
+    assert len(f.basic_blocks[0].instructions) == 3
+
+
+def test_load_before_store_reads_zero():
+    slot = gen_ir.Register("i32*")
+    loaded = gen_ir.Register("i32")
+    f = build([
+        gen_ir.Instruction("alloca", "i32*", [], slot, allocated="i32", align=4),
+        gen_ir.Instruction("load", "i32", [slot], loaded, align=4),
+        gen_ir.Instruction("store", "i32", [gen_ir.Const("i32", 1), slot]),
+        gen_ir.Instruction("ret", "i32", [loaded]),
+    ])
+    assert mem2reg.promote_allocas(f) == 1
+    assert f.to_code()[2] == "  ret i32 0"
+
+
+def test_phis_only_where_needed():
+    f = gen_ir.Function("main", "i32")
+    entry, left, right, end = (gen_ir.BasicBlock(name) for name in ["entry", "left", "right", "end"])
+    f.basic_blocks.extend([entry, left, right, end])
+    x, y = gen_ir.Register("i32*"), gen_ir.Register("i32*")
+    cond = gen_ir.Register("i1", "cond")
+    x_value, y_value = gen_ir.Register("i32"), gen_ir.Register("i32")
+    entry.add_instr(gen_ir.Instruction("alloca", "i32*", [], x, allocated="i32", align=4))
+    entry.add_instr(gen_ir.Instruction("alloca", "i32*", [], y, allocated="i32", align=4))
+    entry.add_instr(gen_ir.Instruction("store", "i32", [gen_ir.Const("i32", 1), x]))
+    entry.add_instr(gen_ir.Instruction("store", "i32", [gen_ir.Const("i32", 1), y]))
+    entry.add_instr(gen_ir.Instruction("br", None, [cond], blocks=[left, right]))
+    # x is different on each side, y is set to the same thing
+    left.add_instr(gen_ir.Instruction("store", "i32", [gen_ir.Const("i32", 2), x]))
+    left.add_instr(gen_ir.Instruction("br", None, blocks=[end]))
+    right.add_instr(gen_ir.Instruction("store", "i32", [gen_ir.Const("i32", 1), y]))
+    right.add_instr(gen_ir.Instruction("br", None, blocks=[end]))
+    end.add_instr(gen_ir.Instruction("load", "i32", [x], x_value, align=4))
+    end.add_instr(gen_ir.Instruction("load", "i32", [y], y_value, align=4))
+    end.add_instr(gen_ir.Instruction("ret", "i32", [x_value]))
+
+    assert mem2reg.promote_allocas(f) == 2
+    assert [instr.opcode for instr in f.instructions()] == ["br", "br", "br", "phi", "ret"]
+    phi = end.phis()[0]
+    assert [(value.value, block.name) for value, block in zip(phi.operands, phi.blocks)] == [(2, "left"), (1, "right")]
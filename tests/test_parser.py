@@ -19,4 +19,119 @@ def test_parse1():
     times2 = ast.ASTNode("times_exp", scanner.Symbol("times", "*", None, 1,  17), [a9, a11])
     minus = ast.ASTNode("minus_exp", scanner.Symbol("minus", "-", None, 1,  13), [times1, times2])
 
-    assert root == minus
\ No newline at end of file
+    assert root.structurally_equal(minus)
+
+def test_parse_lazy_tokens():
+    prog = ["fn main() {", "return 1 + 2;", "}"]
+    tokens = scanner.iter_scan(prog, lexing_rules.RULES)
+    p = parser.Parser(tokens)
+    root = p.start()
+
+    assert root.ntype == "program"
+    assert root.children[0].ntype == "function"
+    assert root.children[0].children[1].children[0].ntype == "return"
+    assert p.peek().kind == lexing_rules.TokenKind.EOF
+
+
+def test_parse_minus_left_associative():
+    prog = ["(((10 - 4))) - 3"]
+    tokens = scanner.scan(prog, lexing_rules.RULES)
+    p = parser.Parser(tokens)
+    root = p.expr()
+
+    assert root.ntype == "minus_exp"
+    assert root.children[0].ntype == "minus_exp"
+    assert root.children[1].symbol.value == 3
+
+
+def test_parse_long_expression():
+    prog = [" + ".join(["1"] * 5000) + " == ((((((1))))))"]
+    tokens = scanner.scan(prog, lexing_rules.RULES)
+    p = parser.Parser(tokens)
+    root = p.expr()
+
+    assert root.ntype == "equality_exp"
+    assert root.children[0].ntype == "plus_exp"
+
+
+def test_ast_digraph_keeps_equal_subtrees():
+    prog = ["fn main() { return (1 + 1) * (1 + 1); }"]
+    tokens = scanner.scan(prog, lexing_rules.RULES)
+    root = parser.Parser(tokens).start()
+    times = root.children[0].children[1].children[0].children[0]
+
+    assert times.children[0] != times.children[1]
+    assert ast.gen_ast_digraph(root).count("label=\"int_literal\"") == 4
+
+
+def test_parse_arena():
+    prog = ["fn main() { let x = 1; if (x == 2) { x = 3; } return x + 4; }"]
+    tokens = scanner.scan(prog, lexing_rules.RULES)
+    tree = parser.Parser(list(tokens)).start()
+    root = parser.Parser(tokens, arena=True).start()
+
+    arena = root.arena
+    assert len(arena) == 18
+    # built straight into the arena, children before their parents
+    assert root.index == len(arena) - 1
+    statements = root.children[0].children[1]
+    assert all(c.index < statements.index for c in statements.children)
+    assert [c.ntype for c in statements.children] == ["var_decl_assign", "if_statement", "return"]
+    assert statements.children[-1] == statements.children[2]
+    assert [c.ntype for c in statements.children[1:]] == ["if_statement", "return"]
+    assert statements.symbol is arena.symbols[statements.index]
+    assert statements.children[2].children[0].children[1].symbol == \
+        tree.children[0].children[1].children[2].children[0].children[1].symbol
+
+    arena.clear()
+    assert len(arena) == 0 and not arena.child_indices and not arena.symbols
+
+
+def test_parse_while():
+    prog = ["fn main() { let i = 0; while (i == 3 == false) { i = i + 1; } return i; }"]
+    root = parser.Parser(scanner.scan(prog, lexing_rules.RULES)).start()
+    loop = root.children[0].children[1].children[1]
+
+    assert loop.ntype == "while_statement"
+    assert loop.children[0].ntype == "equality_exp"
+    assert [c.ntype for c in loop.children[1].children] == ["assignment"]
+
+
+def test_parse_stops_at_eof():
+    prog = ["fn main() { return 1;"]
+    root = parser.Parser(scanner.scan(prog, lexing_rules.RULES)).start()
+    assert [c.ntype for c in root.children[0].children[1].children] == ["return"]
+
+
+def test_parse_functions():
+    prog = [
+        "fn add(a: i32, b: i32) -> i32 { return a + b; }",
+        "fn main() { return add(1, add(2, 3)) * 2; }",
+    ]
+    root = parser.Parser(scanner.scan(prog, lexing_rules.RULES)).start()
+    add, main = root.children
+
+    assert [add.symbol.lexeme, main.symbol.lexeme] == ["add", "main"]
+    params, return_type, _ = add.children
+    assert [(p.symbol.lexeme, p.children[0].ntype) for p in params.children] == [("a", "i32"), ("b", "i32")]
+    assert return_type.ntype == "i32"
+    assert [c.ntype for c in main.children] == ["params", "statement_list"]
+    call = main.children[1].children[0].children[0].children[0]
+    assert call.ntype == "call_exp"
+    assert [c.ntype for c in call.children] == ["int_literal", "call_exp"]
+
+
+@pytest.mark.parametrize("prog", [
+    "fn main() { }",
+    "fn main() { while (c) { } return 1; }",
+    "fn main() { if (true) { } return 1; }",
+    "fn main() { 5; return 1; }",
+    "",
+])
+@pytest.mark.parametrize("arena", [False, True])
+def test_parse_errors_reported(prog, arena):
+    diagnostics = []
+    p = parser.Parser(scanner.scan([prog], lexing_rules.RULES), arena=arena, diagnostics=diagnostics)
+    p.start()
+    assert diagnostics and diagnostics[0].startswith("Expected")
+    assert p.errors == len(diagnostics)
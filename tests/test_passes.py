@@ -0,0 +1,52 @@
+import pytest
+from cheer import compile, passes, parser, scanner, lexing_rules, type_checker
+
+
+def test_order_follows_dependencies():
+    ordered = passes.order(["dce", "peephole", "fold", "gvn"])
+    assert [p.name for p in ordered] == ["fold", "gvn", "peephole", "dce"]
+
+
+def test_order_keeps_independent_passes():
+    assert [p.name for p in passes.order(["simplify-cfg", "mem2reg"])] == ["mem2reg", "simplify-cfg"]
+    assert [p.name for p in passes.order(["gvn", "gvn"])] == ["gvn"]
+
+
+def test_cli_levels_and_passes():
+    ap = compile.arg_parser()
+    assert ap.parse_args(["-O0"]).opt_level == 0
+    assert ap.parse_args([]).opt_level == 2
+    options = ap.parse_args(["-O1", "--passes=gvn, dce"])
+    assert options.passes == ["gvn", "dce"]
+    assert [p.name for p in passes.PassManager.from_options(options).passes] == ["gvn", "dce"]
+    with pytest.raises(SystemExit):
+        ap.parse_args(["--passes=gvn,nope"])
+
+
+def test_pass_options_in_cache_key():
+    ap = compile.arg_parser()
+    assert compile.cache_options(ap.parse_args(["-O1"])) != compile.cache_options(ap.parse_args(["-O2"]))
+    assert compile.cache_options(ap.parse_args(["--time-passes"])) == compile.cache_options(ap.parse_args([]))
+
+
+def test_records(capsys):
+    prog = """
+        fn main() {
+            let x = input();
+            return x * 1 + (x - x) + 2 * 3;
+        }
+    """
+    options = compile.arg_parser().parse_args(["--time-passes"])
+    compile.compile(options, prog.split("\n"))
+    report = capsys.readouterr().out
+    assert report.splitlines()[0].split() == ["pass", "time", "(ms)", "before", "after", "changes"]
+
+    manager = passes.PassManager(passes.LEVELS[2])
+    root = parser.Parser(scanner.scan(prog.split("\n"), lexing_rules.RULES)).start()
+    checker = type_checker.TCVisitor(root)
+    manager.run_ast(root, checker)
+    assert root.children[0].type == "i32"
+    fold_record = manager.records[0]
+    assert fold_record.name == "fold"
+    assert fold_record.changed and fold_record.after < fold_record.before
+    assert fold_record.seconds >= 0
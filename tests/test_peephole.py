@@ -0,0 +1,59 @@
+from cheer import gen_ir, peephole
+
+
+def run(*instrs):
+    f = gen_ir.Function("main", "i32")
+    block = gen_ir.BasicBlock("entry")
+    f.basic_blocks.append(block)
+    for instr in instrs:
+        block.add_instr(instr)
+    fired = peephole.optimize(f)
+    return block, fired
+
+
+def test_fixed_point():
+    x = gen_ir.Register("i32", "x")
+    a, b, c, d = (gen_ir.Register("i32") for _ in range(4))
+    block, fired = run(
+        gen_ir.Instruction("sub", "i32", [x, x], a),
+        gen_ir.Instruction("add", "i32", [x, a], b),
+        gen_ir.Instruction("mul", "i32", [gen_ir.Const("i32", 1), b], c),
+        gen_ir.Instruction("add", "i32", [gen_ir.Const("i32", 2147483647), gen_ir.Const("i32", 1)], d),
+        gen_ir.Instruction("ret", "i32", [c]),
+    )
+    assert [instr.to_code() for instr in block.instructions] == ["ret i32 %x"]
+    assert fired["sub x, x"] == 1
+    assert fired["add x, 0"] == 1
+    assert fired["mul 1, x"] == 1
+    assert fired["add constants"] == 1
+    assert not d.uses
+
+
+def test_store_then_load():
+    slot = gen_ir.Register("i32*", "slot")
+    loaded = gen_ir.Register("i32")
+    cond = gen_ir.Register("i1")
+    block, fired = run(
+        gen_ir.Instruction("store", "i32", [gen_ir.Const("i32", 7), slot]),
+        gen_ir.Instruction("load", "i32", [slot], loaded, align=4),
+        gen_ir.Instruction("icmp", "i1", [loaded, gen_ir.Const("i32", 7)], cond, predicate="eq"),
+        gen_ir.Instruction("ret", "i1", [cond]),
+    )
+    assert [instr.to_code() for instr in block.instructions] == ["store i32 7, i32* %slot", "ret i1 true"]
+    assert fired["store then load"] == 1
+    assert fired["icmp eq constants"] == 1
+
+
+def test_only_given_rules():
+    x = gen_ir.Register("i32", "x")
+    zero, same = gen_ir.Register("i32"), gen_ir.Register("i32")
+    f = gen_ir.Function("main", "i32")
+    block = gen_ir.BasicBlock("entry")
+    f.basic_blocks.append(block)
+    block.add_instr(gen_ir.Instruction("sub", "i32", [x, x], zero))
+    block.add_instr(gen_ir.Instruction("add", "i32", [x, zero], same))
+    block.add_instr(gen_ir.Instruction("ret", "i32", [same]))
+    rules = [rule for rule in peephole.RULES if rule.name == "sub x, x"]
+
+    assert peephole.optimize(f, rules) == {"sub x, x": 1}
+    assert f.to_code()[2] == "  %0 = add i32 %x, 0"
@@ -0,0 +1,90 @@
+import itertools
+
+from cheer import gen_ir, regalloc, scanner, parser, lexing_rules, type_checker, passes, x86
+
+
+PROG = """
+    fn main() {
+        let a = input();
+        let b = input();
+        let y = 0;
+        if (a == b) {
+            y = a * b;
+        } else {
+            y = a + b + 1;
+        }
+        return y + a;
+    }
+"""
+
+
+def build(prog, name="main"):
+    root = parser.Parser(scanner.scan(prog.split("\n"), lexing_rules.RULES)).start()
+    tc = type_checker.TCVisitor(root)
+    tc.accept()
+    gen_code = gen_ir.CodeGenVisitor(root, tc.symbol_table)
+    gen_code.accept()
+    passes.PassManager(passes.LEVELS[2]).run_ir(gen_code.module)
+    return next(function for function in gen_code.module.functions if function.name == name)
+
+
+def test_overlapping_intervals_get_different_registers():
+    allocation = regalloc.allocate(build(PROG))
+    assert allocation.spills == 0
+    in_registers = [i for i in allocation.intervals.values() if i.register is not None]
+    for a, b in itertools.combinations(in_registers, 2):
+        if a.start <= b.end and b.start <= a.end:
+            assert a.register != b.register, (a, b)
+
+
+def test_values_live_across_branches():
+    function = build(PROG)
+    allocation = regalloc.allocate(function)
+    # a is used at the very end, after the if/else joins
+    ret = function.basic_blocks[-1].instructions[-1]
+    add = ret.operands[0].definition
+    a = next(op for op in add.operands if op.definition.block is function.basic_blocks[0])
+    phi = function.basic_blocks[-1].phis()[0]
+    assert allocation.intervals[a].end >= allocation.intervals[phi.result].start
+
+
+def test_spills_when_out_of_registers():
+    function = build(PROG)
+    allocation = regalloc.allocate(function, regalloc.REGISTERS[:2])
+    assert allocation.spills > 0
+    assert allocation.max_pressure > 2
+    assert len(allocation.used_registers()) == 2
+    assert "spilled" in allocation.report()
+
+
+def test_all_spilled_still_lowers():
+    function = build(PROG)
+    allocation = regalloc.allocate(function, [])
+    assert all(i.register is None for i in allocation.intervals.values())
+    module = gen_ir.Module()
+    module.functions.append(function)
+    code = x86.emit_module(module, [allocation])
+    assert "%rbx" not in code
+
+
+def test_values_live_across_calls_are_callee_saved():
+    prog = """
+        fn fact(n: i32) -> i32 {
+            if (n == 0) {
+                return 1;
+            }
+            return n * fact(n - 1);
+        }
+
+        fn main() {
+            return fact(input());
+        }
+    """
+    function = build(prog, "fact")
+    allocation = regalloc.allocate(function)
+    n = function.params[0]
+    callee_saved = [narrow for wide, narrow in regalloc.REGISTERS if wide in regalloc.CALLEE_SAVED]
+    # n is needed after the recursive call returns
+    assert allocation.register(n) in callee_saved
+    allocation = regalloc.allocate(function, [r for r in regalloc.REGISTERS if r[0] not in regalloc.CALLEE_SAVED])
+    assert allocation.register(n) is None
@@ -1,4 +1,5 @@
-from cheer import scanner
+import pytest
+from cheer import scanner, lexing_rules
 
 
 def test_scanner():
@@ -35,4 +36,47 @@ def test_scanner_to_value():
         scanner.Symbol("bool_literal", "true", True, 1, 18),
     ]
 
-    assert expected == tokens
\ No newline at end of file
+    assert expected == tokens
+
+def test_scanner_no_match():
+    rules = [
+        scanner.SymbolRule("[a-z]+", "id"),
+        scanner.SymbolRule(" ", "whitespace", add_symbol=False)
+    ]
+    with pytest.raises(ValueError):
+        scanner.scan(["abc 123"], rules)
+
+
+def test_scan_table():
+    lines = ["fn main() {\n", "  return x + x;\n", "}\n"]
+    table = scanner.scan_table(lines, lexing_rules.RULES)
+
+    assert list(table) == scanner.scan(lines, lexing_rules.RULES)
+    assert table.kinds[0] == lexing_rules.TokenKind.FUNCTION_DEF
+    assert [s.kind for s in table] == [s.kind for s in scanner.scan(lines, lexing_rules.RULES)]
+    assert table[0].kind == lexing_rules.TokenKind.FUNCTION_DEF
+    # both x's share one interned lexeme
+    assert table.lexeme_ids[6] == table.lexeme_ids[8]
+    assert table.location(6) == (2, 10)
+
+
+def test_scan_buffer():
+    source = b"fn main() {\n  return\n    1;\n}\n"
+    table = scanner.scan_buffer(source, lexing_rules.RULES)
+    lines = source.decode().splitlines(keepends=True)
+
+    assert list(table) == scanner.scan(lines, lexing_rules.RULES)
+    assert table[6].line == 3
+    assert table[6].col == 5
+
+
+def test_scan_buffer_multiline_token():
+    rules = [
+        scanner.SymbolRule(r"/\*(.|\n)*?\*/", "comment"),
+        scanner.SymbolRule("[a-z]+", "id"),
+        scanner.SymbolRule("[ \n]", "whitespace", add_symbol=False)
+    ]
+    table = scanner.scan_buffer(b"a /* b\nc */ d", rules)
+
+    assert [s.token for s in table] == ["id", "comment", "id"]
+    assert (table[2].line, table[2].col) == (2, 6)
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from cheer import client, server
+
+
+@pytest.fixture
+def compile_server(tmp_path):
+    s = server.CompileServer(str(tmp_path / "cheer.sock"), idle_timeout=30)
+    thread = threading.Thread(target=s.serve)
+    thread.start()
+    yield s
+    s.shutdown()
+    thread.join()
+
+
+def test_server_compiles(compile_server, tmp_path):
+    source = "fn main() { return 1 + 2; }"
+    path = tmp_path / "prog.ch"
+    path.write_text(source)
+
+    from_path = client.compile_remote(compile_server.socket_path, path=str(path))
+    from_source = client.compile_remote(compile_server.socket_path, source=source)
+    assert from_path == from_source
+    assert "define i32 @main()" in from_path
+    assert len(compile_server.warm.entries) == 1
+
+
+def test_server_reports_errors(compile_server):
+    with pytest.raises(client.CompileError, match="TypeCheckingError"):
+        client.compile_remote(compile_server.socket_path, source="fn main() { return true + 1; }")
+
+
+def test_server_options(compile_server):
+    source = "fn main() { return 1 + 2; }"
+    native = client.compile_remote(compile_server.socket_path, source=source, args=["--backend", "native"])
+    assert "main:" in native
+    listed = client.compile_remote(compile_server.socket_path, source=source, args=["--passes", "gvn,dce"])
+    assert "define i32 @main()" in listed
+
+    with pytest.raises(client.CompileError, match="unknown passes: nope"):
+        client.compile_remote(compile_server.socket_path, source=source, args=["--passes", "nope"])
+    with pytest.raises(client.CompileError, match="unrecognized arguments"):
+        client.compile_remote(compile_server.socket_path, source=source, args=["--nope"])
+
+
+def test_server_reports_parse_errors(compile_server, capsys):
+    for _ in range(2):
+        with pytest.raises(client.CompileError, match="Expected semicolon"):
+            client.compile_remote(compile_server.socket_path, source="fn main() {\n return 1\n}")
+    assert capsys.readouterr().out == ""
+
+
+def test_server_idle_shutdown(tmp_path):
+    s = server.CompileServer(str(tmp_path / "cheer.sock"), idle_timeout=0.1)
+    s.serve()
+    assert not (tmp_path / "cheer.sock").exists()
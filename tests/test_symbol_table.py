@@ -0,0 +1,39 @@
+import pytest
+from cheer import ast, scanner, symbol_table
+
+
+def decl(lexeme):
+    return ast.ASTNode("var_decl", scanner.Symbol("id", lexeme, None, 1, 1), None)
+
+
+def test_environment_shadowing():
+    env = symbol_table.Environment(symbol_table.SymTable())
+    env.push(symbol_table.Scope(0))
+    outer = env.create(decl("x"))
+    env.assign(outer)
+
+    env.push(symbol_table.Scope(1))
+    inner = env.create(decl("x"))
+    assert env.get(decl("x")) is inner
+    assert not env.is_assigned(inner)
+    env.assign(inner)
+    assert env.is_assigned(inner)
+
+    env.pop()
+    assert env.get(decl("x")) is outer
+    assert env.is_assigned(outer)
+
+
+def test_environment_assignment_out_of_scope():
+    env = symbol_table.Environment(symbol_table.SymTable())
+    env.push(symbol_table.Scope(0))
+    y = env.create(decl("y"))
+    env.push(symbol_table.Scope(1))
+    env.assign(y)
+    assert env.is_assigned(y)
+    env.pop()
+    assert not env.is_assigned(y)
+
+    env.pop()
+    with pytest.raises(symbol_table.NotDeclaredError):
+        env.get(decl("y"))
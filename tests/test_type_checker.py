@@ -70,6 +70,7 @@ def test_valid_shadowing_scope():
                 return x;
             }
             y = x * 4;
+            return y;
         }
     """
     prog = prog.split("\n")
@@ -92,4 +93,99 @@ def test_use_parent_scope():
     par = tc_test_helper(prog)
     root = par.start()
     tc = type_checker.TCVisitor(root)
-    assert tc.type_check() is True
\ No newline at end of file
+    assert tc.type_check() is True
+
+def test_while_condition_bool():
+    prog = """
+        fn main() {
+            let i = 0;
+            while (i + 1) {
+                i = i + 1;
+            }
+            return i;
+        }
+    """
+    prog = prog.split("\n")
+    par = tc_test_helper(prog)
+    root = par.start()
+    tc = type_checker.TCVisitor(root)
+    with pytest.raises(type_checker.TypeCheckingError):
+        tc.type_check()
+
+
+@pytest.mark.parametrize("prog", [
+    # undefined function
+    "fn main() { return nope(1); }",
+    # wrong number of arguments
+    "fn f(a: i32) -> i32 { return a; } fn main() { return f(1, 2); }",
+    # wrong argument type
+    "fn f(a: i32) -> i32 { return a; } fn main() { return f(true); }",
+    # returns the wrong type
+    "fn f(a: i32) -> bool { return a; } fn main() { return 0; }",
+    # defined twice
+    "fn f() { return 1; } fn f() { return 2; } fn main() { return 0; }",
+    "fn f(a: i32, a: i32) { return a; } fn main() { return 0; }",
+    "fn main(a: i32) { return a; }",
+    "fn f() { return 1; }",
+    # doesn't return on every path
+    "fn f() -> bool { let x = 1; } fn main() { return 0; }",
+    "fn f(a: i32) -> i32 { if (a == 1) { return 2; } } fn main() { return f(1); }",
+    "fn f(a: i32) -> i32 { if (a == 1) { return 2; } else { a = 3; } } fn main() { return f(1); }",
+    "fn f(a: i32) -> i32 { while (a == 1) { return 2; } } fn main() { return f(1); }",
+    # unknown types
+    "fn f(a: foo) -> i32 { return 1; } fn main() { return 0; }",
+    "fn f() -> foo { return 1; } fn main() { return 0; }",
+    "fn main() { let x: foo; return 0; }",
+])
+def test_function_errors(prog):
+    root = tc_test_helper([prog]).start()
+    tc = type_checker.TCVisitor(root)
+    with pytest.raises(type_checker.TypeCheckingError):
+        tc.type_check()
+
+
+def test_returns_on_every_path():
+    prog = """
+        fn f(a: i32) -> i32 {
+            if (a == 1) {
+                return 2;
+            } else {
+                if (a == 2) {
+                    let b = 3;
+                    return b;
+                } else {
+                    return 4;
+                }
+            }
+        }
+
+        fn main() {
+            while (false) {
+                return 1;
+            }
+            return f(1);
+            let c = 5;
+        }
+    """
+    root = tc_test_helper(prog.split("\n")).start()
+    assert type_checker.TCVisitor(root).type_check() is True
+
+
+def test_call_before_definition():
+    prog = """
+        fn main() {
+            return twice(input() == 1, 4);
+        }
+
+        fn twice(flag: bool, x: i32) -> i32 {
+            if (flag) {
+                return x + x;
+            }
+            return x;
+        }
+    """
+    root = tc_test_helper(prog.split("\n")).start()
+    tc = type_checker.TCVisitor(root)
+    assert tc.type_check() is True
+    call = root.children[0].children[1].children[0].children[0]
+    assert call.type == "i32"
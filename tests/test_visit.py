@@ -0,0 +1,78 @@
+from cheer import scanner, parser, lexing_rules, visit
+
+
+class RecordingVisitor(visit.DFSVisitor):
+    def __init__(self, ast):
+        super().__init__(ast)
+        self.events = []
+
+    def default_in_visit(self, node):
+        self.events.append(("in", node.ntype))
+
+    def default_out_visit(self, node):
+        self.events.append(("out", node.ntype))
+
+    def _visit_var(self, node):
+        self.events.append(("visit", node.symbol.lexeme))
+
+    def _visit_times_exp(self, node):
+        # only the right hand side
+        self.visit_node(node.children[1])
+
+
+def parse_expr(source):
+    tokens = scanner.scan([source], lexing_rules.RULES)
+    return parser.Parser(tokens).expr()
+
+
+def test_visit_order():
+    v = RecordingVisitor(parse_expr("a + 2 * b"))
+    v.accept()
+    assert v.events == [
+        ("in", "plus_exp"),
+        ("visit", "a"),
+        ("visit", "b"),
+        ("out", "plus_exp"),
+    ]
+
+
+def test_visit_deep_tree():
+    v = RecordingVisitor(parse_expr("(" * 5000 + "1" + ")" * 5000 + " + 1" * 5000))
+    v.accept()
+    # in and out for 5000 plus_exp and 5001 int_literal nodes
+    assert len(v.events) == 20002
+
+
+class TaggingVisitor(visit.DFSVisitor):
+    def __init__(self, ast, tag, events):
+        super().__init__(ast)
+        self.tag = tag
+        self.events = events
+
+    def default_in_visit(self, node):
+        self.events.append((self.tag, "in", node.ntype))
+
+    def default_out_visit(self, node):
+        self.events.append((self.tag, "out", node.ntype))
+
+
+def test_fused_visitor():
+    root = parse_expr("a * 2 + 1")
+    events = []
+    recording = RecordingVisitor(root)
+    recording.events = events
+    tagging = TaggingVisitor(root, "t", events)
+    visit.FusedVisitor(root, [tagging, recording]).accept()
+
+    assert events == [
+        ("t", "in", "plus_exp"), ("in", "plus_exp"),
+        # recording overrides _visit_times_exp, so each pass walks that subtree on its own
+        ("t", "in", "times_exp"),
+        ("t", "in", "var"), ("t", "out", "var"),
+        ("t", "in", "int_literal"), ("t", "out", "int_literal"),
+        ("t", "out", "times_exp"),
+        ("in", "int_literal"), ("out", "int_literal"),
+        ("t", "in", "int_literal"), ("in", "int_literal"),
+        ("t", "out", "int_literal"), ("out", "int_literal"),
+        ("t", "out", "plus_exp"), ("out", "plus_exp"),
+    ]